@@ -0,0 +1,61 @@
+/**
+ * ****************************************************************************
+ * loc_count.h : Per-call-site hit counters, keyed on LOC-IDs.
+ * SPDX-License-Identifier: Apache-2.0
+ *
+ * Usage:
+ *  - Add LOC_COUNT() at any code-site whose hits are to be counted. Link
+ *    with src/loc_count.c (and -lpthread, on older glibc's).
+ *  - Works with either LOC scheme: include/loc.h (& src/loc.c) or the loc.h
+ *    generated by loc/gen_loc_files.py. Build with -I<dir> of the loc.h
+ *    in use ahead of -I<this dir>, same as for the rest of the sources.
+ *
+ * Counters live in a file that is mmap()'ed MAP_SHARED, so that tools, e.g.
+ * loc/loc_count.py, can snapshot them while the process is running. By
+ * default the file is $XDG_RUNTIME_DIR/loc_count.<pid>, or
+ * /tmp/loc_count.<pid> if $XDG_RUNTIME_DIR is not set; see loc_count_init()
+ * to choose another file and size, or set $LOC_COUNT_FILE. The file is
+ * created afresh, readable and writable only by the user: an existing file,
+ * or symlink, of that name is replaced, never written through.
+ *
+ * The hot path takes no locks. Each thread claims its own shard, a hash-
+ * table of (LOC-ID, count) slots, on its first hit, and returns it when it
+ * exits, for re-use by later threads. Shards are cache-line aligned, so
+ * threads do not write to the same cache lines, and a thread's counts are
+ * incremented by plain (relaxed) loads and stores. The last shard is shared
+ * by threads that find no free shard, when there are more live threads
+ * than shards; its counts are incremented by (relaxed) atomic adds, so
+ * shared counts remain exact.
+ *
+ * A child fork()'ed after the first hit, or loc_count_init(), keeps counting
+ * into its parent's file: its threads only use the shared shard, so counts
+ * remain exact, and are those of the parent and its children together. The
+ * file's pid remains the parent's. A child exec()'ing a program starts
+ * afresh, with a file of its own.
+ * ****************************************************************************
+ */
+#ifndef __LOC_COUNT_H__
+#define __LOC_COUNT_H__
+
+#include <stdint.h>
+#include <loc.h>      // include/loc.h, or the generated loc.h: Per -I order
+
+/* Default # of per-thread shards, and # of slots in each shard */
+#define LOC_COUNT_NUM_SHARDS    64
+#define LOC_COUNT_NUM_SLOTS     4096
+
+/* Count one hit of the code-site where this macro is used */
+#define LOC_COUNT() loc_count_hit((uint32_t) (__LOC__))
+
+/* Count one hit of the code-site identified by LOC-ID 'loc' */
+void loc_count_hit(uint32_t loc);
+
+/**
+ * Create the counters' file 'path' with 'nshards' shards, each of 'nslots'
+ * slots (rounded up to a power of 2). Any of these may be NULL / 0, for the
+ * defaults. Optional: The first loc_count_hit() does this, with defaults,
+ * otherwise. Returns 0 on success, -1 otherwise; then hits are not counted.
+ */
+int loc_count_init(const char *path, uint32_t nshards, uint32_t nslots);
+
+#endif  // __LOC_COUNT_H__
@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+################################################################################
+# __main__.py
+# SPDX-License-Identifier: Apache-2.0
+################################################################################
+"""
+Entry point of the loc package, to run its tools as sub-commands:
+
+    python3 -m loc <command> [ <args> ]
+
+E.g., from a Make rule:
+    python3 -m loc gen --src-root-dir <dir> --gen-includes-dir <dir> ...
+    python3 -m loc decode <gen-source-dir> 65541 65547
+    python3 -m loc stats <gen-source-dir>
+
+Commands are run in-process, by the do_main() of their module, and with the
+same arguments as when the module is run as a script. Each command's module
+is only imported when that command is run, and modules import what just
+some runs need where it is used, so that runs start quickly: the generator
+is run many times in a build, and the decoder once per LOC-ID lookup.
+"""
+
+import sys
+
+# Command -> (Module, leading arguments to its do_main(), description)
+LOC_COMMANDS = {
+    'gen'       : ('loc.gen_loc_files', [],
+                   'Generate the LOC .h / .c files of a code base'),
+    'decode'    : ('loc.loc_decoder', [],
+                   'Decode LOC-IDs using the generated file-names table'),
+    'stats'     : ('loc.loc_decoder', ['--stats'],
+                   'Print statistics of the generated file-names table'),
+    'histogram' : ('loc.loc_histogram', [],
+                   'Report the hottest call-sites in a trace file of LOC-IDs'),
+    'count'     : ('loc.loc_count', [],
+                   'Report the hottest call-sites in a LOC_COUNT() counters\' file'),
+    'index-map' : ('loc.loc_index_map', [],
+                   'Show, or compact, a file-index map'),
+    'site-index': ('loc.loc_site_index', [],
+                   'Export a sorted index of the LOC2 code-sites of a program'),
+    'bench'     : ('loc.loc_bench', [],
+                   'Benchmark the generator on synthetic source trees'),
+}
+
+###############################################################################
+# main() driver
+###############################################################################
+def main():
+    """
+    Shell to call do_main() with command-line arguments.
+    """
+    sys.exit(do_main(sys.argv[1:]))
+
+###############################################################################
+def do_main(args:list) -> int:
+    """
+    Run the command named by args[0], with the rest of 'args'.
+
+    Returns: Exit status of the command.
+    """
+    if not args or args[0] in ('-h', '--help'):
+        print(loc_usage())
+        return 0 if args else 1
+
+    command = LOC_COMMANDS.get(args[0])
+    if command is None:
+        print("Unknown command: " + args[0] + "\n" + loc_usage(), file=sys.stderr)
+        return 1
+
+    (module_name, lead_args, _) = command
+
+    # pylint: disable-msg=import-outside-toplevel
+    from importlib import import_module
+    # pylint: enable-msg=import-outside-toplevel
+    retval = import_module(module_name).do_main(lead_args + args[1:])
+
+    # gen_loc_files' do_main() returns its results, and exits on failure.
+    return retval if isinstance(retval, int) else 0
+
+###############################################################################
+def loc_usage() -> str:
+    """
+    Return the usage message, listing all commands.
+    """
+    return ("Usage: python3 -m loc <command> [ <args> ]\n\nCommands:\n"
+            + '\n'.join("  %-11s %s" % (name, desc)
+                        for (name, (_, _, desc)) in LOC_COMMANDS.items())
+            + "\n\nRun 'python3 -m loc <command> --help' for a command's arguments.")
+
+###############################################################################
+# Start of the script: Execute only if run as a script
+###############################################################################
+if __name__ == "__main__":
+    main()
@@ -17,16 +17,25 @@ This script will generate the following files:
                     LOC* macros are used
   loc_tokens.h    - Header file listing tokens for all files processed
   loc_filenames.c - Contains definition of filename lookup array
+  loc_funcranges.c - (With --gen-func-ranges) Table of function line-ranges,
+                    per file, to decode LOC-IDs to their enclosing function.
+  <dir>/<file>.h, <dir>/<file>.rsp
+                  - (With --gen-index-shards <dir>) Per-file shards, defining
+                    just that file's LOC_FILE_INDEX, so that a compile need not
+                    #include loc_tokens.h, of all files' tokens.
   <product>_loc.c - .c file to be linked with loc_filenames.c to produce
                     product-specific helper decoder program.
 """
 
+# This script is run many times per build, so it only imports what every run
+# needs. Modules needed just to build the decoder, or for --batch, --watch or
+# --jobs, (loc_decoder_bin, loc_watch, tempfile, concurrent.futures ...) are
+# imported where they are used.
 import sys
 import os
-import tempfile
 import argparse
-import subprocess as sp
-import shutil
+import io
+from functools import partial
 
 # Ref: https://stackoverflow.com/questions/3108285/in-python-script-how-do-i-set-pythonpath
 # PYTHONPATH will become ".../LineOfCode" dir, to resolve loc package imports
@@ -34,9 +43,24 @@ LOC_THIS_SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
 
 # Ref: https://stackoverflow.com/questions/3108285/in-python-script-how-do-i-set-pythonpath
 # pylint: disable-msg=wrong-import-position
-sys.path.append(LOC_THIS_SCRIPT_DIR + '/..')
+# Only needed when run as a script; 'python -m loc gen' finds the package.
+if not __package__:
+    sys.path.append(LOC_THIS_SCRIPT_DIR + '/..')
 
 import loc.utils as locu
+from loc.utils import fprintf
+from loc.loc_cache import LocScanCache
+from loc.loc_index_map import LocIndexMap
+from loc.loc_profile import LocProfile, loc_profile_phase
+import loc.loc_discover as locd
+import loc.loc_xform as xform
+import loc.loc_manifest as locm
+import loc.loc_func_ranges as locf
+import loc.loc_scan as locs
+from loc.loc_emit import (gen_loc_generated_files, gen_loc_interface_doth,
+                          gen_loc_index_shards, gen_doth_include_guards,
+                          gen_loc_file_banner_msg, loc_src_roots_msg, loc_write_outputs,
+                          gen_loc_shards_manifest, LOC_SHARDS_MANIFEST)
 
 ###############################################################################
 # Global Variables: Used in multiple places. List here for documentation
@@ -46,6 +70,90 @@ LOC_SCRIPT          = os.path.basename(__file__)
 LOC_PKGSRC_DIR      = os.path.dirname(LOC_THIS_SCRIPT_DIR)
 LOC_DBG_GENFILESDIR = '/tmp'
 
+# Per-user cache dir, where compiled LOC decoder binaries are cached by default
+LOC_DECODER_CACHE_DIR = 'decoder'
+
+# Names of generated files
+LOC_DOTH            = 'loc.h'
+LOC_TOKENS_DOTH     = 'loc_tokens.h'
+LOC_FILENAMES_DOTC  = 'loc_filenames.c'
+
+# Default seconds between polls of the source tree, with --watch
+LOC_WATCH_INTERVAL = 0.2
+
+###############################################################################
+# Library API: Generate from a configuration object, rather than from the
+# command-line, and get the generated files back in memory.
+###############################################################################
+class LocGenError(Exception):
+    """ Raised when the LOC files cannot be generated. """
+
+###############################################################################
+# pylint: disable-msg=too-few-public-methods
+class LocGenConfig:
+    """
+    Configuration of one generator run, i.e. of one target.
+
+    Attributes are named, and default, as the destinations of the command-line
+    arguments, so that a config and the parsed arguments are interchangeable.
+    E.g.:
+
+        config = LocGenConfig(['src/'], inc_dirname='gen/', src_dirname='gen/',
+                              gen_decoder=False)
+        result = loc_generate(config, write=False)
+        loc_doth = result.artifacts['/abs/path/gen/loc.h']
+    """
+    def __init__(self, src_root_dirnames:list, **options):
+        """
+        Configure a run over source roots 'src_root_dirnames'. 'options' are
+        any other command-line argument's destination, e.g. jobs=4.
+        """
+        defaults = vars(loc_parse_args([]))
+        unknown = set(options) - set(defaults)
+        if unknown:
+            raise LocGenError("Unknown generator options: " + ', '.join(sorted(unknown)))
+
+        self.__dict__.update(defaults)
+        self.__dict__.update(options)
+        self.src_root_dirnames = list(src_root_dirnames)
+
+    # -------------------------------------------------------------------------
+    @classmethod
+    def from_args(cls, args:list):
+        """
+        Return the config of command-line arguments 'args'.
+        """
+        parsed_args = vars(loc_parse_args(args))
+        return cls(parsed_args.pop('src_root_dirnames') or [], **parsed_args)
+# pylint: enable-msg=too-few-public-methods
+
+###############################################################################
+# pylint: disable-msg=too-many-instance-attributes
+# pylint: disable-msg=too-few-public-methods
+class LocGenResult:
+    """
+    Result of a generator run: the generated files, in memory, and the
+    properties of the code base they were generated for.
+    """
+    def __init__(self):
+        self.artifacts = {}         # Full path-name of file -> str / bytes contents
+        self.shards = set()         # Artifacts that are index shards
+        self.written = []           # Artifacts that changed, and were written
+        self.file_table = []        # (file-full-name, line-count), by file-index
+        self.max_file_num = 0
+        self.max_num_lines = 0
+        self.file_w_max_num_lines = ""
+        self.nbits_files = 0
+        self.nbits_lines = 0
+        self.decoder_bin = None     # Decoder binary built, if any
+
+    # -------------------------------------------------------------------------
+    def add(self, file_name:str, contents):
+        """ Add a generated file, of str or bytes 'contents'. """
+        self.artifacts[file_name] = contents
+# pylint: enable-msg=too-few-public-methods
+# pylint: enable-msg=too-many-instance-attributes
+
 ###############################################################################
 # main() driver
 ###############################################################################
@@ -60,127 +168,521 @@ def do_main(args) -> (bool, int, int, str):
     """
     Main driver to search through the code base looking for source files.
     """
-    # pylint: disable-msg=too-many-locals
-    # pylint: disable-msg=too-many-statements
     if len(sys.argv) < 2:
         print("Usage: %s <root src-dir>" % (sys.argv[0]))
         print("Example: %s $HOME/Code/myProject/" % (sys.argv[0]))
         sys.exit(1)
 
+    config = LocGenConfig.from_args(args)
+
+    # pylint: disable-msg=no-member
+    try:
+        if config.batch_file is not None:
+            results = loc_do_batch(config)
+        else:
+            results = [loc_do_target(config, args)]
+    except LocGenError as exc:
+        fprintf(sys.stderr, "%s\n", str(exc))
+        sys.exit(1)
+    # pylint: enable-msg=no-member
+
+    # For a batch, report on the target with the most lines in a file.
+    result = max(results, key=lambda result: result.max_num_lines)
+    return (True, result.max_file_num, result.max_num_lines, result.file_w_max_num_lines)
+
+###############################################################################
+def loc_do_target(config, args) -> LocGenResult:
+    """
+    Generate, and write, the LOC files of one target, profiling and then
+    watching it, if so asked.
+    """
+    profile = None
+    if config.profile_file is not None or config.cprofile_file is not None:
+        profile = LocProfile(args, config.cprofile_file)
+
+    loc_check_config(config)
+    (scan_cache, index_map) = loc_open_state(config)
+    root_scans = loc_scan_config(config, scan_cache, profile)
+    result = loc_generate_from_scans(config, root_scans, index_map,
+                                     write=True, profile=profile)
+    loc_save_scan_cache(scan_cache, profile)
+
+    if config.gen_cflags or config.gen_cflags_brief:
+        gen_loc_cflags(config.gen_cflags_brief)
+
+    if profile is not None:
+        profile.stop()
+        if config.profile_file is not None:
+            profile.save(config.profile_file)
+            if config.verbose and config.profile_file != '-':
+                fprintf(sys.stdout, 'Generated ' + config.profile_file + '\n')
+        if config.verbose and config.cprofile_file is not None:
+            fprintf(sys.stdout, 'Generated ' + config.cprofile_file + '\n')
+
+    # -----------------------------------------------------------------------
+    # Keep the generated files current, as source files come and go.
+    if config.watch:
+        # pylint: disable-msg=import-outside-toplevel
+        from loc.loc_watch import loc_watch_src_roots
+        # pylint: enable-msg=import-outside-toplevel
+
+        def regenerate(root_scans) -> LocGenResult:
+            result = loc_generate_from_scans(config, root_scans, index_map)
+            loc_save_scan_cache(scan_cache)
+            return result
+
+        try:
+            watch_result = loc_watch_src_roots(config, root_scans,
+                                               (LOC_FILENAMES_DOTC, locf.LOC_FUNC_RANGES_DOTC),
+                                               scan_cache, regenerate)
+            if watch_result is not None:
+                result = watch_result
+        except KeyboardInterrupt:
+            pass
+
+    return result
+
+###############################################################################
+def loc_do_batch(config) -> list:
+    """
+    Generate, and write, the LOC files of all targets listed in the
+    --batch file, in one run.
+
+    Returns: List of LocGenResult, one per target.
+    """
+    if config.src_root_dirnames:
+        raise LocGenError("--batch lists the targets' --src-root-dir in its file")
+
+    try:
+        with open(config.batch_file, encoding="utf8") as batch_fh:
+            lines = batch_fh.read().splitlines()
+    except OSError as exc:
+        raise LocGenError(config.batch_file + ": " + str(exc)) from exc
+
+    # pylint: disable-msg=import-outside-toplevel
+    import shlex
+    # pylint: enable-msg=import-outside-toplevel
+
+    configs = []
+    for line in lines:
+        target_args = shlex.split(line, comments=True)
+        if not target_args:
+            continue
+        target_config = LocGenConfig.from_args(target_args)
+        # pylint: disable-msg=no-member
+        if (target_config.batch_file is not None or target_config.watch
+                or target_config.profile_file is not None
+                or target_config.cprofile_file is not None):
+            raise LocGenError(config.batch_file + ": --batch, --watch and --profile*"
+                              + " cannot be given for a target: " + line)
+        # pylint: enable-msg=no-member
+        configs.append(target_config)
+
+    results = loc_generate_batch(configs, write=True)
+    for target_config in configs:
+        if target_config.gen_cflags or target_config.gen_cflags_brief:
+            gen_loc_cflags(target_config.gen_cflags_brief)
+            break
+
+    return results
+
+###############################################################################
+def loc_generate(config, write:bool=True, profile=None) -> LocGenResult:
+    """
+    Generate the LOC files of the code base configured by 'config'.
+
+    Arguments:
+        config           - LocGenConfig, or parsed command-line arguments
+        write            - Write the generated files, save the --cache-file
+                           and --index-map, and build the decoder binary.
+                           Else, just return the files generated, in memory.
+        profile          - LocProfile timing the run's phases; may be None
+
+    Returns: LocGenResult. Raises LocGenError on failure.
+    """
+    loc_check_config(config, write)
+    (scan_cache, index_map) = loc_open_state(config)
+    root_scans = loc_scan_config(config, scan_cache, profile)
+    result = loc_generate_from_scans(config, root_scans, index_map, write, profile)
+    if write:
+        loc_save_scan_cache(scan_cache, profile)
+    return result
+
+###############################################################################
+def loc_generate_batch(configs:list, write:bool=True) -> list:
+    """
+    Generate the LOC files of several targets in one run.
+
+    Source roots are scanned once, concurrently, and the scans are shared by
+    all targets having that root with the same discovery options. So,
+    e.g., targets generating into different dirs from one code base, or
+    targets whose roots overlap, cost one scan of each root.
+
+    Arguments:
+        configs          - List of LocGenConfig, one per target
+        write            - As for loc_generate()
+
+    Returns: List of LocGenResult, one per target, in the order of 'configs'.
+             Raises LocGenError on failure of any target.
+    """
+    # pylint: disable-msg=too-many-locals
+    # pylint: disable-msg=import-outside-toplevel
+    from concurrent.futures import ThreadPoolExecutor
+    # pylint: enable-msg=import-outside-toplevel
+
+    scan_caches = {}
+    states = []
+    for config in configs:
+        loc_check_config(config, write)
+        # Targets sharing a --cache-file share its cache, saved once.
+        cache_file = config.cache_file
+        if cache_file is not None:
+            cache_file = os.path.abspath(cache_file)
+            if cache_file not in scan_caches:
+                scan_caches[cache_file] = LocScanCache(cache_file, config.verbose)
+        (_, index_map) = loc_open_state(config, with_cache=False)
+        states.append((scan_caches.get(cache_file), index_map))
+
+    # Scan each root once, for all targets. Files are scanned with an empty
+    # root-name, and are qualified by each target's root-name below.
+    scan_keys = {}
+    for (config, (scan_cache, _)) in zip(configs, states):
+        for src_root_dir in config.src_root_dirnames:
+            scan_key = loc_scan_key(config, src_root_dir)
+            if scan_key not in scan_keys:
+                scan_keys[scan_key] = (src_root_dir, config, scan_cache)
+
+    with ThreadPoolExecutor(max_workers=max(1, len(scan_keys))) as pool:
+        futures = {scan_key: pool.submit(locs.loc_scan_src_root, src_root_dir, '',
+                                         loc_discover_fn(config),
+                                         (LOC_FILENAMES_DOTC, locf.LOC_FUNC_RANGES_DOTC),
+                                         scan_cache, config.jobs, config.verbose)
+                   for (scan_key, (src_root_dir, config, scan_cache)) in scan_keys.items()}
+        try:
+            scans = {scan_key: future.result() for (scan_key, future) in futures.items()}
+        except locd.LocDiscoverError as exc:
+            raise LocGenError(str(exc)) from exc
+
+    results = []
+    for (config, (_, index_map)) in zip(configs, states):
+        root_names = locs.loc_src_root_names(config.src_root_dirnames)
+        root_scans = [(root_name, [(path, base, root_name + full_name, num_lines)
+                                   for (path, base, full_name, num_lines)
+                                   in scans[loc_scan_key(config, src_root_dir)]])
+                      for (src_root_dir, root_name)
+                      in zip(config.src_root_dirnames, root_names)]
+        results.append(loc_generate_from_scans(config, root_scans, index_map, write))
+
+    # Save each cache once, after all the targets sharing it are generated.
+    if write:
+        for scan_cache in scan_caches.values():
+            loc_save_scan_cache(scan_cache)
+
+    return results
+    # pylint: enable-msg=too-many-locals
+
+###############################################################################
+def loc_check_config(config, write:bool=True):
+    """
+    Validate 'config', and normalize its source roots and output dir names
+    in place: trailing '/' stripped, and made absolute. Output dirs default
+    to the temp dir. Raises LocGenError if 'config' is not usable.
+    """
     # By default, .h / .c files will be generated in /tmp first.
-    tmp_dir = tempfile.gettempdir() + '/'
+    tmp_dir = None
+    if (config.debug_script or None in (config.inc_dirname, config.src_dirname,
+                                        config.loc_dirname)):
+        tmp_dir = loc_tmp_dir()
 
-    parsed_args = loc_parse_args(args)
+    src_root_dirs = config.src_root_dirnames
+    if not src_root_dirs:
+        raise LocGenError("No source root-dir specified: Use --src-root-dir")
 
-    # Extract parsed cmdline flags into local variables
-    src_root_dir     = parsed_args.src_root_dirname
-    inc_dirname      = tmp_dir if parsed_args.inc_dirname is None else parsed_args.inc_dirname
-    src_dirname      = tmp_dir if parsed_args.src_dirname is None else parsed_args.src_dirname
-    loc_dirname      = tmp_dir if parsed_args.loc_dirname is None else parsed_args.loc_dirname
-    verbose          = parsed_args.verbose
-    gen_cflags       = parsed_args.gen_cflags
-    gen_cflags_brief = parsed_args.gen_cflags_brief
-    loc_debug        = parsed_args.debug_script
-    dump_dup_files   = parsed_args.dump_dup_files
+    # Strip trailing '/' from dir-path-names, if so supplied
+    src_root_dirs = [(os.path.dirname(src_root_dir) if src_root_dir.endswith('/')
+                      else src_root_dir) for src_root_dir in src_root_dirs]
+    config.src_root_dirnames = src_root_dirs
 
-    loct_doth = "loc_tokens.h"
-    loc_dotc = "loc_filenames.c"
+    config.inc_dirname = os.path.abspath(tmp_dir if config.inc_dirname is None
+                                         else config.inc_dirname)
+    config.src_dirname = os.path.abspath(tmp_dir if config.src_dirname is None
+                                         else config.src_dirname)
+    config.loc_dirname = os.path.abspath(tmp_dir if config.loc_dirname is None
+                                         else config.loc_dirname) + '/'
+    if config.shards_dirname is not None:
+        config.shards_dirname = os.path.abspath(config.shards_dirname)
 
-    # Strip trailing '/' from dir-path-name, if so supplied
-    if src_root_dir.endswith('/'):
-        src_root_dir = os.path.dirname(src_root_dir)
+    if config.jobs <= 0:
+        config.jobs = os.cpu_count() or 1
 
-    inc_dirname = os.path.abspath(inc_dirname)
-    src_dirname = os.path.abspath(src_dirname)
-    loc_dirname = os.path.abspath(loc_dirname) + '/'
+    if config.debug_script:
+        print_loc_vars(tmp_dir, ' '.join(src_root_dirs), config.inc_dirname,
+                       config.src_dirname)
 
-    if loc_debug:
-        print_loc_vars(tmp_dir, src_root_dir, inc_dirname, src_dirname)
+    for dir_name in src_root_dirs + ([config.inc_dirname, config.src_dirname] if write else []):
+        if not os.path.isdir(dir_name):
+            raise LocGenError(dir_name + ": No such directory")
 
-    if loc_validate_args(src_root_dir, inc_dirname, src_dirname) is False:
-        sys.exit(1)
+    if config.shards_dirname is not None:
+        loc_check_shards_dir(config.shards_dirname, [config.inc_dirname, config.src_dirname])
+
+    if len(set(map(os.path.realpath, src_root_dirs))) != len(src_root_dirs):
+        raise LocGenError("Source root-dir specified more than once: "
+                          + ' '.join(src_root_dirs))
+
+    if config.discover == 'stdin' and len(src_root_dirs) > 1:
+        raise LocGenError("--discover stdin needs a single --src-root-dir")
+
+    if config.compact_index_map and config.index_map_file is None:
+        raise LocGenError("--compact-index-map needs --index-map")
+
+    if config.watch and config.discover != 'walk':
+        raise LocGenError("--watch needs --discover walk")
+
+
+###############################################################################
+def loc_check_shards_dir(shards_dir, gen_dirs):
+    """
+    Raise LocGenError if the index shards dir 'shards_dir' is, or contains,
+    any of the dirs 'gen_dirs' of other generated files: shards are removed
+    from it once stale, so it must not hold files that are not shards.
+    """
+    shards_dir = os.path.realpath(shards_dir)
+    for gen_dir in gen_dirs:
+        gen_dir = os.path.realpath(gen_dir)
+        if os.path.commonpath([shards_dir, gen_dir]) == shards_dir:
+            raise LocGenError("--gen-index-shards " + shards_dir
+                              + " overlaps the generated files' dir " + gen_dir)
+
+###############################################################################
+def loc_open_state(config, with_cache:bool=True) -> tuple:
+    """
+    Return the (LocScanCache, LocIndexMap) of 'config', either of which may
+    be None if not configured.
+    """
+    scan_cache = None
+    if with_cache and config.cache_file is not None:
+        scan_cache = LocScanCache(config.cache_file, config.verbose)
+
+    index_map = None
+    if config.index_map_file is not None:
+        try:
+            index_map = LocIndexMap(config.index_map_file, config.compact_index_map)
+        except ValueError as exc:
+            raise LocGenError(str(exc)) from exc
+
+    return (scan_cache, index_map)
+
+###############################################################################
+def loc_discover_fn(config):
+    """
+    Return the callable discovering the files under a source root, as
+    configured by 'config'.
+    """
+    return partial(locd.loc_discover_sources, method=config.discover,
+                   compile_commands=config.compile_commands,
+                   exclude_dirs=config.exclude_dirs, excludes=config.excludes)
+
+###############################################################################
+def loc_scan_key(config, src_root_dir) -> tuple:
+    """
+    Return the key of the scan of 'src_root_dir' with the discovery options
+    of 'config'; targets with equal keys can share the scan.
+    """
+    return (os.path.realpath(src_root_dir), config.discover,
+            config.compile_commands, tuple(config.exclude_dirs or ()),
+            tuple(config.excludes or ()), config.cache_file)
 
-    max_file_num = 0
-    max_num_lines = 0
-    file_w_max_num_lines = ""
-    full_loct_doth = inc_dirname + '/' + loct_doth
-    full_loc_dotc  = src_dirname + '/' + loc_dotc
+###############################################################################
+def loc_scan_config(config, scan_cache, profile=None) -> list:
+    """
+    Discover and line-count the source files under all source roots of
+    'config', with one worker per root.
+
+    Returns: As loc_scan_src_roots().
+    """
+    try:
+        return locs.loc_scan_src_roots(config.src_root_dirnames, loc_discover_fn(config),
+                                       (LOC_FILENAMES_DOTC, locf.LOC_FUNC_RANGES_DOTC),
+                                       scan_cache, config.jobs, config.verbose, profile)
+    except locd.LocDiscoverError as exc:
+        raise LocGenError(str(exc)) from exc
+
+###############################################################################
+def loc_generate_from_scans(config, root_scans, index_map,
+                            write:bool=True, profile=None) -> LocGenResult:
+    """
+    Generate the LOC files from the scans of the source roots, and write
+    them if 'write', along with the --index-map, and build the decoder.
+    The scan-cache is saved by the caller, once all its targets are done.
+
+    Arguments: As for loc_generate(), and:
+        root_scans       - List of (root-name, src-files), as returned by
+                           loc_scan_src_roots()
+        index_map        - LocIndexMap to assign file-indexes from; may be None
+
+    Returns: LocGenResult. Raises LocGenError on failure.
+    """
+    result = gen_loc_outputs(config, root_scans, index_map, profile)
+    if not write:
+        return result
+
+    loc_write_outputs(config, result, profile)
+
+    with loc_profile_phase(profile, 'save_caches'):
+        if index_map is not None:
+            index_map.save()
+            if config.verbose:
+                fprintf(sys.stdout, index_map.stats_msg() + '\n')
+
+    # -----------------------------------------------------------------------
+    # Generate the LOC-decoding program, used as helper utility program
+    if config.gen_decoder:
+        # pylint: disable-msg=import-outside-toplevel
+        import loc.loc_decoder_bin as locdb
+        # pylint: enable-msg=import-outside-toplevel
+
+        decoder_cache = config.decoder_cache_dirname
+        if decoder_cache is None:
+            decoder_cache = locu.loc_user_cache_dir(LOC_DECODER_CACHE_DIR)
+        try:
+            result.decoder_bin = locdb.gen_loc_decoder_binary(
+                                    loc_tmp_dir(), config.loc_dirname,
+                                    config.src_root_dirnames, result.max_file_num,
+                                    result.nbits_lines, LOC_DOTH, LOC_FILENAMES_DOTC,
+                                    config.inc_dirname + '/' + LOC_TOKENS_DOTH,
+                                    config.inc_dirname + '/' + LOC_DOTH,
+                                    config.src_dirname + '/' + LOC_FILENAMES_DOTC,
+                                    decoder_cache, config.verbose,
+                                    config.debug_script,
+                                    ((config.src_dirname + '/' + locf.LOC_FUNC_RANGES_DOTC)
+                                     if config.gen_func_ranges else None),
+                                    profile)
+        except locdb.LocDecoderBuildError as exc:
+            raise LocGenError(str(exc)) from exc
+
+    return result
+
+###############################################################################
+def loc_save_scan_cache(scan_cache, profile=None):
+    """
+    Save the scan-cache, if any, and report its hit-rate if verbose.
+    Called once per run, after all targets sharing the cache are generated.
+    """
+    if scan_cache is None:
+        return
+    with loc_profile_phase(profile, 'save_caches'):
+        scan_cache.save()
+    if scan_cache.verbose:
+        fprintf(sys.stdout, scan_cache.stats_msg() + '\n')
+
+###############################################################################
+def gen_loc_outputs(config, root_scans, index_map, profile=None) -> LocGenResult:
+    """
+    Generate all LOC output files, in memory, from the scans of the source
+    roots.
+
+    Arguments:
+        config           - LocGenConfig, as normalized by loc_check_config()
+        root_scans       - List of (root-name, src-files), as returned by
+                           loc_scan_src_roots()
+        index_map        - LocIndexMap to assign file-indexes from; may be None
+        profile          - LocProfile timing the generation phases; may be None
+
+    Returns: LocGenResult, of the generated files. Raises LocGenError if the
+             code base does not fit in a LOC-ID.
+    """
+    # pylint: disable-msg=too-many-locals
+    src_dirname      = config.src_dirname
+    shards_dirname   = config.shards_dirname
+    gen_func_ranges  = config.gen_func_ranges
+
+    result = LocGenResult()
+    src_root_dir = loc_src_roots_msg(config.src_root_dirnames)
+    loct_doth = LOC_TOKENS_DOTH
+    loc_dotc = LOC_FILENAMES_DOTC
+    loc_funcs_dotc = locf.LOC_FUNC_RANGES_DOTC
+
+    num_src_files = sum(len(src_files) for (_, src_files) in root_scans)
     # -----------------------------------------------------------------------
     # The filename-index mnemonics will come out in the .h file, but the list
     # of file names array will come out in the .c file. Only after we source
     # the list of src files can we generate the .h tokens. Hence, both file
     # handles have to be working in tandem.
-    with open(full_loct_doth, 'w', encoding="utf8") as doth_fh:
+    with loc_profile_phase(profile, 'emit', num_src_files):
+        doth_fh = io.StringIO()
+        dotc_fh = io.StringIO()
+        funcs_fh = io.StringIO() if gen_func_ranges else None
+
         gen_loc_file_banner_msg(doth_fh, src_root_dir, loct_doth)
         gen_doth_include_guards(doth_fh, loct_doth, True)
+        gen_loc_file_banner_msg(dotc_fh, src_root_dir, loc_dotc)
+        if funcs_fh is not None:
+            gen_loc_file_banner_msg(funcs_fh, src_root_dir, loc_funcs_dotc)
 
-        with open(full_loc_dotc, 'w', encoding="utf8") as dotc_fh:
-            gen_loc_file_banner_msg(dotc_fh, src_root_dir, loc_dotc)
-
-            (max_file_num, max_num_lines, file_w_max_num_lines) \
-                = gen_loc_generated_files(doth_fh, dotc_fh, src_root_dir,
-                                          loc_dotc,
-                                          dump_dup_files, verbose)
+        (result.max_file_num, result.max_num_lines, result.file_w_max_num_lines,
+         result.file_table) = gen_loc_generated_files(doth_fh, dotc_fh, root_scans,
+                                                      config.dump_dup_files,
+                                                      config.verbose, funcs_fh,
+                                                      index_map)
 
         gen_doth_include_guards(doth_fh, loct_doth, False)
-        if verbose:
-            fprintf(sys.stdout, 'Generated ' + full_loct_doth + '\n')
-            fprintf(sys.stdout, 'Generated ' + full_loc_dotc + '\n')
+
+        result.add(config.inc_dirname + '/' + loct_doth, doth_fh.getvalue())
+        result.add(src_dirname + '/' + loc_dotc, dotc_fh.getvalue())
+        if funcs_fh is not None:
+            result.add(src_dirname + '/' + loc_funcs_dotc, funcs_fh.getvalue())
+
+    # -----------------------------------------------------------------------
+    # Size the LOC-ID's split of bits between file-index and line-number to
+    # the code base just scanned.
+    try:
+        (nbits_files, nbits_lines) = xform.loc_compute_nbits(result.max_file_num,
+                                                             result.max_num_lines)
+    except ValueError as exc:
+        raise LocGenError(str(exc)) from exc
+    (result.nbits_files, result.nbits_lines) = (nbits_files, nbits_lines)
+
+    # -----------------------------------------------------------------------
+    # Generate the binary manifest of the file-names table, for decoders
+    # that wish to mmap() it rather than parse / compile loc_filenames.c
+    with loc_profile_phase(profile, 'manifest', num_src_files):
+        result.add(src_dirname + '/' + locm.LOC_MANIFEST_FILE,
+                   locm.loc_manifest_bytes(result.file_table, nbits_files, nbits_lines))
+
+    # -----------------------------------------------------------------------
+    # Generate the per-file shards of LOC_FILE_INDEX of live files, if so
+    # asked. Unchanged shards are not re-written, so their files are not
+    # recompiled. The manifest listing them tells the next run which shards
+    # it may remove, once stale.
+    if shards_dirname is not None:
+        deleted_names = {} if index_map is None else index_map.deleted_names()
+        with loc_profile_phase(profile, 'shards', num_src_files):
+            for (shard_file, contents) in gen_loc_index_shards(shards_dirname,
+                                                               result.file_table,
+                                                               deleted_names).items():
+                result.add(shard_file, contents)
+                result.shards.add(shard_file)
+            result.add(os.path.join(shards_dirname, LOC_SHARDS_MANIFEST),
+                       gen_loc_shards_manifest(shards_dirname, result.shards))
 
     # -----------------------------------------------------------------------
     # Generate the main header file that other code consuming this LOC machinery
     # will need to include. Required macros and lookup stuff live in this file.
-    loc_doth = "loc.h"
-    full_loc_doth = inc_dirname + '/' + loc_doth
-    with open(full_loc_doth, 'w', encoding="utf8") as doth_fh:
+    # It is only re-written if changed, as every file using LOC depends on it.
+    loc_doth = LOC_DOTH
+    with loc_profile_phase(profile, 'loc_doth'):
+        doth_fh = io.StringIO()
         gen_loc_file_banner_msg(doth_fh, src_root_dir, loc_doth)
         gen_doth_include_guards(doth_fh, loc_doth, True)
 
-        gen_loc_interface_doth(doth_fh, loc_dotc)
+        gen_loc_interface_doth(doth_fh, loc_dotc, nbits_files, nbits_lines,
+                               gen_func_ranges, shards_dirname is not None)
 
         gen_doth_include_guards(doth_fh, loc_doth, False)
-        if verbose:
-            fprintf(sys.stdout, 'Generated ' + full_loc_doth + '\n')
+        result.add(config.inc_dirname + '/' + loc_doth, doth_fh.getvalue())
 
-    # -----------------------------------------------------------------------
-    # Generate the LOC-decoding program, used as helper utility program
-    src_root_base = os.path.basename(src_root_dir)
-    loc_decode_bin = src_root_base + "_" + "loc"
-    loc_decode_dotc = loc_decode_bin + ".c"
-
-    # Even though generated .h/.c files may be in project's source-tree,
-    # generate the compiled decoder binary always in /tmp, as we don't know
-    # what the project's build-area dir-rules may be.
-    full_loc_decode_dotc = tmp_dir + loc_decode_dotc
-
-    with open(full_loc_decode_dotc, 'w', encoding="utf8") as loc_fh:
-        gen_loc_file_banner_msg(loc_fh, src_root_dir, loc_decode_dotc)
-        gen_loc_decoder(loc_fh, max_file_num, loc_doth, loc_dotc, loc_decode_dotc,
-                        loc_decode_bin)
-
-        if verbose:
-            fprintf(sys.stdout, 'Generated ' + full_loc_decode_dotc + '\n')
-
-    # Pick up the decoder's source from tmp but use the user-specified
-    # dir-name for output LOC-binary location.
-    cc_rc = gen_cc_loc_decoder(tmp_dir, loc_dirname, loc_decode_bin,
-                               loc_decode_dotc,
-                               full_loct_doth, full_loc_doth,
-                               full_loc_dotc, loc_debug)
-    if verbose:
-        if cc_rc == 0:
-            fprintf(sys.stdout, 'Generated ' + loc_dirname + loc_decode_bin + '\n')
-        else:
-            fprintf(sys.stderr, 'Failed to generate ' + loc_dirname + loc_decode_bin + '\n')
-
-    if cc_rc != 0:
-        sys.exit(1)
-
-    if gen_cflags or gen_cflags_brief:
-        gen_loc_cflags(gen_cflags_brief)
-
-    return (True, max_file_num, max_num_lines, file_w_max_num_lines)
-    # pylint: enable-msg=too-many-statements
+    return result
     # pylint: enable-msg=too-many-locals
 
 ###############################################################################
@@ -208,11 +710,23 @@ def loc_parse_args(args):
 ''')
 
     # Define arguments supported by this script
-    parser.add_argument('--src-root-dir', dest='src_root_dirname'
+    parser.add_argument('--src-root-dir', dest='src_root_dirnames'
                         , metavar='<src-root-dir>'
-                        , required=True
-                        , default=LOC_PKGSRC_DIR
-                        , help='Source root dir name, default: ' + LOC_PKGSRC_DIR)
+                        , action='append'
+                        , help='Source root dir name. Can be specified multiple'
+                                + ' times, for a product built from several source'
+                                + ' trees: all roots are scanned in parallel into'
+                                + ' one file-names table, with file names'
+                                + ' qualified by their root\'s name.')
+
+    parser.add_argument('--batch', dest='batch_file'
+                        , metavar='<batch-file>'
+                        , default=None
+                        , help='Generate several targets in one run. Each line'
+                                + ' of this file has one target\'s arguments,'
+                                + ' e.g. --src-root-dir <dir> --gen-includes-dir'
+                                + ' <dir>; \'#\' starts a comment. Source roots'
+                                + ' shared by targets are scanned once.')
 
     parser.add_argument('--gen-cflags', dest='gen_cflags'
                         , action='store_true'
@@ -241,8 +755,142 @@ def loc_parse_args(args):
                         , metavar='<LOC-decoder-binary-dir>'
                         , default=None
                         , help='Project-specific standalone LOC decoder binary'
-                                + ' dir name, default: '
-                                + tempfile.gettempdir())
+                                + ' dir name, default: the temp dir, e.g. '
+                                + LOC_DBG_GENFILESDIR)
+
+    parser.add_argument('--no-decoder', dest='gen_decoder'
+                        , action='store_false'
+                        , default=True
+                        , help='Do not generate and compile the project-specific'
+                                + ' standalone LOC decoder binary.')
+
+    parser.add_argument('--gen-func-ranges', dest='gen_func_ranges'
+                        , action='store_true'
+                        , default=False
+                        , help='Scan source files for function definitions, and generate '
+                                + locf.LOC_FUNC_RANGES_DOTC + ', to decode LOC-IDs to their'
+                                + ' enclosing function.')
+
+    parser.add_argument('--gen-index-shards', dest='shards_dirname'
+                        , metavar='<index-shards-dir>'
+                        , default=None
+                        , help='Generate, for each source file, a shard defining'
+                                + ' just its LOC_FILE_INDEX: <dir>/<file-name>.h, to'
+                                + ' compile the file with -include, and'
+                                + ' <dir>/<file-name>.rsp, to compile it with @<rsp>.'
+                                + ' <file-name> is as listed in loc_filenames.c'
+                                + '. The generated loc.h then does not #include'
+                                + ' loc_tokens.h. The shards generated are listed in'
+                                + ' <dir>/' + LOC_SHARDS_MANIFEST + ', and those of'
+                                + ' a previous run no longer generated are removed.'
+                                + ' <dir> must not be, nor contain, the'
+                                + ' --gen-includes-dir or --gen-source-dir.')
+
+    parser.add_argument('--index-map', dest='index_map_file'
+                        , metavar='<index-map-file>'
+                        , default=None
+                        , help='Persisted map of file names to file-indexes.'
+                                + ' Files keep their index across runs, new files'
+                                + ' get fresh indexes, and deleted files leave'
+                                + ' tombstones. Created if it does not exist.'
+                                + ' Default: Number files in sorted order.')
+
+    parser.add_argument('--compact-index-map', dest='compact_index_map'
+                        , action='store_true'
+                        , default=False
+                        , help='Renumber files in the --index-map densely, dropping'
+                                + ' tombstones of deleted files. Changes LOC-IDs,'
+                                + ' so rebuild everything afterwards.')
+
+    parser.add_argument('--decoder-cache-dir', dest='decoder_cache_dirname'
+                        , metavar='<decoder-cache-dir>'
+                        , default=None
+                        , help='Dir where compiled LOC decoder binaries are cached,'
+                                + ' keyed on a hash of their generated sources and'
+                                + ' of the compiler. The dir must be owned, and only'
+                                + ' writable, by the user; the least recently used'
+                                + ' binaries are evicted. Default: '
+                                + locu.loc_user_cache_dir(LOC_DECODER_CACHE_DIR))
+
+    parser.add_argument('--cache-file', dest='cache_file'
+                        , metavar='<scan-cache-file>'
+                        , default=None
+                        , help='Persistent scan-cache file. Line-counts of source'
+                                + ' files unchanged since the previous run are'
+                                + ' reused from this cache. Default: no cache.')
+
+    parser.add_argument('--discover', dest='discover'
+                        , choices=locd.LOC_DISCOVER_METHODS
+                        , default='walk'
+                        , help='How to discover source files under <src-root-dir>:'
+                                + ' walk the dir-tree, list files in the git index,'
+                                + ' read a compile_commands.json, or read a list'
+                                + ' of file names from stdin. Default: walk')
+
+    parser.add_argument('--compile-commands', dest='compile_commands'
+                        , metavar='<compile_commands.json>'
+                        , default=None
+                        , help='Compilation database for --discover compile-commands.'
+                                + ' Default: <src-root-dir>/compile_commands.json')
+
+    parser.add_argument('--exclude-dir', dest='exclude_dirs'
+                        , metavar='<dir-glob>'
+                        , action='append'
+                        , default=None
+                        , help='Skip sub-dirs whose name or path relative to'
+                                + ' <src-root-dir> matches this glob pattern,'
+                                + ' e.g. build, third_party, \'*/generated\'.'
+                                + ' Can be specified multiple times.')
+
+    parser.add_argument('--exclude', dest='excludes'
+                        , metavar='<file-glob>'
+                        , action='append'
+                        , default=None
+                        , help='Skip source files whose name or path relative to'
+                                + ' <src-root-dir> matches this glob pattern.'
+                                + ' Can be specified multiple times.')
+
+    parser.add_argument('--jobs', dest='jobs'
+                        , metavar='<N>'
+                        , type=int
+                        , default=1
+                        , help='Number of worker threads used to count lines'
+                                + ' of source files. 0 uses all CPUs. Default: 1')
+
+    parser.add_argument('--watch', dest='watch'
+                        , action='store_true'
+                        , default=False
+                        , help='After generating, keep running: poll the source'
+                                + ' tree for added, removed or renamed source files,'
+                                + ' and re-generate when the set of files changes.'
+                                + ' Needs --discover walk.')
+
+    parser.add_argument('--watch-interval', dest='watch_interval'
+                        , metavar='<secs>'
+                        , type=float
+                        , default=LOC_WATCH_INTERVAL
+                        , help='Seconds between polls of the source tree, with'
+                                + ' --watch. Default: ' + str(LOC_WATCH_INTERVAL))
+
+    parser.add_argument('--watch-timeout', dest='watch_timeout'
+                        , metavar='<secs>'
+                        , type=float
+                        , default=None
+                        , help='Stop watching after these many seconds.'
+                                + ' Default: Watch until interrupted.')
+
+    parser.add_argument('--profile', dest='profile_file'
+                        , metavar='<profile.json>'
+                        , default=None
+                        , help='Write a JSON record of the wall time, CPU time,'
+                                + ' files and bytes read of each phase of the run'
+                                + ' to this file; \'-\' for stdout.')
+
+    parser.add_argument('--profile-cprofile', dest='cprofile_file'
+                        , metavar='<pstats-file>'
+                        , default=None
+                        , help='Profile the run with cProfile, and save its'
+                                + ' pstats output to this file.')
 
     # ======================================================================
     # Debugging support
@@ -269,581 +917,6 @@ def loc_parse_args(args):
     return parsed_args
 
 
-###############################################################################
-def gen_loc_generated_files(doth_fh, dotc_fh, src_root_dir, loc_dotc,
-                            dump_dup_files, verbose):
-    """
-    Function to drive the generation of the generated files:
-        $TMPDIR/loc.h
-        $TMPDIR/loc_filenames.c
-
-    Walk the source directory tree under 'src_root_dir', identifying all .c
-    files, and build a dictionary of file_names. The list of file names and
-    the associated tokens are generated off a common listing of files built
-    here. Hence, this function takes both doth_fh & dotc_fh as inputs.
-
-    Arguments:
-        dotc_fh          - File handle for generated .h file
-        dotc_fh          - File handle for generated .c file
-        src_root_dir     - Top-level source root-dir to run a 'find' for .c files
-        loc_dotc         - Name of generated loc_filenames.c file
-        dump_dup_files   - Boolean; Dump list of dup file names found
-        verbose          - Boolean; Print verbose messages for debugging
-
-    Returns: (number-of-files, max-num-lines-across-all-files,
-              file-with-max-lines)
-    """
-    # pylint: disable-msg=too-many-arguments
-    # pylint: disable-msg=too-many-locals
-
-    # Hash on file's base name as key, mapping it to full-name w/dir-path
-    file_names = {}
-    file_lines = {} # of lines in the file
-
-    # Hash to collect any duplicate filenames, that are renamed below
-    dup_file_names = {}
-
-    num_files = 0
-    max_num_lines = 0
-    file_w_max_num_lines = ""
-
-    # Grab code-base source's root-dir. This way, if user runs this script with
-    # '~/Code/<someProduct>', then we only store the file-names as:
-    # <someProduct>/dir1/file1, <someProduct>/dir2/file2, and so on ...
-    # src_root_base will be 'someProduct'
-    src_root_base = os.path.basename(src_root_dir)
-
-    # ########################################################################
-    # Run 'find' on the source-tree rooted at src_root_dir, finding all .c files
-    for root, dirs, files in os.walk(src_root_dir):
-        # Ensure list of files is sorted, so we get a consistent numbering on
-        # all platforms, in case the product is supported on diff OS'es
-        dirs.sort()
-
-        for file in sorted(files):
-
-            # Skip files that are not .c source files
-            if (file.endswith('.c') is False
-               and file.endswith('.cpp') is False
-               and file.endswith('.cc') is False):
-                continue
-
-            # IF user has asked to generate *.c files in the same src-dir
-            # that is being processed, we will come upon loc_filenames.c also.
-            # Skip it.
-            if file == loc_dotc:
-                continue
-
-            # Munge file name to sort dups, and build full-path name
-            # root: ~/Code/someProduct/some-Dir/some-subDir
-            # Strip out prefix, to just grab: 'some-Dir/some-subDir'
-            root_dirname = root.replace(src_root_dir, "", 1)
-
-            file_base_name = file
-            file_full_name = src_root_base + root_dirname + "/" + file
-
-            if file in file_names:
-
-                # print(  "Skip duplicate file " + file
-                #       + " (Found: " + file_names[file_base_name] + ")")
-
-                # Extend the file's name to include the sub-dir's name.
-                # This should more than likely eliminate the duplicate
-                file_base_name = os.path.basename(root) + "_" + file
-
-                dup_file_names[file_base_name] = file_full_name
-
-            file_names[file_base_name] = file_full_name
-
-            num_lines = count_lines(root + "/" + file, verbose)
-            file_lines[file_base_name] = num_lines
-            if num_lines > max_num_lines:
-                max_num_lines = num_lines
-                file_w_max_num_lines = src_root_base + root_dirname + "/" + file
-
-            num_files += 1
-
-    # ########################################################################
-    # Using the hash of filenames, process the list of files to get the max
-    # filename length. This will used to auto-format the token in .h file.
-    #
-    (max_key_name, max_file_name) = find_max_name_lengths(file_names)
-    max_file_name = max_file_name + 1   # Add an extra space
-
-    gen_loc_doth_tokens(doth_fh, file_names, max_key_name, num_files, file_lines)
-
-    # Generate the file names in the array of file names
-    gen_loc_dotc_filenames(dotc_fh, file_names, max_file_name, file_lines)
-
-    if dump_dup_files:
-        pr_dup_file_names(dup_file_names)
-
-    return (num_files, max_num_lines, file_w_max_num_lines)
-    # pylint: enable-msg=too-many-locals
-    # pylint: enable-msg=too-many-arguments
-
-###############################################################################
-def gen_loc_doth_tokens(doth_fh, file_names, max_key_namelen, num_files, file_lines):
-    """
-    Generate the #define mnemonics for each file's file-name-index
-
-    Arguments:
-        doth_fh     - File handle to output to
-        file_names  - Hash of file names
-        maxKeyName  - Max key-name length (.c file's basename is key)
-        num_files   - # of files (expected to find) in hash file_names
-        file_lines  - Hash of file's line-count, on file name
-    """
-    # pylint: disable-msg=too-many-locals
-
-    # Print this as a comment right at the beginning, for ease of readability.
-    fprintf(doth_fh, "// LOC_MAX_FILE_NUM=%d   ... "
-                     + "Used to update generated file in the source tree.\n\n",
-            num_files)
-
-    # In #define, we prepend 'LOC_'. Account for that in field's width.
-    # Print format will be, e.g.: "#define %-37s %-5d // %s \n"
-    max_name_field_width = max_key_namelen + len("LOC_")
-
-    # pylint: disable-msg=line-too-long
-    token_printfmt = "#define %-" + str(max_name_field_width) + "s %-5d // %s: L=%d (line count)\n"
-    # pylint: enable-msg=line-too-long
-
-    fctr = 0
-    unknown_file = "Unknown_file"
-
-    fprintf(doth_fh, token_printfmt, "LOC_UNKNOWN_FILE", fctr, unknown_file, 0)
-
-    max_line_count = 0
-    token_printfmt = "#define %-" + str(max_name_field_width) + "s %-5d // %s: L=%d\n"
-    dup_printfmt = "// #define %-" + str(max_name_field_width - 3) + "s %-5d // %s: L=%d\n"
-
-    unique_tokens = set() # To eliminate duplicate generated tokens
-
-    printfmt = token_printfmt
-    num_dup_tokens = 0
-    for file in sorted(file_names.keys()):
-        fctr += 1
-
-        file_full_name = file_names[file]
-
-        # Generate the LOC_<token>, replacing '.' and '-' with "_"
-        fname_token = xform_fname_to_token(file)
-        if fname_token in unique_tokens:
-            printfmt = dup_printfmt
-            num_dup_tokens += 1 # Expect that likelihood of finding dups is very low
-        else:
-            # Save-off generated tokens to eliminate duplicates.
-            unique_tokens.add(fname_token)
-
-        fprintf(doth_fh, printfmt, fname_token, fctr, file_full_name, file_lines[file])
-
-        printfmt = token_printfmt
-
-        if file_lines[file] > max_line_count:
-            max_line_count = file_lines[file]
-
-    fprintf(doth_fh, "\n")
-    fprintf(doth_fh, token_printfmt, "LOC_MAX_FILE_NUM", fctr, "LOC MAX LINE COUNT",
-            max_line_count)
-
-    fprintf(doth_fh, token_printfmt, "LOC_NUM_FILES",
-            (fctr + 1), "Size of filenames lookup array",
-            0)
-    # pylint: enable-msg=too-many-locals
-
-###############################################################################
-def gen_loc_interface_doth(doth_fh, loc_dotc):
-    """
-    Generate the external interfaces for this LOC-machinery.
-    The limits are a bit hard-coded for now. This will be enhanced to scale
-    the number of bits depending on source code base processed.
-
-    Arguments:
-        doth_fh     - File handle to output to
-        loc_dotc    - Name of generated dot-c file
-    """
-
-    fprintf(doth_fh, "#include <inttypes.h>    /* Needed for uint32_t */\n")
-    fprintf(doth_fh, "#include \"loc_tokens.h\"\n\n")
-
-    nbits_files = 15
-    fprintf(doth_fh,
-            "#define LOC_NBITS_FILES %d       // # of bits for file-index component.\n",
-            nbits_files)
-
-    nbits_lines = 16
-    fprintf(doth_fh,
-            "#define LOC_NBITS_LINES %d       // # of bits for line-number component.\n",
-            nbits_lines)
-
-    # Masks are meant for internal use; hence LOC__
-    files_mask = (1 << nbits_files) -  1
-    fprintf(doth_fh,
-            "#define LOC__MASK_FILES 0x%x   // %d: Mask to extract file-index component.\n",
-            files_mask, files_mask)
-
-    lines_mask = (1 << nbits_lines) -  1
-    fprintf(doth_fh,
-            "#define LOC__MASK_LINES 0x%x   // %d: Mask to extract line-number component.\n",
-            lines_mask, lines_mask)
-
-    fprintf(doth_fh, "\ntypedef uint32_t loc_t;\n")
-
-    fprintf(doth_fh, "\n/* Encode a (f=file-index, l=line-number) into a loc_t value */\n")
-    fprintf(doth_fh, "#define LOC_ENCODE(f,l) (loc_t) (((f) << LOC_NBITS_LINES) | (l))\n")
-
-    fprintf(doth_fh, "\n/* Encode a (file-index, __LINE__) into a loc_t value */\n")
-    fprintf(doth_fh, "#define __LOC__ LOC_ENCODE(LOC_FILE_INDEX, __LINE__)\n")
-
-    fprintf(doth_fh, "\n/* Extract file-index from an encoded loc_t value */\n")
-    fprintf(doth_fh, "#define LOC_FILE_TOKEN(v) ((v) >> LOC_NBITS_LINES)\n")
-
-    fprintf(doth_fh, "\n/* External reference to lookup array defined in %s */\n",
-            loc_dotc)
-    fprintf(doth_fh, "extern const char *Loc_FileNamesList [];\n")
-
-
-    # pylint: disable-msg=line-too-long
-    fprintf(doth_fh, "\n/* Safe-accessor at index 'i' from string-lookup array, 'lt', of size 'n'. */\n")
-
-    fprintf(doth_fh, "#define LOC__SAFE_LOOKUP(lt, i, n) ")
-    fprintf(doth_fh, "    ((((i) >= 0) && ((i) < (n))) ? (lt)[(i)] : (const char *) \"\")\n")
-
-    fprintf(doth_fh, "\n/* Extract file-name from an encoded loc_t value */\n")
-    fprintf(doth_fh, "#define LOC_FILE(v) LOC__SAFE_LOOKUP(Loc_FileNamesList, LOC_FILE_TOKEN(v), LOC_NUM_FILES)\n")
-
-    fprintf(doth_fh, "\n/* Extract line-number from an encoded loc_t value */\n")
-    fprintf(doth_fh, "#define LOC_LINE(v) ((v) & LOC__MASK_LINES)\n")
-    # pylint: enable-msg=line-too-long
-
-
-###############################################################################
-def gen_loc_dotc_filenames(dotc_fh, file_names, max_file_name, file_lines):
-    """
-    Generate the static array of file names to the generated .c file. This is
-    where the meat of the work happens.
-
-    Arguments:
-        dotc_fh         - File handle to output to
-        file_names      - Hash of file names
-        max_file_name   - Max file-name-length
-        file_lines      - Hash of file's line-count, on file name
-    """
-
-    # Generate start of const char * filenames lookup array
-    gen_loc_file_names_array(dotc_fh, True)
-
-    fctr = 0
-    unknown_file = "Unknown_file"
-
-    # Now that we know the max file name length, generate the print format
-    # First '%s' is the file name, 2nd '%s' is generated spaces for alignment
-    dotc_print_fmt = '      "%s" %s// %d, L=%d (line count)\n'
-
-    # Generate the 0th entry for the unknown-file name
-    spaces = ' ' * (max_file_name - len(unknown_file))
-    fprintf(dotc_fh, dotc_print_fmt, unknown_file, spaces, fctr, 0)
-
-    # Redefine print fmt to have subsequent files separated by ", <filename>"
-    dotc_print_fmt = '    , "%s" %s// %d, L=%d\n'
-
-    size_of_string_array = 0
-    for file in sorted(file_names.keys()):
-        fctr += 1
-
-        file_full_name = file_names[file]
-
-        # Generate spaces to blank-pad generated name for alignment
-        spaces = ' ' * (max_file_name - len(file_full_name))
-
-        size_of_string_array += len(file_full_name)
-
-        fprintf(dotc_fh, dotc_print_fmt, file_full_name, spaces, fctr, file_lines[file])
-
-    # Generate closing of filenames lookup array
-    gen_loc_file_names_array(dotc_fh, False)
-
-    # Include n-ptrs in the total space consumed by this array.
-    size_of_string_array += (fctr * 8)
-
-    fprintf(dotc_fh, "\n/* Overhead of FilenamesList[] array"
-                     + ": %d bytes (%.f KB) */\n\n",
-                     size_of_string_array, (size_of_string_array / 1024.0))
-
-    filenames_list_len_str = "(sizeof(Loc_FileNamesList)/sizeof(*Loc_FileNamesList))"
-    fprintf(dotc_fh, "\nint Loc_FileNamesList_len = "
-                     + filenames_list_len_str + ";\n\n")
-
-    # fprintf(dotc_fh, "COMPILE_TIME_ASSERT(("
-    #                  + filenames_list_len_str
-    #                  + " == LOC_MAX_FILE_NUM + 1), "LengthOfFileNamesListArrayIsIncorrect");\n")
-    fprintf(dotc_fh,"// clang-format on\n")
-
-
-###############################################################################
-def gen_loc_decoder(loc_fh, max_file_num, loc_doth, loc_dotc, loc_decode_dotc, loc_decode_bin):
-    """
-    Generate the stand-alone LOC-decoder program's source code.
-    This is just a stand-alone main(), linked with the .c file containing the
-    definition of Loc_FileNamesList[] lookup array.
-
-    Arguments:
-        loc_fh          - File handle to generate .c file
-        max_file_num    - Max file-number found by generation step
-        loc_doth        - Name of LOC #include .h file
-        loc_dotc        - Name of LOC .c file containing defn of Loc_FileNamesList[]
-        loc_decode_dotc - Name of LOC-decode program's source file name
-        loc_decode_bin  - Name of LOC-decode binary program
-    """
-    # pylint: disable-msg=too-many-arguments
-    # pylint: disable-msg=too-many-statements
-    fprintf(loc_fh, "/*\n")
-    fprintf(loc_fh, " * To generate the LOC decoding program for this code-base, do:\n")
-    fprintf(loc_fh, " *   cc -o %s %s %s\n", loc_decode_bin, loc_dotc, loc_decode_dotc)
-    fprintf(loc_fh, " */\n")
-
-    fprintf(loc_fh, "#include <stdio.h>\n")
-    fprintf(loc_fh, "#include <stdint.h>\n")
-    fprintf(loc_fh, "#include <stdlib.h>\n")
-    fprintf(loc_fh, "#include <string.h>\n")
-    fprintf(loc_fh, "#include \"%s\"\n", loc_doth)
-
-    fprintf(loc_fh, "// clang-format off\n")
-
-    fprintf(loc_fh, "\nint\n")
-    fprintf(loc_fh, "main(int argc, char *argv[])\n")
-    fprintf(loc_fh, "{\n")
-
-    # Generate basic help/usage, custom-fit for code-base being LOC'ified
-    fprintf(loc_fh, "    if (argc <= 1) {\n")
-    fprintf(loc_fh, "        printf(\"Usage: %%s [--brief] [<loc-ID-values>+]"
-                                    + "\\n\", argv[0]);\n")
-    fprintf(loc_fh, "        printf(\"Max-file-number: %d\\n\");\n", max_file_num)
-    # pylint: disable-msg=line-too-long
-    fprintf(loc_fh, "        printf(\"Examples: Specify LOC-encoded value you wish to decode.\\n\");\n")
-    # pylint: enable-msg=line-too-long
-    fprintf(loc_fh, "        printf(\"  %s [<uint32-value>]+\\n\");\n", loc_decode_bin)
-
-    # Generate some sample encoding values
-    nbits_lines = 16
-    if max_file_num == 1:
-        file_num = 1
-        line_num = 4
-        loc1 = (file_num << nbits_lines) | line_num
-
-        line_num = 5
-        loc2 = (file_num << nbits_lines) | line_num
-
-        line_num = 10
-        loc3 = (file_num << nbits_lines) | line_num
-
-        line_num = 17
-        loc4 = (file_num << nbits_lines) | line_num
-    elif max_file_num == 2:
-        file_num = 1
-        line_num = 4
-        loc1 = (file_num << nbits_lines) | line_num
-
-        line_num = 5
-        loc2 = (file_num << nbits_lines) | line_num
-
-        file_num = 2
-        line_num = 10
-        loc3 = (file_num << nbits_lines) | line_num
-
-        line_num = 17
-        loc4 = (file_num << nbits_lines) | line_num
-    else:
-        file_num = 1
-        line_num = 4
-        loc1 = (file_num << nbits_lines) | line_num
-
-        file_num = 5
-        line_num = 123
-        loc2 = (file_num << nbits_lines) | line_num
-
-        file_num = 6
-        line_num = 223
-        loc3 = (file_num << nbits_lines) | line_num
-
-        file_num = 6
-        line_num = 224
-        loc4 = (file_num << nbits_lines) | line_num
-
-    fprintf(loc_fh, "        printf(\"  %s %u %u %u %u\\n\");\n",
-            loc_decode_bin, loc1, loc2, loc3, loc4)
-
-    # Show an example of generating LOC using encoding macro, using diff
-    # file numbers, depending on the source code-base processed.
-    file_numbers= []
-    if max_file_num == 1:
-        file_numbers = [1, 1, 1, 1]
-    elif max_file_num == 2:
-        file_numbers = [1, 1, 2, 2]
-    else:
-        file_numbers = [1, 5, 6, 8]
-
-    fprintf(loc_fh, "        printf(\"  %s %%u %%u %%u %%u\\n\", %s, %s, %s, %s);\n",
-            loc_decode_bin,
-            "LOC_ENCODE(" + str(file_numbers[0]) + ", 10)",
-            "LOC_ENCODE(" + str(file_numbers[1]) + ", 30)",
-            "LOC_ENCODE(" + str(file_numbers[2]) + ", 31)",
-            "LOC_ENCODE(" + str(file_numbers[3]) + ", 44)")
-
-    fprintf(loc_fh, "        return(0);\n")
-    fprintf(loc_fh, "    }\n")
-
-    fprintf(loc_fh, "\n")
-
-    # Parse the --brief arg supplied at run-time
-    fprintf(loc_fh, "    int brief = (strncmp(argv[1], \"--brief\", 7) == 0);\n")
-
-    # If the decoder's 1st arg is --brief, start iterating from next arg
-    # to decode args assuming they are loc-IDs.
-    fprintf(loc_fh, "    int i = brief + 1;\n")
-
-    # Generate the actual body of the decoder's source.
-    fprintf(loc_fh, "    for (; i < argc; i++) {\n")
-    fprintf(loc_fh, "        loc_t loc = atoi(argv[i]);\n")
-    fprintf(loc_fh, "        if (brief) {\n")
-    fprintf(loc_fh, "            printf(\"%%s:%%d \\n\", LOC_FILE(loc), LOC_LINE(loc));\n")
-    fprintf(loc_fh, "        } else { \n")
-    fprintf(loc_fh, "            printf(\"%%u: [fnum=%%d] %%s:%%d \\n\",\n")
-    fprintf(loc_fh, "                   loc, LOC_FILE_TOKEN(loc), LOC_FILE(loc), LOC_LINE(loc));\n")
-    fprintf(loc_fh, "        }\n")
-    fprintf(loc_fh, "   }\n")
-    fprintf(loc_fh, "}\n")
-
-    fprintf(loc_fh, "\n// clang-format on\n")
-    # pylint: enable-msg=too-many-statements
-    # pylint: enable-msg=too-many-arguments
-
-# #############################################################################
-# pylint: disable-msg=line-too-long
-# Ref: https://stackoverflow.com/questions/20388992/python-nice-way-to-iterate-over-shell-command-result
-#      https://stackoverflow.com/questions/25079140/subprocess-popen-checking-for-success-and-errors
-#      https://stackoverflow.com/questions/21406887/subprocess-changing-directory
-#      https://stackoverflow.com/questions/32984058/ld-cant-open-output-file-for-writing-bin-s-errno-2-for-architecture-x86-64
-# pylint: enable-msg=line-too-long
-# #############################################################################
-def gen_cc_loc_decoder(tmpdir, loc_dirname, loc_decode_bin, loc_decode_dotc,
-                       full_loct_doth, full_loc_doth, full_loc_dotc,
-                       loc_debug) -> int:
-    # pylint: disable-msg=too-many-arguments
-    """
-    Compile the generated loc-decoder source file to generate the LOC-decoder
-    binary, specific for the code-base being processed.
-
-    Parameters:
-        tmpdir          - /tmp-dir where decoder binary will be produced
-        loc_decode_bin  - Decoder-binary name
-        loc_decode_dotc - Decoder-binary's .c file name
-        full_loct_doth  - Full path-name of generated loc_tokens.h
-        full_loc_doth   - Full path-name of generated loc.h
-        full_loc_dotc   - Full path-name of generated loc_filenames.c
-    Returns: 0 upon success, non-zero otherwise
-    """
-
-    # User may have generated filenames.c in some other src-dir. We don't want
-    # to pollute the user's src/ tree by generating objects. If user has not
-    # used cmdline args to relocate generated files to somewhere other than
-    # /tmp-dir, cp over to /tmp-dir the files required to compile the standalone
-    # decoder binary.
-    if os.path.dirname(full_loct_doth) + '/' != tmpdir:
-        shutil.copy2(full_loct_doth, tmpdir)
-    if os.path.dirname(full_loc_doth) + '/' != tmpdir:
-        shutil.copy2(full_loc_doth, tmpdir)
-    if os.path.dirname(full_loc_dotc) + '/' != tmpdir:
-        shutil.copy2(full_loc_dotc, tmpdir)
-
-    tmp_loc_dotc = os.path.basename(full_loc_dotc)
-
-    if loc_debug:
-        print(  "tmp_loc_dotc    = " + tmp_loc_dotc + "\n"
-              + "loc_decode_dotc = " + loc_decode_dotc + "\n"
-              + "loc_dirname     = " + loc_dirname + "\n"
-              + "loc_decode_bin  = " + loc_decode_bin)
-
-    try:
-        result = sp.run(["cc", "-o", loc_dirname + loc_decode_bin,
-                          "-I" , tmpdir,
-                          tmpdir + tmp_loc_dotc,
-                          tmpdir + loc_decode_dotc
-                          ],
-                          text=True,
-                          check=True,
-                          capture_output=True, cwd=tmpdir
-                          )
-    except sp.CalledProcessError as exc:
-        print("sp.run() Status: FAIL, rc=", exc.returncode,
-              "\nargs=", exc.args,
-              "\nstdout=", exc.stdout,
-              "\nstderr=", exc.stderr)
-        return 1
-
-    return result.returncode
-    # pylint: enable-msg=too-many-arguments
-
-###############################################################################
-def gen_doth_include_guards(doth_fh, file_name, begin_block):
-    """
-    Generate ifndef directives to guard against multiple .h file inclusions
-    """
-
-    # Build guard_name as '__LOC__'
-    guard_name = "__" + os.path.basename(file_name).upper() + "__"
-    guard_name = guard_name.replace(".", "_")
-
-    doth_fh.write("\n")
-    if begin_block:
-        doth_fh.write("// clang-format off\n")
-        doth_fh.write('''#ifndef ''' + guard_name)
-        doth_fh.write("\n")
-        doth_fh.write("\n")
-    else:
-        doth_fh.write("// clang-format off\n")
-        doth_fh.write("#endif  /* " + guard_name + " */")
-        doth_fh.write("\n")
-
-###############################################################################
-def gen_loc_file_names_array(dotc_fh, array_begin):
-    """
-    Generate start and end of the Loc_FileNames[] array definition
-    """
-    if array_begin:
-        dotc_fh.write("// clang-format off\n")
-        dotc_fh.write("const char *Loc_FileNamesList [] =\n{\n")
-    else:
-        dotc_fh.write("\n};\n")
-
-###############################################################################
-def gen_loc_file_banner_msg(file_hdl, src_dir, file_name):
-    """
-    Function to generate the banner for a generated file
-
-    Arguments:
-        file_hdl    - File handle for generated .h/.c file
-        src_dir     - Full path to source code root dir
-        file_name   - Generated .h file's name
-    """
-
-    file_hdl.write('''/*
- * ****************************************************************************
- * ''' + file_name + '''
- *
- * WARNING: This is a generated file.
- * Any change you make here will be overwritten!
- *
- * This file was generated by processing all source files under
- *     ''' + src_dir + '''
- *
- * Script executed:
- * ''' + __file__ + '''
- * ****************************************************************************
- */
-''')
-
 ###############################################################################
 def gen_loc_cflags(brief):
     """
@@ -867,27 +940,6 @@ def gen_loc_cflags(brief):
     else:
         print("CFLAGS =",cflags_clause)
 
-###############################################################################
-def find_max_name_lengths(file_names):
-    """
-    Helper function for auto-formatting output for readability.
-    Walk an input hash of file names, and find out the max key-name length
-    and max filename-length.
-
-    Arguments:
-        file_names - Hash of files found, key is files' base name
-
-    Return (max-key-name-length, max-file-name-length)
-    """
-
-    max_key_name  = 0
-    max_file_name = 0
-    for file in file_names.keys():
-        max_key_name = max(max_key_name, len(file))
-        max_file_name = max(max_file_name, len(file_names[file]))
-
-    return(max_key_name, max_file_name)
-
 ###############################################################################
 # Helper routines:
 ###############################################################################
@@ -899,71 +951,15 @@ def print_loc_vars(tmp_dir, src_root_dir, inc_dirname, src_dirname):
     print("src_dirname   = ", src_dirname)
 
 ###############################################################################
-def loc_validate_args(src_root_dir, inc_dirname, src_dirname):
-    """
-    Validate sanity of parsed arguments., to see, e.g., if specified directory exists
-    """
-    if locu.dir_exists(src_root_dir) is False:
-        return False
-
-    if locu.dir_exists(inc_dirname) is False:
-        return False
-
-    if locu.dir_exists(src_dirname) is False:
-        return False
-
-    return True
-
-# ------------------------------------------------------------------------------
-def xform_fname_to_token(filename):
+def loc_tmp_dir() -> str:
     """
-    Transform a filename to its token that will become the filename-index.
-    E.g. "murmum_hash.c" will become "LOC_murmur_hash_c"
-         "preproc-pointer-to-struct.c" becomes "preproc_pointer_to_struct.c"
+    Return the temp dir, with a trailing '/'. (tempfile is imported on need,
+    as it is slow to import, and most runs generate into given dirs.)
     """
-    fname_token = filename.replace(".", "_")
-    fname_token = fname_token.replace("-", "_")
-    return "LOC_" + fname_token
-
-# ------------------------------------------------------------------------------
-def fprintf(stream, format_spec, *args):
-    """ C-like fprintf() interface. """
-    stream.write(format_spec % args)
-
-# ------------------------------------------------------------------------------
-def count_lines(file_full_path, verbose) -> int:
-    """ Open a text file and return # of lines """
-    numlines = 0
-    with open(file_full_path, encoding="utf8") as src_fh:
-        try:
-            numlines = len(src_fh.readlines())
-        except UnicodeDecodeError:
-            if verbose:
-                fprintf(sys.stderr, "UnicodeDecode error occurred trying to read %s\n",
-                        file_full_path)
-        except UnicodeError:
-            if verbose:
-                fprintf(sys.stderr, "Unicode error occurred trying to read %s\n",
-                        file_full_path)
-
-    return numlines
-
-
-# ------------------------------------------------------------------------------
-def pr_dup_file_names(dup_file_names):
-    """ Print a list of duplicate file names from a hash """
-
-    if len(dup_file_names) == 0:
-        return
-
-    fprintf(sys.stdout, "Duplicate file names found:\n")
-    pr_hash(dup_file_names)
-
-# ------------------------------------------------------------------------------
-def pr_hash(this_hash):
-    """ Print a list of names from a hash """
-    for file in this_hash.keys():
-        fprintf(sys.stdout, "  %s:%s\n", file, this_hash[file])
+    # pylint: disable-msg=import-outside-toplevel
+    import tempfile
+    # pylint: enable-msg=import-outside-toplevel
+    return tempfile.gettempdir() + '/'
 
 ###############################################################################
 # Helper methods, to facilitate unit-testing
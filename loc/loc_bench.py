@@ -0,0 +1,420 @@
+#!/usr/bin/python3
+################################################################################
+# loc_bench.py
+# SPDX-License-Identifier: Apache-2.0
+################################################################################
+"""
+Benchmark of the LOC generator, gen_loc_files.py, on synthetic source trees.
+
+Each benchmark case generates a source tree, deterministically from a seed,
+with a given:
+
+  - # of files, spread over directories up to a given depth,
+  - # of lines per file, on average,
+  - fraction of files re-using a common basename (e.g. 'utils.c') in
+    another directory, which the generator has to disambiguate, and
+  - fraction of files with non-UTF-8 (Latin-1) bytes in them.
+
+The generator is then run on the tree with --profile, in a fresh Python
+process per run, so that each run's peak RSS is its own. Reported for each
+case are the wall time of the generator's do_main(), its peak RSS and the
+wall time of each of its phases, as recorded by loc/loc_profile.py. With
+--repeat, the fastest run of each case is reported.
+
+Results can be saved as JSON with --save, and compared against results
+saved earlier with --baseline. Wall times and peak RSS that grew by more
+than --threshold percent are reported as regressions, and the script then
+exits with 1. Phases that took less than LOC_BENCH_MIN_PHASE_SECS, in both
+runs, are not compared, as their timings are mostly noise.
+
+Usage:
+    python3 loc/loc_bench.py [ --preset small | medium | large ] ...
+                             [ --save <results.json> ] [ --baseline <results.json> ]
+    python3 loc/loc_bench.py --files <N> [ --depth <D> ] [ --lines <L> ] ...
+"""
+
+import os
+import sys
+import json
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess as sp
+
+LOC_BENCH_RESULTS_VERSION = 1
+
+LOC_BENCH_GENERATOR = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                                   'gen_loc_files.py')
+
+# Benchmark cases: # of files, max dir-depth, avg # of lines per file,
+# fraction of duplicate basenames and of non-UTF-8 files.
+LOC_BENCH_PRESETS = {
+      'small'  : { 'files':   2000, 'depth': 3, 'lines': 200,
+                   'dup_rate': 0.05, 'non_utf8_rate': 0.01 }
+    , 'medium' : { 'files':  20000, 'depth': 5, 'lines': 200,
+                   'dup_rate': 0.05, 'non_utf8_rate': 0.01 }
+    , 'large'  : { 'files': 100000, 'depth': 8, 'lines': 100,
+                   'dup_rate': 0.05, 'non_utf8_rate': 0.01 }
+}
+
+# Common basenames, re-used across directories for duplicate-basename files.
+# All are of source files that the generator scans.
+LOC_BENCH_DUP_BASENAMES = [ 'utils.c', 'util.cc', 'common.c', 'main.c',
+                            'init.c', 'config.c', 'types.cpp', 'log.c',
+                            'misc.cpp', 'test.c' ]
+
+# Phases faster than this, in both results compared, are not compared
+LOC_BENCH_MIN_PHASE_SECS = 0.05
+
+# Default regression threshold, in percent
+LOC_BENCH_THRESHOLD_PCT = 20.0
+
+###############################################################################
+# main() driver
+###############################################################################
+def main():
+    """
+    Shell to call do_main() with command-line arguments.
+    """
+    sys.exit(do_main(sys.argv[1:]))
+
+###############################################################################
+def do_main(args:list) -> int:
+    """
+    Run the benchmark cases, and save / compare their results.
+
+    Returns: 0, or 1 if regressions were found against the baseline.
+    """
+    parsed_args = loc_bench_parse_args(args)
+
+    baseline = None
+    if parsed_args.baseline is not None:
+        try:
+            baseline = loc_bench_load(parsed_args.baseline)
+        except ValueError as exc:
+            print(exc, file=sys.stderr)
+            sys.exit(1)
+
+    cases = loc_bench_cases(parsed_args)
+
+    work_dir = parsed_args.work_dir
+    if work_dir is None:
+        work_dir = tempfile.mkdtemp(prefix='loc_bench.')
+    try:
+        results = loc_bench_run(cases, work_dir, parsed_args.repeat,
+                                parsed_args.jobs, parsed_args.decoder,
+                                parsed_args.seed)
+    finally:
+        if parsed_args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    loc_bench_report(results)
+
+    if parsed_args.save is not None:
+        loc_bench_save(parsed_args.save, results)
+        print("Saved results to " + parsed_args.save)
+
+    if baseline is None:
+        return 0
+
+    regressions = loc_bench_compare(baseline, results, parsed_args.threshold)
+    for regression in regressions:
+        print("REGRESSION: " + regression)
+    if regressions:
+        return 1
+    print("No regressions against " + parsed_args.baseline)
+    return 0
+
+###############################################################################
+def loc_bench_parse_args(args:list):
+    """
+    Command-line argument parser.
+    """
+    desc = "Benchmark the LOC generator on synthetic source trees."
+    parser = argparse.ArgumentParser(prog='loc_bench.py', description=desc)
+
+    parser.add_argument('--preset', dest='presets'
+                        , action='append', choices=sorted(LOC_BENCH_PRESETS)
+                        , help='Benchmark case(s) to run. Default: small')
+
+    parser.add_argument('--files', dest='files'
+                        , type=int, default=None
+                        , help='Run a custom case, of these many source files.')
+
+    parser.add_argument('--depth', dest='depth'
+                        , type=int, default=3
+                        , help='Custom case: max depth of directories. Default: 3')
+
+    parser.add_argument('--lines', dest='lines'
+                        , type=int, default=200
+                        , help='Custom case: avg # of lines per file. Default: 200')
+
+    parser.add_argument('--dup-rate', dest='dup_rate'
+                        , type=float, default=0.05
+                        , help='Custom case: fraction of files with a duplicate'
+                                + ' basename. Default: 0.05')
+
+    parser.add_argument('--non-utf8-rate', dest='non_utf8_rate'
+                        , type=float, default=0.01
+                        , help='Custom case: fraction of non-UTF-8 files. Default: 0.01')
+
+    parser.add_argument('--repeat', dest='repeat'
+                        , type=int, default=1
+                        , help='Run each case these many times, and report the'
+                                + ' fastest run. Default: 1')
+
+    parser.add_argument('--jobs', dest='jobs'
+                        , type=int, default=0
+                        , help='--jobs of the generator. Default: # of CPUs')
+
+    parser.add_argument('--decoder', dest='decoder'
+                        , action='store_true', default=False
+                        , help='Also build the decoder binary, timing the C compiler.')
+
+    parser.add_argument('--seed', dest='seed'
+                        , type=int, default=1
+                        , help='Seed of the synthetic source trees. Default: 1')
+
+    parser.add_argument('--work-dir', dest='work_dir'
+                        , metavar='<dir>', default=None
+                        , help='Generate trees, and outputs, here; left behind.'
+                                + ' Default: A temporary dir, removed at the end.')
+
+    parser.add_argument('--save', dest='save'
+                        , metavar='<results.json>', default=None
+                        , help='Save results to this JSON file.')
+
+    parser.add_argument('--baseline', dest='baseline'
+                        , metavar='<results.json>', default=None
+                        , help='Compare results against this earlier --save\'d file.')
+
+    parser.add_argument('--threshold', dest='threshold'
+                        , type=float, default=LOC_BENCH_THRESHOLD_PCT
+                        , help='Percent growth of a metric over the baseline'
+                                + ' reported as regression. Default: '
+                                + str(LOC_BENCH_THRESHOLD_PCT))
+
+    return parser.parse_args(args)
+
+###############################################################################
+def loc_bench_cases(parsed_args) -> dict:
+    """
+    Return dict of benchmark case parameters, on case name.
+    """
+    if parsed_args.files is not None:
+        return { 'custom': { 'files': parsed_args.files,
+                             'depth': parsed_args.depth,
+                             'lines': parsed_args.lines,
+                             'dup_rate': parsed_args.dup_rate,
+                             'non_utf8_rate': parsed_args.non_utf8_rate } }
+
+    presets = parsed_args.presets if parsed_args.presets else ['small']
+    return {preset: dict(LOC_BENCH_PRESETS[preset]) for preset in presets}
+
+###############################################################################
+def loc_bench_run(cases, work_dir, repeat, jobs, decoder, seed) -> dict:
+    """
+    Generate the source tree of each case, and run the generator on it.
+
+    Returns: Results, as saved by loc_bench_save().
+    """
+    # pylint: disable-msg=too-many-arguments
+    results = { 'version': LOC_BENCH_RESULTS_VERSION,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cases': {} }
+
+    for (name, params) in cases.items():
+        tree_dir = os.path.join(work_dir, name, 'src')
+        gen_dir = os.path.join(work_dir, name, 'gen')
+        shutil.rmtree(os.path.join(work_dir, name), ignore_errors=True)
+        os.makedirs(gen_dir)
+
+        tree_stats = loc_bench_gen_tree(tree_dir, seed=seed, **params)
+        print("Case %s: %d files, %d bytes, in %d dirs"
+              % (name, tree_stats['files'], tree_stats['bytes'], tree_stats['dirs']))
+
+        runs = [loc_bench_run_case(tree_dir, gen_dir, jobs, decoder)
+                for _ in range(max(1, repeat))]
+        case_result = min(runs, key=lambda run: run['wall_secs'])
+        case_result['peak_rss_kb'] = max(run['peak_rss_kb'] for run in runs)
+        case_result['params'] = params
+        case_result['tree'] = tree_stats
+        results['cases'][name] = case_result
+
+    return results
+    # pylint: enable-msg=too-many-arguments
+
+###############################################################################
+def loc_bench_gen_tree(tree_dir, files, depth, lines, dup_rate, non_utf8_rate,
+                       seed=1) -> dict:
+    """
+    Generate a synthetic source tree under 'tree_dir'. The tree depends only
+    on the arguments, so that results of different runs are comparable.
+
+    Returns: dict of # of 'files', 'dirs', 'bytes', 'dup_files' and
+             'non_utf8_files' generated.
+    """
+    # pylint: disable-msg=too-many-arguments
+    # pylint: disable-msg=too-many-locals
+    rng = random.Random(seed)
+
+    # Spread files over about 16 files per dir, at depths of 1 .. 'depth'.
+    dirs = []
+    for dir_num in range(max(1, files // 16)):
+        parent = rng.choice(dirs) if dirs else ''
+        if parent.count('/') + 1 >= max(1, depth):
+            parent = ''
+        dirs.append(os.path.join(parent, 'd%d' % dir_num))
+
+    stats = { 'files': 0, 'dirs': len(dirs), 'bytes': 0,
+              'dup_files': 0, 'non_utf8_files': 0 }
+    for file_num in range(files):
+        dir_name = os.path.join(tree_dir, rng.choice(dirs))
+        os.makedirs(dir_name, exist_ok=True)
+
+        file_name = os.path.join(dir_name, 'file_%d.c' % file_num)
+        if rng.random() < dup_rate:
+            dup_name = os.path.join(dir_name, rng.choice(LOC_BENCH_DUP_BASENAMES))
+            if not os.path.exists(dup_name):
+                file_name = dup_name
+                stats['dup_files'] += 1
+
+        num_lines = rng.randint(max(1, lines // 2), max(1, (3 * lines) // 2))
+        contents = loc_bench_file_contents(file_num, num_lines)
+        if rng.random() < non_utf8_rate:
+            contents += '/* Latin-1: caf\xe9, na\xefve */\n'.encode('latin-1')
+            stats['non_utf8_files'] += 1
+
+        with open(file_name, 'wb') as src_fh:
+            src_fh.write(contents)
+        stats['files'] += 1
+        stats['bytes'] += len(contents)
+
+    return stats
+    # pylint: enable-msg=too-many-locals
+    # pylint: enable-msg=too-many-arguments
+
+###############################################################################
+def loc_bench_file_contents(file_num, num_lines) -> bytes:
+    """
+    Return 'num_lines' lines of C-like source, made of small functions.
+    """
+    src_lines = ['#include "loc.h"']
+    while len(src_lines) < num_lines:
+        func_num = len(src_lines)
+        src_lines += ['',
+                      'int',
+                      'func_%d_%d(int arg)' % (file_num, func_num),
+                      '{',
+                      '    int val = arg * %d;    // loc_t loc = __LOC__;' % func_num,
+                      '    return val + 1;',
+                      '}']
+    return ('\n'.join(src_lines[:num_lines]) + '\n').encode('utf8')
+
+###############################################################################
+def loc_bench_run_case(tree_dir, gen_dir, jobs, decoder) -> dict:
+    """
+    Run the generator on 'tree_dir' in a child process, with --profile.
+
+    Returns: dict of 'wall_secs', 'peak_rss_kb', 'num_files' and 'phases'
+             secs, of the run.
+    """
+    profile_file = os.path.join(gen_dir, 'loc_profile.json')
+    args = [sys.executable, LOC_BENCH_GENERATOR,
+            '--src-root-dir', tree_dir,
+            '--gen-includes-dir', gen_dir,
+            '--gen-source-dir', gen_dir,
+            '--loc-decoder-dir', gen_dir,
+            '--jobs', str(jobs),
+            '--profile', profile_file]
+    if not decoder:
+        args.append('--no-decoder')
+    sp.run(args, text=True, check=True, capture_output=True)
+
+    with open(profile_file, encoding="utf8") as profile_fh:
+        profile = json.load(profile_fh)
+    phases = profile['phases']
+    return { 'wall_secs': profile['wall_secs'],
+             'peak_rss_kb': profile['peak_rss_kb'],
+             'num_files': phases['count_lines']['files'],
+             'phases': {phase: counters['wall_secs']
+                        for (phase, counters) in phases.items()} }
+
+###############################################################################
+def loc_bench_report(results):
+    """
+    Print one line per case, of its wall time, peak RSS and phase times.
+    """
+    for (name, case) in results['cases'].items():
+        phases = ', '.join('%s=%.3fs' % (phase, secs)
+                           for (phase, secs) in case['phases'].items())
+        print("%-8s: %8.3f s, %8d KB peak RSS (%s)"
+              % (name, case['wall_secs'], case['peak_rss_kb'], phases))
+
+###############################################################################
+def loc_bench_compare(baseline, results, threshold) -> list:
+    """
+    Compare 'results' of cases also in the 'baseline' against it.
+
+    Returns: List of messages, one per metric that regressed by more than
+             'threshold' percent.
+    """
+    regressions = []
+    limit = 1.0 + (threshold / 100.0)
+    for (name, case) in results['cases'].items():
+        base_case = baseline['cases'].get(name)
+        if base_case is None:
+            continue
+        if base_case.get('params') != case.get('params'):
+            print("Case %s: Parameters differ from the baseline's; not compared" % name)
+            continue
+
+        metrics = [('wall_secs', base_case['wall_secs'], case['wall_secs']),
+                   ('peak_rss_kb', base_case['peak_rss_kb'], case['peak_rss_kb'])]
+        for (phase, secs) in case['phases'].items():
+            base_secs = base_case['phases'].get(phase)
+            if base_secs is not None and max(base_secs, secs) >= LOC_BENCH_MIN_PHASE_SECS:
+                metrics.append(('phase ' + phase, base_secs, secs))
+
+        for (metric, base_value, value) in metrics:
+            if base_value > 0 and value > base_value * limit:
+                regressions.append("%s: %s %.3f -> %.3f (+%.1f%%)"
+                                   % (name, metric, base_value, value,
+                                      100.0 * (value - base_value) / base_value))
+    return regressions
+
+###############################################################################
+def loc_bench_load(results_file) -> dict:
+    """
+    Load results saved by loc_bench_save().
+    """
+    try:
+        with open(results_file, encoding="utf8") as results_fh:
+            results = json.load(results_fh)
+    except (OSError, ValueError) as exc:
+        raise ValueError(results_file + ": Unreadable benchmark results: " + str(exc)) from exc
+
+    if not isinstance(results, dict) or results.get('version') != LOC_BENCH_RESULTS_VERSION:
+        raise ValueError(results_file + ": Not benchmark results, version "
+                         + str(LOC_BENCH_RESULTS_VERSION))
+    return results
+
+###############################################################################
+def loc_bench_save(results_file, results):
+    """
+    Atomically write 'results' to a JSON file.
+    """
+    tmp_file = results_file + '.' + str(os.getpid()) + '.tmp'
+    with open(tmp_file, 'w', encoding="utf8") as results_fh:
+        json.dump(results, results_fh, indent=1, sort_keys=True)
+        results_fh.write('\n')
+    os.replace(tmp_file, results_file)
+
+###############################################################################
+# Start of the script: Execute only if run as a script
+###############################################################################
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/python3
+################################################################################
+# loc_cache.py
+# SPDX-License-Identifier: Apache-2.0
+################################################################################
+"""
+Persistent scan-cache used by the LOC generator script.
+
+Counting the lines of every source file is the bulk of the generator's cost
+on large code bases. This cache records, for each source file processed,
+its (size, mtime, inode) and the line-count computed for it. On a re-run,
+a file whose stat() attributes are unchanged reuses the cached line-count
+and is not re-read.
+
+The file-index assignment is a pure function of the sorted list of file
+names, so once the line-counts are served from the cache, a no-op re-run
+reproduces identical generated files without reading any source file.
+
+The cache is stored as a small JSON file, and is re-written atomically.
+"""
+
+import os
+import json
+
+# Bump this whenever the semantics of a cached value change, so that stale
+# caches created by older versions of the generator are discarded.
+LOC_CACHE_VERSION = 2
+
+###############################################################################
+class LocScanCache:
+    """
+    On-disk cache mapping a source file's full path-name to its stat()
+    attributes and its line-count.
+    """
+
+    def __init__(self, cache_file:str, verbose:bool=False):
+        self.cache_file = cache_file
+        self.verbose = verbose
+        self.hits = 0
+        self.misses = 0
+
+        # Entries found in the cache file, and entries seen in this run.
+        # Only the latter are saved, so deleted files age out of the cache.
+        self.prev_entries = {}
+        self.curr_entries = {}
+
+        self.load()
+
+    # -------------------------------------------------------------------------
+    def load(self):
+        """
+        Load cached entries from the cache file, if it exists. A missing,
+        unreadable or stale-versioned cache file is treated as empty.
+        """
+        try:
+            with open(self.cache_file, encoding="utf8") as cache_fh:
+                contents = json.load(cache_fh)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as exc:
+            if self.verbose:
+                print("Ignoring unreadable scan cache " + self.cache_file
+                      + ": " + str(exc))
+            return
+
+        if contents.get('version') != LOC_CACHE_VERSION:
+            return
+
+        self.prev_entries = contents.get('files', {})
+
+    # -------------------------------------------------------------------------
+    def lookup(self, file_full_path:str, stat_res:os.stat_result):
+        """
+        Return the cached line-count for a file if its stat() attributes
+        match the cached ones; None otherwise.
+        """
+        entry = self.prev_entries.get(file_full_path)
+        if (entry is not None
+                and entry[0] == stat_res.st_size
+                and entry[1] == stat_res.st_mtime_ns
+                and entry[2] == stat_res.st_ino):
+            self.hits += 1
+            self.curr_entries[file_full_path] = entry
+            return entry[3]
+
+        self.misses += 1
+        return None
+
+    # -------------------------------------------------------------------------
+    def store(self, file_full_path:str, stat_res:os.stat_result, num_lines:int):
+        """
+        Record the line-count computed for a file, keyed on its stat() attributes.
+        """
+        self.curr_entries[file_full_path] = [stat_res.st_size,
+                                             stat_res.st_mtime_ns,
+                                             stat_res.st_ino,
+                                             num_lines]
+
+    # -------------------------------------------------------------------------
+    def save(self):
+        """
+        Atomically re-write the cache file with the entries seen in this run.
+        Skip the write if nothing changed since the cache was loaded.
+        """
+        if self.curr_entries == self.prev_entries:
+            return
+
+        contents = {'version': LOC_CACHE_VERSION, 'files': self.curr_entries}
+
+        tmp_file = self.cache_file + '.' + str(os.getpid()) + '.tmp'
+        with open(tmp_file, 'w', encoding="utf8") as cache_fh:
+            json.dump(contents, cache_fh, separators=(',', ':'))
+        os.replace(tmp_file, self.cache_file)
+
+    # -------------------------------------------------------------------------
+    def stats_msg(self) -> str:
+        """ Return a one-line summary of cache hits / misses. """
+        return ("Scan cache " + self.cache_file + ": "
+                + str(self.hits) + " hits, " + str(self.misses) + " misses")
@@ -0,0 +1,228 @@
+#!/usr/bin/python3
+################################################################################
+# loc_count.py
+# SPDX-License-Identifier: Apache-2.0
+################################################################################
+"""
+Reader of the per-call-site hit counters' file of a program built with
+include/loc_count.h and src/loc_count.c.
+
+The file is mmap()'ed MAP_SHARED by the program, so counters can be read
+while it runs. Each snapshot() sums a LOC-ID's counts over all shards; as
+counters are being updated concurrently, a snapshot is not an atomic view
+across LOC-IDs, but each count is exact as of when it was read.
+
+All integers are in the program's native byte-order. Layout:
+
+  Header (LOC_COUNT_HDR_SIZE bytes):
+    magic         4s   b'LOCC'
+    version       u32  LOC_COUNT_VERSION
+    hdr_size      u32  Offset of the first shard
+    flags         u32  LOC_COUNT_FLAG_SIGNED: LOC-IDs are int32 (LOC2)
+    nshards       u32  # of shards
+    nslots        u32  # of slots per shard
+    shard_size    u32  Size of a shard, in bytes
+    nthreads      u32  # of threads that claimed a shard
+    ndropped      u64  # of hits not counted, as a shard was full
+    pid           u64  Process whose hits are counted
+
+  Shard: nslots x (key u64, count u64). key is 0 for an empty slot, else
+  (1 << 32) | LOC-ID.
+
+Usage:
+    python3 loc/loc_count.py <counters-file> [ --gen-dir <dir> | --elf <binary> ] [ --top <N> ]
+"""
+
+import os
+import sys
+import mmap
+import struct
+import argparse
+from array import array
+from functools import partial
+
+# PYTHONPATH will become ".../LineOfCode" dir, to resolve loc package imports,
+# when run as a script.
+# pylint: disable-msg=wrong-import-position
+if not __package__:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + '/..')
+
+from loc.loc_histogram import loc_format_report, loc_decoder_location, loc_elf_location
+from loc.loc_histogram import add_decode_args
+# pylint: enable-msg=wrong-import-position
+
+LOC_COUNT_MAGIC = b'LOCC'
+LOC_COUNT_VERSION = 1
+LOC_COUNT_HDR_FMT = '=4sIIIIIIIQQ'
+LOC_COUNT_HDR_SIZE = 64
+
+LOC_COUNT_FLAG_SIGNED = 0x1
+LOC_COUNT_KEY_USED = 1 << 32
+
+# Offset of nthreads and ndropped, which change while the program runs
+LOC_COUNT_NTHREADS_OFF = 28
+LOC_COUNT_NDROPPED_OFF = 32
+
+# Default # of hottest LOC-IDs reported
+LOC_COUNT_TOP_N = 50
+
+###############################################################################
+# main() driver
+###############################################################################
+def main():
+    """
+    Shell to call do_main() with command-line arguments.
+    """
+    do_main(sys.argv[1:])
+
+###############################################################################
+def do_main(args:list):
+    """
+    Print the hottest call-sites in a counters' file.
+    """
+    parsed_args = loc_count_parse_args(args)
+
+    decode = None
+    if parsed_args.elf_file is not None:
+        # pylint: disable-msg=import-outside-toplevel
+        from loc.loc_elf import LocElf, LocElfError
+        # pylint: enable-msg=import-outside-toplevel
+        try:
+            decode = partial(loc_elf_location, LocElf(parsed_args.elf_file))
+        except (LocElfError, OSError) as exc:
+            print(exc, file=sys.stderr)
+            sys.exit(1)
+    elif parsed_args.gen_dir is not None:
+        # pylint: disable-msg=import-outside-toplevel
+        from loc.loc_decoder import LocDecoder
+        # pylint: enable-msg=import-outside-toplevel
+        decode = partial(loc_decoder_location, LocDecoder(parsed_args.gen_dir))
+
+    try:
+        with LocCounters(parsed_args.counters_file) as counters:
+            report = loc_count_report(counters.snapshot(), parsed_args.top_n, decode)
+    except (ValueError, OSError) as exc:
+        print(exc, file=sys.stderr)
+        sys.exit(1)
+
+    print(loc_format_report(report))
+
+###############################################################################
+def loc_count_parse_args(args:list):
+    """
+    Command-line argument parser.
+    """
+    desc = "Report the hottest call-sites in a LOC_COUNT() counters' file."
+    parser = argparse.ArgumentParser(prog='loc_count.py', description=desc)
+
+    parser.add_argument('counters_file', metavar='<counters-file>'
+                        , help="Counters' file, e.g. $XDG_RUNTIME_DIR/loc_count.<pid>")
+
+    add_decode_args(parser, LOC_COUNT_TOP_N)
+
+    return parser.parse_args(args)
+
+###############################################################################
+def loc_count_report(counts:dict, top_n:int=LOC_COUNT_TOP_N, decode=None) -> list:
+    """
+    Report the 'top_n' hottest LOC-IDs of a snapshot of counters.
+
+    Returns: List of (LOC-ID, count, percent-of-all-hits, code-location), in
+             descending order of counts; ties in ascending order of LOC-ID.
+    """
+    total = sum(counts.values())
+    top = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:top_n]
+    return [(loc_id, count, (100.0 * count / total),
+             decode(loc_id) if decode is not None else "")
+            for (loc_id, count) in top]
+
+###############################################################################
+class LocCounters:
+    """
+    Read-only view of a counters' file, mapped while its program runs.
+    """
+    def __init__(self, counters_file:str):
+        self.counters_file = counters_file
+        with open(counters_file, 'rb') as file_fh:
+            self.mmap = mmap.mmap(file_fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.mmap) < LOC_COUNT_HDR_SIZE:
+            self.close()
+            raise ValueError(counters_file + ": Too small for a LOC counters' file")
+
+        (magic, version, hdr_size, flags, nshards, nslots, shard_size,
+         _, _, pid) = struct.unpack_from(LOC_COUNT_HDR_FMT, self.mmap, 0)
+        if magic != LOC_COUNT_MAGIC or version != LOC_COUNT_VERSION or nshards == 0:
+            self.close()
+            raise ValueError(counters_file + ": Not a LOC counters' file, version "
+                             + str(LOC_COUNT_VERSION))
+        if hdr_size + nshards * shard_size > len(self.mmap) or shard_size != nslots * 16:
+            self.close()
+            raise ValueError(counters_file + ": Truncated LOC counters' file")
+
+        self.hdr_size = hdr_size
+        self.nshards = nshards
+        self.nslots = nslots
+        self.signed = bool(flags & LOC_COUNT_FLAG_SIGNED)
+        self.pid = pid
+
+    # ---------------------------------------------------------------------
+    def nthreads(self) -> int:
+        """
+        Return the # of threads that have counted hits, so far.
+        """
+        return struct.unpack_from('=I', self.mmap, LOC_COUNT_NTHREADS_OFF)[0]
+
+    # ---------------------------------------------------------------------
+    def ndropped(self) -> int:
+        """
+        Return the # of hits not counted, so far, as a shard was full.
+        """
+        return struct.unpack_from('=Q', self.mmap, LOC_COUNT_NDROPPED_OFF)[0]
+
+    # ---------------------------------------------------------------------
+    def snapshot(self) -> dict:
+        """
+        Return { LOC-ID: count } of all LOC-IDs hit so far, summed over shards.
+        """
+        # Only owned shards claimed by some thread have any slots in use. The
+        # last, shared, shard is also used by fork()'ed children, so is
+        # always read.
+        shard_size = self.nslots * 16
+        nowned = min(self.nthreads(), self.nshards - 1)
+        shared_off = self.hdr_size + (self.nshards - 1) * shard_size
+        slots = array('Q')
+        slots.frombytes(self.mmap[self.hdr_size:self.hdr_size + nowned * shard_size])
+        slots.frombytes(self.mmap[shared_off:shared_off + shard_size])
+
+        counts = {}
+        for idx in range(0, len(slots), 2):
+            (key, count) = (slots[idx], slots[idx + 1])
+            if not key & LOC_COUNT_KEY_USED or count == 0:
+                continue
+            loc_id = key & 0xFFFFFFFF
+            if self.signed and loc_id >= 0x80000000:
+                loc_id -= (1 << 32)
+            counts[loc_id] = counts.get(loc_id, 0) + count
+        return counts
+
+    # ---------------------------------------------------------------------
+    def close(self):
+        """
+        Unmap the counters' file.
+        """
+        self.mmap.close()
+
+    # ---------------------------------------------------------------------
+    def __enter__(self):
+        return self
+
+    # ---------------------------------------------------------------------
+    def __exit__(self, *exc_info):
+        self.close()
+
+###############################################################################
+# Start of the script: Execute only if run as a script
+###############################################################################
+if __name__ == "__main__":
+    main()
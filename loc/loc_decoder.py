@@ -0,0 +1,402 @@
+#!/usr/bin/python3
+################################################################################
+# loc_decoder.py
+# SPDX-License-Identifier: Apache-2.0
+################################################################################
+"""
+In-process decoder for LOC-IDs generated by the Python-generator based
+LOC scheme.
+
+The generated loc_filenames.c (or loc_tokens.h) is parsed once into a table
+of file names, indexed by file-index. Decoding a LOC-ID is then an O(1)
+table lookup, without having to run the compiled <product>_loc binary.
+Formatted 'file:line' strings are kept in an LRU cache, as log streams
+tend to repeat the same LOC-IDs over and over.
+
+The LOC-encoding split is picked up from the loc_manifest.bin or loc.h
+generated alongside 'gen_file', if any; else loc_xform's split is used.
+If the generator was run with --gen-func-ranges, the function enclosing
+a LOC-ID is found from the loc_funcranges.c generated alongside, too.
+
+Usage:
+    decoder = LocDecoder('<gen-source-dir>/loc_filenames.c')
+    decoder.decode(65541)       # -> ('two-files-program/two-files-file1.c', 5)
+    decoder.format(65541)       # -> 'two-files-program/two-files-file1.c:5'
+    decoder.func_name(65547)    # -> 'file1_function1'
+
+From the command-line, LOC-IDs are decoded as by the compiled <product>_loc
+binary, without having to build it:
+    python3 -m loc decode <gen-source-dir> [ --brief ] [ <loc-id> ]+
+    python3 -m loc decode <gen-source-dir> [ --brief ] --stdin | --stdin-binary
+    python3 -m loc stats <gen-source-dir>
+"""
+
+import os
+import re
+import sys
+from bisect import bisect_right
+from functools import lru_cache
+
+# PYTHONPATH will become ".../LineOfCode" dir, to resolve loc package imports,
+# when run as a script.
+# pylint: disable-msg=wrong-import-position
+if not __package__:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + '/..')
+
+import loc.loc_xform as xform
+import loc.loc_manifest as locm
+import loc.loc_func_ranges as locf
+# pylint: enable-msg=wrong-import-position
+
+# Default # of formatted LOC-ID strings kept in the LRU cache
+LOC_DECODER_CACHE_SIZE = 64 * 1024
+
+# # of bytes read at a time from a --stdin-binary stream of LOC-IDs
+LOC_DECODER_READ_SIZE = 1024 * 1024
+
+# Matches one entry in Loc_FileNamesList[] of generated loc_filenames.c, e.g.:
+#      , "two-files-program/two-files-main.c"   // 2, L=35
+LOC_DOTC_ENTRY_RE = re.compile(r'^\s*,?\s*"(.*)"\s*// (\d+), L=(\d+)')
+
+# Matches one #define in generated loc_tokens.h, e.g.:
+# #define LOC_two_files_main_c  2     // two-files-program/two-files-main.c: L=35
+LOC_DOTH_ENTRY_RE = re.compile(r'^(?://\s*)?#define\s+(\w+)\s+(\d+)\s*// (.*): L=(\d+)')
+
+# Matches one entry in Loc_FuncRangesList[] of generated loc_funcranges.c, e.g.:
+#     , { 9, 13, "file1_function1" }   // 1
+LOC_FUNCS_ENTRY_RE = re.compile(r'^\s*,\s*\{\s*(\d+),\s*(\d+),\s*"(.*)"\s*\}\s*// (\d+)')
+
+# Matches the LOC-ID at the start of a line read with --stdin
+LOC_STDIN_ENTRY_RE = re.compile(r'^\s*(\d+)')
+
+###############################################################################
+# main() driver
+###############################################################################
+def main():
+    """
+    Shell to call do_main() with command-line arguments.
+    """
+    do_main(sys.argv[1:])
+
+###############################################################################
+def do_main(args:list):
+    """
+    Decode LOC-IDs, or print statistics of the generated file-names table.
+    """
+    parsed_args = loc_decoder_parse_args(args)
+
+    try:
+        decoder = LocDecoder(parsed_args.gen_file)
+    except (OSError, ValueError) as exc:
+        print(exc, file=sys.stderr)
+        sys.exit(1)
+
+    if parsed_args.stats:
+        print(loc_format_stats(loc_decoder_stats(decoder)))
+        return
+
+    if parsed_args.from_stdin == 'text':
+        loc_ids = (int(match.group(1)) for match in map(LOC_STDIN_ENTRY_RE.match, sys.stdin)
+                   if match is not None)
+    elif parsed_args.from_stdin == 'binary':
+        loc_ids = loc_read_binary_ids(sys.stdin.buffer)
+    else:
+        loc_ids = parsed_args.loc_ids
+
+    for loc_id in loc_ids:
+        print(loc_decode_one(decoder, loc_id, parsed_args.brief))
+
+###############################################################################
+def loc_decoder_parse_args(args:list):
+    """
+    Command-line argument parser.
+    """
+    # pylint: disable-msg=import-outside-toplevel
+    import argparse
+    # pylint: enable-msg=import-outside-toplevel
+
+    desc = "Decode LOC-IDs using the generated file-names table."
+    # An explicit usage also saves importing what formatting it needs.
+    usage = ('%(prog)s <gen-source-dir> [ --brief ] [ <loc-id> ... | --stdin | --stdin-binary ]'
+             + '\n       %(prog)s <gen-source-dir> --stats')
+    parser = argparse.ArgumentParser(prog='loc_decoder.py', usage=usage, description=desc)
+
+    parser.add_argument('gen_file', metavar='<gen-source-dir>'
+                        , help='Dir with the generated loc_filenames.c, or the'
+                                + ' generated loc_filenames.c or loc_tokens.h')
+
+    parser.add_argument('loc_ids', metavar='<loc-id>', type=int, nargs='*'
+                        , help='LOC-ID to decode, as an unsigned decimal value')
+
+    parser.add_argument('--brief', dest='brief'
+                        , action='store_true', default=False
+                        , help='Print just the file:line of each LOC-ID')
+
+    parser.add_argument('--stdin', dest='from_stdin'
+                        , action='store_const', const='text', default=None
+                        , help='Read LOC-IDs from stdin, one decimal value per line')
+
+    parser.add_argument('--stdin-binary', dest='from_stdin'
+                        , action='store_const', const='binary'
+                        , help='Read LOC-IDs from stdin, as a stream of'
+                                + ' little-endian uint32 values')
+
+    parser.add_argument('--stats', dest='stats'
+                        , action='store_true', default=False
+                        , help='Print statistics of the file-names table,'
+                                + ' instead of decoding LOC-IDs')
+
+    # LOC-IDs may be given before or after the options.
+    return parser.parse_intermixed_args(args)
+
+###############################################################################
+def loc_decode_one(decoder, loc_id:int, brief:bool=False) -> str:
+    """
+    Return the decoded LOC-ID, as printed by the compiled LOC-decoder binary:
+    '<loc-id>: [fnum=<file-index>] <file>:<line>', or just '<file>:<line>'
+    if 'brief', followed by the enclosing function, if known.
+    """
+    decoded = decoder.format(loc_id)
+    if not brief:
+        decoded = "%u: [fnum=%d] %s" % (loc_id, loc_id >> decoder.nbits_lines, decoded)
+    func_name = decoder.func_name(loc_id)
+    if func_name:
+        decoded += " " + func_name + "()"
+    return decoded
+
+###############################################################################
+def loc_read_binary_ids(file_fh):
+    """
+    Generate the LOC-IDs read from binary stream 'file_fh', of little-endian
+    uint32 values. A trailing partial LOC-ID is ignored.
+    """
+    # pylint: disable-msg=import-outside-toplevel
+    import struct
+    # pylint: enable-msg=import-outside-toplevel
+
+    tail = b''
+    while True:
+        buf = file_fh.read(LOC_DECODER_READ_SIZE)
+        if not buf:
+            break
+        buf = tail + buf
+        nbytes = len(buf) & ~3
+        for (loc_id,) in struct.iter_unpack('<I', buf[:nbytes]):
+            yield loc_id
+        tail = buf[nbytes:]
+
+    if tail:
+        print("Ignored %d trailing bytes of a partial LOC-ID" % len(tail), file=sys.stderr)
+
+###############################################################################
+def loc_decoder_stats(decoder) -> dict:
+    """
+    Return statistics of the file-names table loaded by 'decoder': # of
+    files and lines, the largest file, and the LOC-ID space they use.
+    """
+    file_lines = decoder.file_lines[1:]
+    max_lines = max(file_lines, default=0)
+    return { 'gen_file': decoder.gen_file,
+             'num_files': sum(1 for file_name in decoder.file_names[1:] if file_name),
+             'max_file_num': decoder.num_files - 1,
+             'num_lines': sum(file_lines),
+             'max_num_lines': max_lines,
+             'file_w_max_num_lines': (decoder.file_names[file_lines.index(max_lines) + 1]
+                                      if file_lines else ""),
+             'nbits_files': decoder.nbits_files,
+             'nbits_lines': decoder.nbits_lines,
+             'num_funcs': sum(len(names) for (_, _, names) in decoder.func_ranges.values()) }
+
+###############################################################################
+def loc_format_stats(stats:dict) -> str:
+    """
+    Return the statistics from loc_decoder_stats() as a printable report.
+    """
+    lines = [stats['gen_file'] + ':',
+             "  Files         : %d, max file-index %d of %d"
+             % (stats['num_files'], stats['max_file_num'], (1 << stats['nbits_files']) - 1),
+             "  Lines         : %d, max %d of %d in %s"
+             % (stats['num_lines'], stats['max_num_lines'], (1 << stats['nbits_lines']) - 1,
+                stats['file_w_max_num_lines']),
+             "  LOC-ID split  : %d bits file-index, %d bits line-number"
+             % (stats['nbits_files'], stats['nbits_lines'])]
+    if stats['num_funcs']:
+        lines.append("  Functions     : %d" % stats['num_funcs'])
+    return '\n'.join(lines)
+
+###############################################################################
+class LocDecoder:
+    """
+    Decoder for LOC-IDs, using the file-names table of a generated
+    loc_filenames.c or loc_tokens.h file.
+    """
+    # pylint: disable-msg=too-many-instance-attributes
+
+    def __init__(self, gen_file:str, cache_size:int=LOC_DECODER_CACHE_SIZE):
+        """
+        Load the file-names table from 'gen_file', which is either a
+        generated loc_filenames.c or loc_tokens.h file, or the directory
+        where loc_filenames.c was generated.
+        """
+        if os.path.isdir(gen_file):
+            gen_file = os.path.join(gen_file, 'loc_filenames.c')
+
+        if gen_file.endswith('.h'):
+            (self.file_names, self.file_lines) = loc_parse_tokens_doth(gen_file)
+        else:
+            (self.file_names, self.file_lines) = loc_parse_filenames_dotc(gen_file)
+
+        self.gen_file = gen_file
+        self.num_files = len(self.file_names)
+
+        (self.nbits_files, self.nbits_lines) = loc_gen_file_nbits(gen_file)
+        self.lines_mask = (1 << self.nbits_lines) - 1
+
+        # Function line-ranges, on file-index; empty if none were generated
+        funcs_dotc = os.path.join(os.path.dirname(gen_file), locf.LOC_FUNC_RANGES_DOTC)
+        self.func_ranges = {}
+        if os.path.exists(funcs_dotc):
+            self.func_ranges = loc_parse_func_ranges_dotc(funcs_dotc)
+
+        # Per-instance cache of formatted strings, keyed on LOC-ID
+        self.format = lru_cache(maxsize=cache_size)(self.format_uncached)
+
+    # -------------------------------------------------------------------------
+    def file_name(self, file_index:int) -> str:
+        """
+        Return the file name at 'file_index'; "" if index is out-of-range.
+        (Same as the LOC__SAFE_LOOKUP() done by the generated LOC_FILE().)
+        """
+        if 0 <= file_index < self.num_files:
+            return self.file_names[file_index]
+        return ""
+
+    # -------------------------------------------------------------------------
+    def decode(self, loc_id:int) -> (str, int):
+        """
+        Crack open a LOC-ID and return a pair (file-name, line#)
+        """
+        return (self.file_name(loc_id >> self.nbits_lines), loc_id & self.lines_mask)
+
+    # -------------------------------------------------------------------------
+    def func_name(self, loc_id:int) -> str:
+        """
+        Return the name of the function enclosing the code-location of a
+        LOC-ID; "" if not known. (Same as the generated LOC_FUNC().)
+        """
+        file_ranges = self.func_ranges.get(loc_id >> self.nbits_lines)
+        if file_ranges is None:
+            return ""
+
+        (starts, ends, names) = file_ranges
+        line_num = loc_id & self.lines_mask
+        range_idx = bisect_right(starts, line_num) - 1
+        if range_idx >= 0 and line_num <= ends[range_idx]:
+            return names[range_idx]
+        return ""
+
+    # -------------------------------------------------------------------------
+    def format_uncached(self, loc_id:int) -> str:
+        """
+        Return the decoded LOC-ID as a 'file:line' string.
+        Use format() instead, which caches the formatted strings.
+        """
+        return (self.file_name(loc_id >> self.nbits_lines) + ':'
+                + str(loc_id & self.lines_mask))
+
+    # -------------------------------------------------------------------------
+    def __len__(self):
+        return self.num_files
+    # pylint: enable-msg=too-many-instance-attributes
+
+###############################################################################
+def loc_gen_file_nbits(gen_file:str) -> (int, int):
+    """
+    Return the LOC-encoding split (nbits_files, nbits_lines) of the code base
+    'gen_file' was generated for, from the loc_manifest.bin or loc.h in the
+    same dir. Falls back to the split in effect in loc_xform.
+    """
+    gen_dir = os.path.dirname(gen_file)
+    for split_file in (locm.LOC_MANIFEST_FILE, 'loc.h'):
+        split_file = os.path.join(gen_dir, split_file)
+        if os.path.exists(split_file):
+            return xform.loc_read_nbits(split_file)
+    return (xform.LOC_NBITS_FILES, xform.LOC_NBITS_LINES)
+
+###############################################################################
+def loc_parse_filenames_dotc(loc_dotc:str) -> (list, list):
+    """
+    Parse the Loc_FileNamesList[] array of a generated loc_filenames.c file.
+
+    Returns: (list of file names, list of line-counts), indexed by file-index
+    """
+    return loc_parse_gen_file(loc_dotc, LOC_DOTC_ENTRY_RE, 1, 2, 3)
+
+###############################################################################
+def loc_parse_func_ranges_dotc(funcs_dotc:str) -> dict:
+    """
+    Parse the Loc_FuncRangesList[] array of a generated loc_funcranges.c file.
+
+    Returns: dict of (list of start-lines, list of end-lines, list of function
+             names), sorted by start-line, on file-index
+    """
+    func_ranges = {}
+    with open(funcs_dotc, encoding="utf8") as funcs_fh:
+        for line in funcs_fh:
+            match = LOC_FUNCS_ENTRY_RE.match(line)
+            if match is None:
+                continue
+            (starts, ends, names) = func_ranges.setdefault(int(match.group(4)),
+                                                           ([], [], []))
+            starts.append(int(match.group(1)))
+            ends.append(int(match.group(2)))
+            names.append(match.group(3))
+
+    return func_ranges
+
+###############################################################################
+def loc_parse_tokens_doth(loct_doth:str) -> (list, list):
+    """
+    Parse the LOC_<token> #defines of a generated loc_tokens.h file.
+    The file names are picked up from the comment on each #define.
+
+    Returns: (list of file names, list of line-counts), indexed by file-index
+    """
+    return loc_parse_gen_file(loct_doth, LOC_DOTH_ENTRY_RE, 3, 2, 4,
+                              skip_tokens=('LOC_MAX_FILE_NUM', 'LOC_NUM_FILES'))
+
+###############################################################################
+def loc_parse_gen_file(gen_file:str, entry_re, name_group:int, index_group:int,
+                       lines_group:int, skip_tokens:tuple=()) -> (list, list):
+    """
+    Parse entries matching 'entry_re' in a generated file into tables of
+    file names and line-counts, indexed by the file-index of each entry.
+    Any gaps in the file-index space are filled by "".
+    """
+    # pylint: disable-msg=too-many-arguments,too-many-locals
+    entries = {}
+    with open(gen_file, encoding="utf8") as gen_fh:
+        for line in gen_fh:
+            match = entry_re.match(line)
+            if match is None:
+                continue
+            if skip_tokens and match.group(1) in skip_tokens:
+                continue
+            entries[int(match.group(index_group))] = (match.group(name_group),
+                                                      int(match.group(lines_group)))
+
+    num_files = (max(entries) + 1) if entries else 0
+    file_names = [""] * num_files
+    file_lines = [0] * num_files
+    for (file_index, (file_name, num_lines)) in entries.items():
+        file_names[file_index] = file_name
+        file_lines[file_index] = num_lines
+
+    return (file_names, file_lines)
+    # pylint: enable-msg=too-many-arguments,too-many-locals
+
+###############################################################################
+# Start of the script: Execute only if run as a script
+###############################################################################
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,501 @@
+#!/usr/bin/python3
+################################################################################
+# loc_decoder_bin.py
+# SPDX-License-Identifier: Apache-2.0
+################################################################################
+"""
+Generate the source of the stand-alone LOC-decoder program of a code base,
+and compile it, reusing a binary cached from identical generated sources.
+
+Only imported by gen_loc_files.py when it builds the decoder, so runs with
+--no-decoder do not pay for importing it, nor subprocess, shutil, hashlib.
+"""
+
+import os
+import sys
+import io
+
+import loc.utils as locu
+from loc.utils import fprintf
+from loc.loc_profile import loc_profile_phase
+import loc.loc_xform as xform
+from loc.loc_emit import gen_loc_file_banner_msg, loc_src_roots_msg
+
+# Max # of binaries kept in the decoder cache; least recently used are evicted
+LOC_DECODER_CACHE_MAX_ENTRIES = 32
+
+###############################################################################
+class LocDecoderBuildError(Exception):
+    """ Raised when the LOC-decoder binary fails to compile. """
+
+###############################################################################
+def gen_loc_decoder_binary(tmp_dir, loc_dirname, src_root_dirs, max_file_num,
+                           nbits_lines, loc_doth, loc_dotc,
+                           full_loct_doth, full_loc_doth, full_loc_dotc,
+                           decoder_cache, verbose, loc_debug,
+                           full_loc_funcs_dotc=None, profile=None):
+    """
+    Generate the LOC-decoder program's source code in 'tmp_dir', and compile
+    it to produce the LOC-decoder binary in 'loc_dirname'.
+
+    Arguments:
+        tmp_dir         - /tmp-dir where decoder's source will be generated
+        loc_dirname     - Dir where decoder binary will be produced
+        src_root_dirs   - List of top-level source root-dirs processed; the
+                          decoder is named after the first one
+        max_file_num    - Max file-number found by generation step
+        nbits_lines     - # of bits for line-number component of a LOC-ID
+        loc_doth        - Name of LOC #include .h file
+        loc_dotc        - Name of LOC .c file containing defn of Loc_FileNamesList[]
+        full_loct_doth  - Full path-name of generated loc_tokens.h
+        full_loc_doth   - Full path-name of generated loc.h
+        full_loc_dotc   - Full path-name of generated loc_filenames.c
+        decoder_cache   - Dir caching compiled decoder binaries; None for no cache
+        full_loc_funcs_dotc - Full path-name of generated loc_funcranges.c;
+                              None if function ranges were not generated
+        profile         - LocProfile timing the 'decoder' and 'decoder_cc'
+                          phases; may be None
+
+    Returns: Full path-name of the decoder binary. Raises LocDecoderBuildError
+             if it failed to compile.
+    """
+    # pylint: disable-msg=too-many-arguments
+    # pylint: disable-msg=too-many-locals
+    src_root_base = os.path.basename(src_root_dirs[0])
+    loc_decode_bin = src_root_base + "_" + "loc"
+    loc_decode_dotc = loc_decode_bin + ".c"
+
+    # Even though generated .h/.c files may be in project's source-tree,
+    # generate the compiled decoder binary always in /tmp, as we don't know
+    # what the project's build-area dir-rules may be.
+    full_loc_decode_dotc = tmp_dir + loc_decode_dotc
+
+    with loc_profile_phase(profile, 'decoder'):
+        loc_fh = io.StringIO()
+        gen_loc_file_banner_msg(loc_fh, loc_src_roots_msg(src_root_dirs),
+                                loc_decode_dotc)
+        gen_loc_decoder(loc_fh, max_file_num, nbits_lines, loc_doth, loc_dotc,
+                        loc_decode_dotc, loc_decode_bin)
+
+        if locu.write_if_changed(full_loc_decode_dotc, loc_fh.getvalue()) and verbose:
+            fprintf(sys.stdout, 'Generated ' + full_loc_decode_dotc + '\n')
+
+    # Pick up the decoder's source from tmp but use the user-specified
+    # dir-name for output LOC-binary location.
+    with loc_profile_phase(profile, 'decoder_cc'):
+        cc_rc = gen_cc_loc_decoder(tmp_dir, loc_dirname, loc_decode_bin,
+                                   loc_decode_dotc,
+                                   full_loct_doth, full_loc_doth,
+                                   full_loc_dotc, loc_debug, decoder_cache,
+                                   full_loc_funcs_dotc)
+    if verbose:
+        if cc_rc == 0:
+            fprintf(sys.stdout, 'Generated ' + loc_dirname + loc_decode_bin + '\n')
+        else:
+            fprintf(sys.stderr, 'Failed to generate ' + loc_dirname + loc_decode_bin + '\n')
+
+    if cc_rc != 0:
+        raise LocDecoderBuildError('Failed to generate ' + loc_dirname + loc_decode_bin)
+    return loc_dirname + loc_decode_bin
+    # pylint: enable-msg=too-many-locals
+    # pylint: enable-msg=too-many-arguments
+
+###############################################################################
+def gen_loc_decoder(loc_fh, max_file_num, nbits_lines, loc_doth, loc_dotc,
+                    loc_decode_dotc, loc_decode_bin):
+    """
+    Generate the stand-alone LOC-decoder program's source code.
+    This is just a stand-alone main(), linked with the .c file containing the
+    definition of Loc_FileNamesList[] lookup array.
+
+    Arguments:
+        loc_fh          - File handle to generate .c file
+        max_file_num    - Max file-number found by generation step
+        nbits_lines     - # of bits for line-number component of a LOC-ID
+        loc_doth        - Name of LOC #include .h file
+        loc_dotc        - Name of LOC .c file containing defn of Loc_FileNamesList[]
+        loc_decode_dotc - Name of LOC-decode program's source file name
+        loc_decode_bin  - Name of LOC-decode binary program
+    """
+    # pylint: disable-msg=too-many-arguments
+    # pylint: disable-msg=too-many-statements
+    fprintf(loc_fh, "/*\n")
+    fprintf(loc_fh, " * To generate the LOC decoding program for this code-base, do:\n")
+    fprintf(loc_fh, " *   cc -o %s %s %s\n", loc_decode_bin, loc_dotc, loc_decode_dotc)
+    fprintf(loc_fh, " */\n")
+
+    fprintf(loc_fh, "#include <stdio.h>\n")
+    fprintf(loc_fh, "#include <stdint.h>\n")
+    fprintf(loc_fh, "#include <stdlib.h>\n")
+    fprintf(loc_fh, "#include <string.h>\n")
+    fprintf(loc_fh, "#include \"%s\"\n", loc_doth)
+
+    fprintf(loc_fh, "// clang-format off\n")
+
+    gen_loc_decoder_helpers(loc_fh)
+
+    fprintf(loc_fh, "\nint\n")
+    fprintf(loc_fh, "main(int argc, char *argv[])\n")
+    fprintf(loc_fh, "{\n")
+
+    # Generate basic help/usage, custom-fit for code-base being LOC'ified
+    fprintf(loc_fh, "    if (argc <= 1) {\n")
+    fprintf(loc_fh, "        printf(\"Usage: %%s [--brief] [--stdin | --stdin-binary]"
+                                    + " [<loc-ID-values>+]\\n\", argv[0]);\n")
+    fprintf(loc_fh, "        printf(\"  --stdin        : Read LOC-IDs from stdin,"
+                                    + " one per line.\\n\");\n")
+    fprintf(loc_fh, "        printf(\"  --stdin-binary : Read LOC-IDs from stdin, as a stream of"
+                                    + " little-endian uint32 values.\\n\");\n")
+    fprintf(loc_fh, "        printf(\"Max-file-number: %d\\n\");\n", max_file_num)
+    # pylint: disable-msg=line-too-long
+    fprintf(loc_fh, "        printf(\"Examples: Specify LOC-encoded value you wish to decode.\\n\");\n")
+    # pylint: enable-msg=line-too-long
+    fprintf(loc_fh, "        printf(\"  %s [<uint32-value>]+\\n\");\n", loc_decode_bin)
+
+    # Generate some sample encoding values, using the LOC-encoding split
+    # sized for this code base.
+    if max_file_num == 1:
+        file_num = 1
+        line_num = 4
+        loc1 = xform.loc_encode(file_num, line_num, nbits_lines)
+
+        line_num = 5
+        loc2 = xform.loc_encode(file_num, line_num, nbits_lines)
+
+        line_num = 10
+        loc3 = xform.loc_encode(file_num, line_num, nbits_lines)
+
+        line_num = 17
+        loc4 = xform.loc_encode(file_num, line_num, nbits_lines)
+    elif max_file_num == 2:
+        file_num = 1
+        line_num = 4
+        loc1 = xform.loc_encode(file_num, line_num, nbits_lines)
+
+        line_num = 5
+        loc2 = xform.loc_encode(file_num, line_num, nbits_lines)
+
+        file_num = 2
+        line_num = 10
+        loc3 = xform.loc_encode(file_num, line_num, nbits_lines)
+
+        line_num = 17
+        loc4 = xform.loc_encode(file_num, line_num, nbits_lines)
+    else:
+        file_num = 1
+        line_num = 4
+        loc1 = xform.loc_encode(file_num, line_num, nbits_lines)
+
+        file_num = 5
+        line_num = 123
+        loc2 = xform.loc_encode(file_num, line_num, nbits_lines)
+
+        file_num = 6
+        line_num = 223
+        loc3 = xform.loc_encode(file_num, line_num, nbits_lines)
+
+        file_num = 6
+        line_num = 224
+        loc4 = xform.loc_encode(file_num, line_num, nbits_lines)
+
+    fprintf(loc_fh, "        printf(\"  %s %u %u %u %u\\n\");\n",
+            loc_decode_bin, loc1, loc2, loc3, loc4)
+
+    # Show an example of generating LOC using encoding macro, using diff
+    # file numbers, depending on the source code-base processed.
+    file_numbers= []
+    if max_file_num == 1:
+        file_numbers = [1, 1, 1, 1]
+    elif max_file_num == 2:
+        file_numbers = [1, 1, 2, 2]
+    else:
+        file_numbers = [1, 5, 6, 8]
+
+    fprintf(loc_fh, "        printf(\"  %s %%u %%u %%u %%u\\n\", %s, %s, %s, %s);\n",
+            loc_decode_bin,
+            "LOC_ENCODE(" + str(file_numbers[0]) + ", 10)",
+            "LOC_ENCODE(" + str(file_numbers[1]) + ", 30)",
+            "LOC_ENCODE(" + str(file_numbers[2]) + ", 31)",
+            "LOC_ENCODE(" + str(file_numbers[3]) + ", 44)")
+
+    fprintf(loc_fh, "        return(0);\n")
+    fprintf(loc_fh, "    }\n")
+
+    fprintf(loc_fh, "\n")
+
+    # Parse the options supplied at run-time, which precede any LOC-ID args.
+    fprintf(loc_fh, "    int brief = 0;\n")
+    fprintf(loc_fh, "    int from_stdin = 0;   // 1: text, 2: binary uint32 stream\n")
+    fprintf(loc_fh, "    int i = 1;\n")
+    fprintf(loc_fh, "    for (; (i < argc) && (strncmp(argv[i], \"--\", 2) == 0); i++) {\n")
+    fprintf(loc_fh, "        if (strcmp(argv[i], \"--brief\") == 0) {\n")
+    fprintf(loc_fh, "            brief = 1;\n")
+    fprintf(loc_fh, "        } else if (strcmp(argv[i], \"--stdin\") == 0) {\n")
+    fprintf(loc_fh, "            from_stdin = 1;\n")
+    fprintf(loc_fh, "        } else if (strcmp(argv[i], \"--stdin-binary\") == 0) {\n")
+    fprintf(loc_fh, "            from_stdin = 2;\n")
+    fprintf(loc_fh, "        } else {\n")
+    fprintf(loc_fh, "            fprintf(stderr, \"Unknown option: %%s\\n\", argv[i]);\n")
+    fprintf(loc_fh, "            return(1);\n")
+    fprintf(loc_fh, "        }\n")
+    fprintf(loc_fh, "    }\n")
+
+    # Decoded output can be voluminous in streaming mode; fully buffer it.
+    fprintf(loc_fh, "\n    setvbuf(stdout, NULL, _IOFBF, LOC_DECODER_BUFSIZE);\n")
+
+    fprintf(loc_fh, "\n    if (from_stdin == 1) {\n")
+    fprintf(loc_fh, "        return loc_decode_text_stream(stdin, brief);\n")
+    fprintf(loc_fh, "    } else if (from_stdin == 2) {\n")
+    fprintf(loc_fh, "        return loc_decode_binary_stream(stdin, brief);\n")
+    fprintf(loc_fh, "    }\n")
+
+    # Generate the actual body of the decoder's source, for LOC-ID args.
+    fprintf(loc_fh, "\n    for (; i < argc; i++) {\n")
+    fprintf(loc_fh, "        loc_decode_one((loc_t) strtoul(argv[i], NULL, 10), brief);\n")
+    fprintf(loc_fh, "    }\n")
+    fprintf(loc_fh, "    return(0);\n")
+    fprintf(loc_fh, "}\n")
+
+    fprintf(loc_fh, "\n// clang-format on\n")
+    # pylint: enable-msg=too-many-statements
+    # pylint: enable-msg=too-many-arguments
+
+###############################################################################
+def gen_loc_decoder_helpers(loc_fh):
+    """
+    Generate the helper functions of the stand-alone LOC-decoder program,
+    which decode one LOC-ID, or a stream of LOC-IDs read from a file.
+
+    Arguments:
+        loc_fh          - File handle to generate .c file
+    """
+    loc_fh.write('''
+/* Size of I/O buffers used in streaming mode */
+#define LOC_DECODER_BUFSIZE (1024 * 1024)
+
+/* Decode one LOC-ID, printing its code-location to stdout */
+static void
+loc_decode_one(loc_t loc, int brief)
+{
+    if (brief) {
+        printf("%s:%d ", LOC_FILE(loc), LOC_LINE(loc));
+    } else {
+        printf("%u: [fnum=%d] %s:%d ",
+               loc, LOC_FILE_TOKEN(loc), LOC_FILE(loc), LOC_LINE(loc));
+    }
+#ifdef LOC_FUNC
+    /* Function ranges were generated, by --gen-func-ranges */
+    const char *func = LOC_FUNC(loc);
+    if (*func) {
+        printf("%s() ", func);
+    }
+#endif
+    printf("\\n");
+}
+
+/* Decode LOC-IDs read from 'fp', one decimal value per line */
+static int
+loc_decode_text_stream(FILE *fp, int brief)
+{
+    char line[128];
+    while (fgets(line, sizeof(line), fp) != NULL) {
+        char *endp = NULL;
+        unsigned long val = strtoul(line, &endp, 10);
+        if (endp != line) {
+            loc_decode_one((loc_t) val, brief);
+        }
+    }
+    return (ferror(fp) ? 1 : 0);
+}
+
+/* Decode LOC-IDs read from 'fp', as a stream of little-endian uint32 values */
+static int
+loc_decode_binary_stream(FILE *fp, int brief)
+{
+    static unsigned char buf[LOC_DECODER_BUFSIZE];
+    size_t nbytes;
+    while ((nbytes = fread(buf, 1, sizeof(buf), fp)) > 0) {
+        const unsigned char *p = buf;
+        const unsigned char *endp = buf + (nbytes & ~((size_t) 3));
+        for (; p < endp; p += 4) {
+            loc_t loc = ((loc_t) p[0]) | ((loc_t) p[1] << 8)
+                        | ((loc_t) p[2] << 16) | ((loc_t) p[3] << 24);
+            loc_decode_one(loc, brief);
+        }
+        if (nbytes & 3) {
+            fprintf(stderr, "Ignored %d trailing bytes of a partial LOC-ID\\n",
+                    (int) (nbytes & 3));
+        }
+    }
+    return (ferror(fp) ? 1 : 0);
+}
+''')
+
+# #############################################################################
+# pylint: disable-msg=line-too-long
+# Ref: https://stackoverflow.com/questions/20388992/python-nice-way-to-iterate-over-shell-command-result
+#      https://stackoverflow.com/questions/25079140/subprocess-popen-checking-for-success-and-errors
+#      https://stackoverflow.com/questions/21406887/subprocess-changing-directory
+#      https://stackoverflow.com/questions/32984058/ld-cant-open-output-file-for-writing-bin-s-errno-2-for-architecture-x86-64
+# pylint: enable-msg=line-too-long
+# #############################################################################
+def gen_cc_loc_decoder(tmpdir, loc_dirname, loc_decode_bin, loc_decode_dotc,
+                       full_loct_doth, full_loc_doth, full_loc_dotc,
+                       loc_debug, decoder_cache=None, full_loc_funcs_dotc=None) -> int:
+    # pylint: disable-msg=too-many-arguments
+    """
+    Compile the generated loc-decoder source file to generate the LOC-decoder
+    binary, specific for the code-base being processed.
+
+    If a 'decoder_cache' dir is given, a decoder binary previously compiled
+    from identical generated sources, by the same compiler, is reused from
+    this cache, skipping the compilation.
+
+    Parameters:
+        tmpdir          - /tmp-dir where decoder binary will be produced
+        loc_decode_bin  - Decoder-binary name
+        loc_decode_dotc - Decoder-binary's .c file name
+        full_loct_doth  - Full path-name of generated loc_tokens.h
+        full_loc_doth   - Full path-name of generated loc.h
+        full_loc_dotc   - Full path-name of generated loc_filenames.c
+        decoder_cache   - Dir caching compiled decoder binaries; None for no cache
+        full_loc_funcs_dotc - Full path-name of generated loc_funcranges.c,
+                              to be linked-in; None if not generated
+    Returns: 0 upon success, non-zero otherwise
+    """
+    # pylint: disable-msg=too-many-locals
+    # pylint: disable-msg=import-outside-toplevel
+    import shutil
+    import subprocess as sp
+    # pylint: enable-msg=import-outside-toplevel
+
+    full_loc_decode_bin = loc_dirname + loc_decode_bin
+
+    gen_dotcs = [full_loc_dotc]
+    if full_loc_funcs_dotc is not None:
+        gen_dotcs.append(full_loc_funcs_dotc)
+
+    # Binaries are only reused from, or cached in, a dir private to the user,
+    # as cached binaries are copied to loc_dirname and run.
+    cached_bin = None
+    if decoder_cache is not None and not locu.loc_private_dir(decoder_cache):
+        fprintf(sys.stderr, "Not caching LOC-decoder binary: %s is not a dir"
+                " owned, and only writable, by the user\n", decoder_cache)
+    elif decoder_cache is not None:
+        cached_bin = os.path.join(decoder_cache,
+                                  loc_decoder_cache_key([tmpdir + loc_decode_dotc,
+                                                         full_loct_doth,
+                                                         full_loc_doth]
+                                                        + gen_dotcs))
+        if os.path.exists(cached_bin):
+            if loc_debug:
+                print("Reuse cached LOC-decoder binary " + cached_bin)
+            os.utime(cached_bin)    # Most recently used: Evicted last
+            shutil.copy2(cached_bin, full_loc_decode_bin)
+            return 0
+
+    # User may have generated filenames.c in some other src-dir. We don't want
+    # to pollute the user's src/ tree by generating objects. If user has not
+    # used cmdline args to relocate generated files to somewhere other than
+    # /tmp-dir, cp over to /tmp-dir the files required to compile the standalone
+    # decoder binary.
+    if os.path.dirname(full_loct_doth) + '/' != tmpdir:
+        shutil.copy2(full_loct_doth, tmpdir)
+    if os.path.dirname(full_loc_doth) + '/' != tmpdir:
+        shutil.copy2(full_loc_doth, tmpdir)
+    for gen_dotc in gen_dotcs:
+        if os.path.dirname(gen_dotc) + '/' != tmpdir:
+            shutil.copy2(gen_dotc, tmpdir)
+
+    tmp_loc_dotcs = [tmpdir + os.path.basename(gen_dotc) for gen_dotc in gen_dotcs]
+
+    if loc_debug:
+        print(  "tmp_loc_dotcs   = " + " ".join(tmp_loc_dotcs) + "\n"
+              + "loc_decode_dotc = " + loc_decode_dotc + "\n"
+              + "loc_dirname     = " + loc_dirname + "\n"
+              + "loc_decode_bin  = " + loc_decode_bin)
+
+    try:
+        result = sp.run(["cc", "-o", full_loc_decode_bin,
+                          "-I" , tmpdir]
+                          + tmp_loc_dotcs
+                          + [tmpdir + loc_decode_dotc],
+                          text=True,
+                          check=True,
+                          capture_output=True, cwd=tmpdir
+                          )
+    except sp.CalledProcessError as exc:
+        print("sp.run() Status: FAIL, rc=", exc.returncode,
+              "\nargs=", exc.args,
+              "\nstdout=", exc.stdout,
+              "\nstderr=", exc.stderr)
+        return 1
+
+    if cached_bin is not None and result.returncode == 0:
+        # Populate the cache atomically, as concurrent generator runs may
+        # be racing to cache the same decoder binary.
+        tmp_cached_bin = cached_bin + '.' + str(os.getpid()) + '.tmp'
+        shutil.copy2(full_loc_decode_bin, tmp_cached_bin)
+        os.replace(tmp_cached_bin, cached_bin)
+        os.utime(cached_bin)
+        loc_evict_decoder_cache(decoder_cache, LOC_DECODER_CACHE_MAX_ENTRIES)
+
+    return result.returncode
+    # pylint: enable-msg=too-many-locals
+    # pylint: enable-msg=too-many-arguments
+
+###############################################################################
+def loc_evict_decoder_cache(decoder_cache, max_entries) -> int:
+    """
+    Remove all but the 'max_entries' most recently used binaries from the
+    decoder cache 'decoder_cache'. Binaries are marked used by their mtime.
+
+    Returns: # of binaries removed.
+    """
+    entries = []
+    with os.scandir(decoder_cache) as dir_iter:
+        for entry in dir_iter:
+            if entry.name.endswith('.tmp') or not entry.is_file(follow_symlinks=False):
+                continue    # Being cached by a concurrent run, or not ours
+            try:
+                entries.append((entry.stat(follow_symlinks=False).st_mtime_ns, entry.path))
+            except OSError:
+                continue
+
+    nremoved = 0
+    for (_, cached_bin) in sorted(entries, reverse=True)[max_entries:]:
+        try:
+            os.remove(cached_bin)
+            nremoved += 1
+        except OSError:
+            pass
+    return nremoved
+
+###############################################################################
+def loc_decoder_cache_key(gen_files) -> str:
+    """
+    Return the key identifying a compiled LOC-decoder binary in the decoder
+    cache: A hash of the contents of the generated source files it's compiled
+    from, and of the identity of the compiler, 'cc', found in $PATH.
+    """
+    # pylint: disable-msg=import-outside-toplevel
+    import hashlib
+    import shutil
+    # pylint: enable-msg=import-outside-toplevel
+
+    hasher = hashlib.sha256()
+    for gen_file in gen_files:
+        with open(gen_file, 'rb') as gen_fh:
+            hasher.update(gen_fh.read())
+        hasher.update(b'\0')
+
+    # Identify the compiler by its resolved path, size and mtime. This is
+    # much cheaper than running 'cc --version', and changes on any upgrade.
+    cc_path = shutil.which("cc")
+    if cc_path is not None:
+        cc_path = os.path.realpath(cc_path)
+        cc_stat = os.stat(cc_path)
+        hasher.update(("%s:%d:%d" % (cc_path, cc_stat.st_size,
+                                     cc_stat.st_mtime_ns)).encode())
+
+    return hasher.hexdigest()
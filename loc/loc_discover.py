@@ -0,0 +1,273 @@
+#!/usr/bin/python3
+################################################################################
+# loc_discover.py
+# SPDX-License-Identifier: Apache-2.0
+################################################################################
+"""
+Source-discovery backends used by the LOC generator script.
+
+Each backend returns the list of files under a source root-dir as a list of
+(dir-path, file-name) pairs, where dir-path is prefixed by the source root-dir
+exactly as it was supplied. The list is in the order that os.walk() visits
+files when sub-dirs and files are sorted: the files of a directory, sorted,
+followed by the contents of each of its sub-dirs, sorted. File-index
+numbering downstream depends on this order, so all backends produce the
+same numbering for the same set of files.
+
+Sub-dirs and files can be excluded using glob patterns, which are matched
+against the name of the sub-dir / file as well as against its path relative
+to the source root-dir. Excluded sub-dirs are pruned from the walk, without
+visiting anything under them.
+
+Supported backends:
+  walk             - Walk the directory tree (default)
+  git              - Files in the git index, via 'git ls-files'
+  compile-commands - Source files listed in a compile_commands.json
+  stdin            - Newline-separated list of file names on stdin
+"""
+
+import os
+import re
+import sys
+import json
+import fnmatch
+
+LOC_DISCOVER_METHODS = ['walk', 'git', 'compile-commands', 'stdin']
+
+###############################################################################
+class LocDiscoverError(Exception):
+    """ Raised when the list of source files cannot be discovered. """
+
+###############################################################################
+def loc_discover_sources(src_root_dir:str, method:str='walk',
+                         compile_commands:str=None,
+                         exclude_dirs:list=None, excludes:list=None) -> list:
+    """
+    Discover files under 'src_root_dir' using the named discovery 'method'.
+
+    Arguments:
+        src_root_dir     - Top-level source root-dir
+        method           - One of LOC_DISCOVER_METHODS
+        compile_commands - compile_commands.json file, for that method.
+                           Default: <src_root_dir>/compile_commands.json
+        exclude_dirs     - List of glob patterns of sub-dirs to exclude
+        excludes         - List of glob patterns of files to exclude
+
+    Returns: List of (dir-path, file-name) pairs, in walk-order.
+    """
+    # pylint: disable-msg=too-many-arguments
+    if method == 'walk':
+        return loc_walk_sources(src_root_dir, exclude_dirs, excludes)
+
+    if method == 'git':
+        rel_paths = loc_git_rel_paths(src_root_dir)
+    elif method == 'compile-commands':
+        if compile_commands is None:
+            compile_commands = os.path.join(src_root_dir, 'compile_commands.json')
+        rel_paths = loc_compile_commands_rel_paths(src_root_dir, compile_commands)
+    elif method == 'stdin':
+        rel_paths = loc_paths_to_rel_paths(src_root_dir,
+                                           [line.rstrip('\n') for line in sys.stdin])
+    else:
+        raise LocDiscoverError("Unknown source-discovery method: " + method)
+
+    rel_paths = loc_exclude_rel_paths(rel_paths, exclude_dirs, excludes)
+    return loc_rel_paths_to_walk_order(src_root_dir, rel_paths)
+    # pylint: enable-msg=too-many-arguments
+
+###############################################################################
+def loc_walk_sources(src_root_dir:str, exclude_dirs:list=None,
+                     excludes:list=None) -> list:
+    """
+    Walk the directory tree under 'src_root_dir', returning all files found.
+
+    This is os.walk(), with sorted sub-dirs and files, done using
+    os.scandir() so that the file-type of each entry comes from the
+    directory listing itself, without an extra stat() per entry. Sub-dirs
+    matching 'exclude_dirs' are pruned; files matching 'excludes' are skipped.
+    As with os.walk(), symbolic links to sub-dirs are not followed.
+    """
+    exclude_dir_match = loc_glob_matcher(exclude_dirs)
+    exclude_match = loc_glob_matcher(excludes)
+
+    found_files = []
+
+    # Stack of (dir-path, path-relative-to-src_root_dir) to visit.
+    dirs_to_visit = [(src_root_dir, '')]
+    while dirs_to_visit:
+        (root, rel_root) = dirs_to_visit.pop()
+        listing = loc_list_dir(root, rel_root, exclude_dir_match, exclude_match)
+        if listing is None:
+            continue
+        (files, dirs) = listing
+
+        found_files.extend((root, file) for file in files)
+
+        # Push sub-dirs in reverse-sorted order, so they are visited sorted.
+        for subdir in reversed(dirs):
+            dirs_to_visit.append((root + '/' + subdir, rel_root + subdir + '/'))
+
+    return found_files
+
+###############################################################################
+def loc_list_dir(dir_path:str, rel_path:str, exclude_dir_match=None,
+                 exclude_match=None):
+    """
+    List one directory, 'dir_path', at 'rel_path' relative to the source
+    root-dir ('' for the root-dir, else ending in '/').
+
+    Returns: (files, sub-dirs), each a sorted list of names, without those
+             matching 'exclude_match' / 'exclude_dir_match' or symbolic links
+             to sub-dirs; None if the directory cannot be listed.
+    """
+    files = []
+    dirs = []
+    try:
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    if not entry.is_symlink():
+                        dirs.append(entry.name)
+                else:
+                    files.append(entry.name)
+    except OSError:
+        return None
+
+    # Ensure list of files is sorted, so we get a consistent numbering on
+    # all platforms, in case the product is supported on diff OS'es
+    files = [file for file in sorted(files)
+             if not (exclude_match and exclude_match(file, rel_path + file))]
+    dirs = [subdir for subdir in sorted(dirs)
+            if not (exclude_dir_match and exclude_dir_match(subdir, rel_path + subdir))]
+    return (files, dirs)
+
+###############################################################################
+def loc_git_rel_paths(src_root_dir:str) -> list:
+    """
+    Return the paths, relative to 'src_root_dir', of files under it that
+    are in the git index.
+    """
+    # pylint: disable-msg=import-outside-toplevel
+    import subprocess as sp
+    # pylint: enable-msg=import-outside-toplevel
+
+    try:
+        result = sp.run(['git', '-C', src_root_dir, 'ls-files', '-z', '--cached'],
+                        check=True, capture_output=True)
+    except (OSError, sp.CalledProcessError) as exc:
+        stderr = getattr(exc, 'stderr', None)
+        raise LocDiscoverError("git ls-files failed under " + src_root_dir + ": "
+                               + (stderr.decode(errors='replace').strip()
+                                  if stderr else str(exc))) from exc
+
+    return [path for path in result.stdout.decode().split('\0') if path]
+
+###############################################################################
+def loc_compile_commands_rel_paths(src_root_dir:str, compile_commands:str) -> list:
+    """
+    Return the paths, relative to 'src_root_dir', of source files compiled by
+    the entries in a compile_commands.json compilation database.
+    """
+    try:
+        with open(compile_commands, encoding="utf8") as cc_fh:
+            entries = json.load(cc_fh)
+    except (OSError, ValueError) as exc:
+        raise LocDiscoverError("Cannot read compilation database "
+                               + compile_commands + ": " + str(exc)) from exc
+
+    if not isinstance(entries, list):
+        raise LocDiscoverError("Compilation database " + compile_commands
+                               + " is not a list of entries")
+
+    paths = []
+    for entry in entries:
+        if (not isinstance(entry, dict) or not isinstance(entry.get('file'), str)
+                or not isinstance(entry.get('directory', ''), str)):
+            raise LocDiscoverError("Compilation database " + compile_commands
+                                   + ": Entry without a \"file\": " + str(entry))
+        paths.append(os.path.join(entry.get('directory', ''), entry['file']))
+
+    return loc_paths_to_rel_paths(src_root_dir, paths)
+
+###############################################################################
+def loc_paths_to_rel_paths(src_root_dir:str, paths:list) -> list:
+    """
+    Convert a list of file paths, absolute or relative to the current dir,
+    to a de-duplicated list of paths relative to 'src_root_dir'. Empty
+    entries and files outside 'src_root_dir' are dropped.
+    """
+    abs_root_dir = os.path.abspath(src_root_dir)
+    rel_paths = set()
+    for path in paths:
+        if not path:
+            continue
+        rel_path = os.path.relpath(os.path.abspath(path), abs_root_dir)
+        if rel_path == os.pardir or rel_path.startswith(os.pardir + os.sep):
+            continue
+        rel_paths.add(rel_path)
+
+    return list(rel_paths)
+
+###############################################################################
+def loc_glob_matcher(patterns:list):
+    """
+    Compile a list of glob patterns into a matcher function, match(name,
+    rel_path), which returns True if any pattern matches either the name
+    or the relative path. Returns None if there are no patterns.
+    """
+    if not patterns:
+        return None
+
+    match = re.compile('|'.join(fnmatch.translate(pattern)
+                                for pattern in patterns)).match
+
+    return lambda name, rel_path: bool(match(name) or match(rel_path))
+
+###############################################################################
+def loc_exclude_rel_paths(rel_paths:list, exclude_dirs:list, excludes:list) -> list:
+    """
+    Drop paths, relative to the source root-dir, of files which match
+    'excludes', or which are under any sub-dir that matches 'exclude_dirs'.
+    """
+    exclude_dir_match = loc_glob_matcher(exclude_dirs)
+    exclude_match = loc_glob_matcher(excludes)
+    if exclude_dir_match is None and exclude_match is None:
+        return rel_paths
+
+    kept_paths = []
+    for rel_path in rel_paths:
+        parts = rel_path.split('/')
+        if exclude_match and exclude_match(parts[-1], rel_path):
+            continue
+        if exclude_dir_match and any(exclude_dir_match(parts[idx],
+                                                       '/'.join(parts[:idx + 1]))
+                                     for idx in range(len(parts) - 1)):
+            continue
+        kept_paths.append(rel_path)
+
+    return kept_paths
+
+###############################################################################
+def loc_rel_paths_to_walk_order(src_root_dir:str, rel_paths:list) -> list:
+    """
+    Sort a list of paths relative to 'src_root_dir' in the order that
+    loc_walk_sources() would have found them, and return them as
+    (dir-path, file-name) pairs.
+    """
+    def walk_order_key(rel_path):
+        # Within a directory, files [0] come before sub-dirs [1], each sorted
+        # by name. Comparing tuples of these keys reproduces the walk-order.
+        parts = rel_path.split('/')
+        return tuple((1, part) for part in parts[:-1]) + ((0, parts[-1]),)
+
+    found_files = []
+    for rel_path in sorted(rel_paths, key=walk_order_key):
+        (rel_dir, file) = os.path.split(rel_path)
+        root = src_root_dir + '/' + rel_dir if rel_dir else src_root_dir
+        found_files.append((root, file))
+
+    return found_files
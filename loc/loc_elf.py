@@ -0,0 +1,361 @@
+#!/usr/bin/python3
+################################################################################
+# loc_elf.py
+# SPDX-License-Identifier: Apache-2.0
+################################################################################
+"""
+Offline decoder for LOC2 LOC-IDs, reading the 'loc_ids' ELF section of a
+program binary directly. No need to run the program, and no dependencies
+outside of the Python standard library.
+
+With the LOC2 scheme (include/loc.h, src/loc.c) every __LOC__ creates a
+static LOC{} record { func, file, line, spare } in the 'loc_ids' section.
+The LOC-ID is the offset of that record from the Loc_id_ref record.
+Decoding a LOC-ID, offline, thus means:
+
+  - Find the 'loc_ids' section and the address of the Loc_id_ref symbol.
+  - Read the LOC{} record at (Loc_id_ref + LOC-ID).
+  - Resolve its 'func' / 'file' pointers to the strings in .rodata. In
+    position-independent binaries these pointers are only filled-in at
+    load-time, by R_*_RELATIVE relocations. So we apply those relocations
+    (RELA, REL or packed RELR), as if the binary were loaded at address 0.
+
+Usage:
+    with LocElf('<program-binary>') as loc_elf:
+        (func, file, line) = loc_elf.decode(loc_id)
+"""
+
+import mmap
+import struct
+import hashlib
+
+LOC_ELF_SECTION = 'loc_ids'
+LOC_ELF_REF_SYMBOL = 'Loc_id_ref'
+
+# ELF constants used here. Ref: /usr/include/elf.h
+ELFCLASS32 = 1
+ELFCLASS64 = 2
+ELFDATA2LSB = 1
+SHT_SYMTAB = 2
+SHT_RELA = 4
+SHT_NOTE = 7
+SHT_NOBITS = 8
+SHT_REL = 9
+SHT_DYNSYM = 11
+SHT_RELR = 19
+PT_LOAD = 1
+NT_GNU_BUILD_ID = 3
+
+# R_<arch>_RELATIVE relocation type, by e_machine
+ELF_RELATIVE_RELOC_TYPES = {
+    3   : 8,        # EM_386     : R_386_RELATIVE
+    8   : 3,        # EM_MIPS    : R_MIPS_REL32
+    20  : 22,       # EM_PPC     : R_PPC_RELATIVE
+    21  : 22,       # EM_PPC64   : R_PPC64_RELATIVE
+    22  : 12,       # EM_S390    : R_390_RELATIVE
+    40  : 23,       # EM_ARM     : R_ARM_RELATIVE
+    62  : 8,        # EM_X86_64  : R_X86_64_RELATIVE
+    183 : 1027,     # EM_AARCH64 : R_AARCH64_RELATIVE
+    243 : 3,        # EM_RISCV   : R_RISCV_RELATIVE
+    258 : 3,        # EM_LOONGARCH : R_LARCH_RELATIVE
+}
+
+###############################################################################
+class LocElfError(Exception):
+    """ Raised when a binary is not an ELF file with LOC2 LOC-IDs in it. """
+
+###############################################################################
+class LocElf:
+    """
+    Read-only view of the LOC2 'loc_ids' section of an ELF program binary.
+    """
+    # pylint: disable-msg=too-many-instance-attributes
+
+    def __init__(self, elf_file:str):
+        self.elf_file = elf_file
+        with open(elf_file, 'rb') as elf_fh:
+            self.mmap = mmap.mmap(elf_fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self.parse_elf_header()
+            self.sections = self.parse_section_headers()
+            self.segments = self.parse_program_headers()
+            self.loc_section = self.find_loc_section()
+            self.loc_ref_addr = self.find_symbol(LOC_ELF_REF_SYMBOL)
+            self.relocs = self.parse_relative_relocs()
+        except (LocElfError, struct.error, IndexError) as exc:
+            self.close()
+            if isinstance(exc, LocElfError):
+                raise
+            raise LocElfError(elf_file + ": Malformed ELF file: " + str(exc)) from exc
+
+        # struct LOC { const char *func, *file; uint32_t line, spare; }
+        self.loc_rec_fmt = self.endian + self.addr_fmt * 2 + 'II'
+        self.loc_rec_size = struct.calcsize(self.loc_rec_fmt)
+
+        # Cache of strings read, keyed on their address
+        self.strings = {}
+
+    # -------------------------------------------------------------------------
+    def parse_elf_header(self):
+        """ Parse the ELF file header, establishing word size and endianness """
+        if self.mmap[:4] != b'\x7fELF':
+            raise LocElfError(self.elf_file + ": Not an ELF file.")
+
+        elf_class = self.mmap[4]
+        if elf_class not in (ELFCLASS32, ELFCLASS64):
+            raise LocElfError(self.elf_file + ": Unknown ELF class " + str(elf_class))
+
+        self.endian = '<' if self.mmap[5] == ELFDATA2LSB else '>'
+        self.is_64bit = elf_class == ELFCLASS64
+        self.addr_fmt = 'Q' if self.is_64bit else 'I'
+        self.addr_size = 8 if self.is_64bit else 4
+
+        # e_type .. e_shstrndx, following the 16-byte e_ident[]
+        hdr_fmt = self.endian + 'HHI' + self.addr_fmt * 3 + 'IHHHHHH'
+        (_, self.machine, _, _, self.phoff, self.shoff, _, _,
+         self.phentsize, self.phnum, self.shentsize, self.shnum,
+         self.shstrndx) = struct.unpack_from(hdr_fmt, self.mmap, 16)
+
+    # -------------------------------------------------------------------------
+    def parse_section_headers(self) -> list:
+        """
+        Return list of section headers, as dicts with the fields used here.
+        """
+        if self.is_64bit:
+            sh_fmt = self.endian + 'IIQQQQIIQQ'
+        else:
+            sh_fmt = self.endian + 'IIIIIIIIII'
+
+        sections = []
+        for idx in range(self.shnum):
+            (name, sh_type, _, addr, offset, size, link, _, addralign, _) \
+                = struct.unpack_from(sh_fmt, self.mmap, self.shoff + idx * self.shentsize)
+            sections.append({'name_off': name, 'type': sh_type, 'addr': addr,
+                             'offset': offset, 'size': size, 'link': link,
+                             'addralign': addralign})
+
+        shstrtab = sections[self.shstrndx]
+        for section in sections:
+            section['name'] = self.read_cstring_at(shstrtab['offset'] + section['name_off'])
+
+        return sections
+
+    # -------------------------------------------------------------------------
+    def parse_program_headers(self) -> list:
+        """ Return list of (vaddr, file-offset, file-size) of PT_LOAD segments """
+        if self.is_64bit:
+            ph_fmt = self.endian + 'IIQQQQQQ'
+        else:
+            ph_fmt = self.endian + 'IIIIIIII'
+
+        segments = []
+        for idx in range(self.phnum):
+            fields = struct.unpack_from(ph_fmt, self.mmap, self.phoff + idx * self.phentsize)
+            if self.is_64bit:
+                (p_type, _, offset, vaddr, _, filesz, _, _) = fields
+            else:
+                (p_type, offset, vaddr, _, filesz, _, _, _) = fields
+            if p_type == PT_LOAD:
+                segments.append((vaddr, offset, filesz))
+
+        return segments
+
+    # -------------------------------------------------------------------------
+    def find_loc_section(self) -> dict:
+        """ Return the section header of the 'loc_ids' section """
+        for section in self.sections:
+            if section['name'] == LOC_ELF_SECTION:
+                return section
+        raise LocElfError(self.elf_file + ": No '" + LOC_ELF_SECTION
+                          + "' section found. Is this program built with LOC2?")
+
+    # -------------------------------------------------------------------------
+    def symbols(self):
+        """
+        Generator of (name-offset, value, size, section-index) of the symbols
+        in .symtab and .dynsym. name-offset is the file offset of the name.
+        """
+        if self.is_64bit:
+            sym_fmt = self.endian + 'IBBHQQ'
+        else:
+            sym_fmt = self.endian + 'IIIBBH'
+        sym_size = struct.calcsize(sym_fmt)
+
+        for symtab in self.sections:
+            if symtab['type'] not in (SHT_SYMTAB, SHT_DYNSYM):
+                continue
+            strtab_off = self.sections[symtab['link']]['offset']
+            for sym_off in range(symtab['offset'], symtab['offset'] + symtab['size'], sym_size):
+                fields = struct.unpack_from(sym_fmt, self.mmap, sym_off)
+                if self.is_64bit:
+                    (name_off, _, _, shndx, value, size) = fields
+                else:
+                    (name_off, value, size, _, _, shndx) = fields
+                yield (strtab_off + name_off, value, size, shndx)
+
+    # -------------------------------------------------------------------------
+    def find_symbol(self, sym_name:str) -> int:
+        """ Return the address of symbol 'sym_name' from .symtab or .dynsym """
+        want = sym_name.encode() + b'\0'
+        for (name_start, value, _, _) in self.symbols():
+            if self.mmap[name_start:name_start + len(want)] == want:
+                return value
+
+        raise LocElfError(self.elf_file + ": Symbol '" + sym_name + "' not found."
+                          + " Is the binary stripped?")
+
+    # -------------------------------------------------------------------------
+    def parse_relative_relocs(self) -> dict:
+        """
+        Return a dict mapping address -> relocated value, for R_*_RELATIVE
+        relocations (as if loaded at address 0) that apply to 'loc_ids'.
+        Implicit-addend relocations (REL / RELR) need no entry; the value in
+        the file is already the relocated value.
+        """
+        relative_type = ELF_RELATIVE_RELOC_TYPES.get(self.machine)
+        sec_start = self.loc_section['addr']
+        sec_end = sec_start + self.loc_section['size']
+
+        relocs = {}
+        for section in self.sections:
+            if section['type'] != SHT_RELA or relative_type is None:
+                continue
+            if self.is_64bit:
+                rela_fmt = self.endian + 'QQq'
+            else:
+                rela_fmt = self.endian + 'IIi'
+            rela_size = struct.calcsize(rela_fmt)
+            for rel_off in range(section['offset'], section['offset'] + section['size'],
+                                 rela_size):
+                (r_offset, r_info, r_addend) = struct.unpack_from(rela_fmt, self.mmap,
+                                                                  rel_off)
+                r_type = (r_info & 0xffffffff) if self.is_64bit else (r_info & 0xff)
+                if r_type == relative_type and sec_start <= r_offset < sec_end:
+                    relocs[r_offset] = r_addend
+
+        return relocs
+
+    # -------------------------------------------------------------------------
+    def vaddr_to_offset(self, vaddr:int) -> int:
+        """ Map a virtual address to its offset in the file; -1 if unmapped """
+        for (seg_vaddr, seg_offset, seg_filesz) in self.segments:
+            if seg_vaddr <= vaddr < seg_vaddr + seg_filesz:
+                return seg_offset + (vaddr - seg_vaddr)
+
+        for section in self.sections:
+            if (section['type'] != SHT_NOBITS and section['addr']
+                    and section['addr'] <= vaddr < section['addr'] + section['size']):
+                return section['offset'] + (vaddr - section['addr'])
+
+        return -1
+
+    # -------------------------------------------------------------------------
+    def read_cstring_at(self, offset:int) -> str:
+        """ Read a NUL-terminated string at file 'offset' """
+        end = self.mmap.find(b'\0', offset)
+        if end < 0:
+            end = len(self.mmap)
+        return self.mmap[offset:end].decode(errors='replace')
+
+    # -------------------------------------------------------------------------
+    def read_string(self, vaddr:int) -> str:
+        """ Read the string at virtual address 'vaddr'; "" if unmapped """
+        string = self.strings.get(vaddr)
+        if string is None:
+            offset = self.vaddr_to_offset(vaddr) if vaddr else -1
+            string = self.read_cstring_at(offset) if offset >= 0 else ""
+            self.strings[vaddr] = string
+        return string
+
+    # -------------------------------------------------------------------------
+    def read_loc_record(self, rec_addr:int) -> (str, str, int):
+        """
+        Read the LOC{} record at virtual address 'rec_addr', resolving its
+        func / file pointers. Returns (func, file, line).
+        """
+        rec_offset = self.loc_section['offset'] + (rec_addr - self.loc_section['addr'])
+        (func_ptr, file_ptr, line, _) = struct.unpack_from(self.loc_rec_fmt, self.mmap,
+                                                           rec_offset)
+        func_ptr = self.relocs.get(rec_addr, func_ptr)
+        file_ptr = self.relocs.get(rec_addr + self.addr_size, file_ptr)
+        return (self.read_string(func_ptr), self.read_string(file_ptr), line)
+
+    # -------------------------------------------------------------------------
+    def decode(self, loc_id:int) -> (str, str, int):
+        """
+        Crack open a LOC2 LOC-ID and return a triple (function, file, line#)
+        Raises ValueError if the LOC-ID does not point to a LOC{} record
+        within the 'loc_ids' section.
+        """
+        rec_addr = self.loc_ref_addr + loc_id
+        sec_start = self.loc_section['addr']
+        sec_end = sec_start + self.loc_section['size']
+        if (not sec_start <= rec_addr <= sec_end - self.loc_rec_size
+                or rec_addr % self.addr_size):
+            raise ValueError("LOC-ID " + str(loc_id) + " is not a valid LOC-ID in "
+                             + self.elf_file)
+        return self.read_loc_record(rec_addr)
+
+    # -------------------------------------------------------------------------
+    def loc_ids(self) -> list:
+        """
+        Return sorted list of all LOC-IDs in the 'loc_ids' section, excluding
+        the Loc_id_ref record itself.
+
+        The compiler pads the LOC{} records to the alignment it chooses, so
+        they are found using the (local) symbols of the section, when the
+        binary is not stripped. Otherwise, records are assumed to be laid
+        out at a stride of the record size rounded up to the section's
+        alignment.
+        """
+        loc_shndx = self.sections.index(self.loc_section)
+        rec_addrs = {value for (_, value, size, shndx) in self.symbols()
+                     if shndx == loc_shndx and size == self.loc_rec_size}
+        rec_addrs.discard(self.loc_ref_addr)
+        if not rec_addrs:
+            align = max(self.loc_section['addralign'], 1)
+            stride = -(-self.loc_rec_size // align) * align
+            sec_start = self.loc_section['addr']
+            rec_addrs = set(range(sec_start,
+                                  sec_start + self.loc_section['size']
+                                            - self.loc_rec_size + 1,
+                                  stride))
+
+        rec_addrs.discard(self.loc_ref_addr)
+        return sorted(rec_addr - self.loc_ref_addr for rec_addr in rec_addrs)
+
+    # -------------------------------------------------------------------------
+    def build_id(self) -> str:
+        """
+        Return the GNU build-id of the binary, as a hex string. Binaries
+        linked without --build-id are identified by the SHA-256 of their
+        contents instead.
+        """
+        for section in self.sections:
+            if section['type'] != SHT_NOTE:
+                continue
+            note_off = section['offset']
+            note_end = note_off + section['size']
+            while note_off + 12 <= note_end:
+                (namesz, descsz, note_type) = struct.unpack_from(self.endian + 'III',
+                                                                 self.mmap, note_off)
+                name_off = note_off + 12
+                desc_off = name_off + ((namesz + 3) & ~3)
+                if (note_type == NT_GNU_BUILD_ID
+                        and self.mmap[name_off:name_off + namesz] == b'GNU\0'):
+                    return self.mmap[desc_off:desc_off + descsz].hex()
+                note_off = desc_off + ((descsz + 3) & ~3)
+
+        return 'sha256-' + hashlib.sha256(self.mmap).hexdigest()
+
+    # -------------------------------------------------------------------------
+    def close(self):
+        """ Unmap the ELF file """
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,752 @@
+#!/usr/bin/python3
+################################################################################
+# loc_emit.py
+# SPDX-License-Identifier: Apache-2.0
+################################################################################
+"""
+Emitters of the LOC files generated by gen_loc_files.py, from the scans of
+the source roots: the loc_tokens.h tokens, the Loc_FileNamesList[] of
+loc_filenames.c, the interface loc.h, the per-file index shards and the
+function line-ranges of loc_funcranges.c; and the writer of the generated
+files to disk.
+"""
+
+import os
+import sys
+
+import loc.utils as locu
+from loc.utils import fprintf
+from loc.loc_profile import loc_profile_phase
+import loc.loc_func_ranges as locf
+
+# Full path-name of the generator script, named in the banner of generated files
+LOC_GEN_SCRIPT = os.path.join(os.path.dirname(__file__), 'gen_loc_files.py')
+
+# List of the index shards generated, in the index shards dir
+LOC_SHARDS_MANIFEST = '.loc_shards'
+
+###############################################################################
+def gen_loc_generated_files(doth_fh, dotc_fh, root_scans, dump_dup_files,
+                            verbose, funcs_fh=None, index_map=None):
+    """
+    Function to drive the generation of the generated files:
+        $TMPDIR/loc.h
+        $TMPDIR/loc_filenames.c
+
+    Merge the source files found under all source roots, as scanned by
+    loc_scan_src_roots(), into one dictionary of file_names. The list of
+    file names and the associated tokens are generated off this common
+    listing of files. Hence, this function takes both doth_fh & dotc_fh as
+    inputs.
+
+    Roots are merged in the order they were specified, and files in the
+    walk-order of each root, in one pass over all files. So the generated
+    output does not depend on the order in which the roots' scans finished.
+
+    Arguments:
+        dotc_fh          - File handle for generated .h file
+        dotc_fh          - File handle for generated .c file
+        root_scans       - List of per-root scans, by loc_scan_src_roots()
+        dump_dup_files   - Boolean; Dump list of dup file names found
+        verbose          - Boolean; Print verbose messages for debugging
+        funcs_fh         - File handle for generated loc_funcranges.c; None
+                           to not generate the function line-ranges table
+        index_map        - LocIndexMap to assign file-indexes by; None to
+                           number files in sorted order of their tokens
+
+    Returns: (max-file-index, max-num-lines-across-all-files,
+              file-with-max-lines, file-table)
+              max-file-index is the number-of-files, unless an index map
+              leaves indexes of deleted files in use.
+              file-table is a list of (file-full-name, line-count), indexed
+              by file-index, as generated in Loc_FileNamesList[].
+    """
+    # pylint: disable-msg=too-many-arguments
+    # pylint: disable-msg=too-many-locals
+    # Hash on file's base name as key, mapping it to full-name w/dir-path
+    file_names = {}
+    file_paths = {} # Path of the file, to read it by
+    file_lines = {} # of lines in the file
+
+    # Hash to collect any duplicate filenames, that are renamed below
+    dup_file_names = {}
+
+    max_num_lines = 0
+    file_w_max_num_lines = ""
+
+    for (root_name, src_files) in root_scans:
+        for (file_path, file, file_full_name, num_lines) in src_files:
+            file_base_name = file
+            if file in file_names:
+
+                # print(  "Skip duplicate file " + file
+                #       + " (Found: " + file_names[file_base_name] + ")")
+
+                # Extend the file's name to include the sub-dir's name.
+                # This should more than likely eliminate the duplicate
+                file_base_name = os.path.basename(os.path.dirname(file_path)) + "_" + file
+
+                # Same sub-dir / file name under another root: Qualify it
+                # with the root's name, and then with a sequence number.
+                if file_base_name in file_names:
+                    file_base_name = root_name.replace('/', '_') + "_" + file_base_name
+                dup_base_name = file_base_name
+                dup_seq = 2
+                while file_base_name in file_names:
+                    file_base_name = dup_base_name + "_" + str(dup_seq)
+                    dup_seq += 1
+
+                dup_file_names[file_base_name] = file_full_name
+
+            file_names[file_base_name] = file_full_name
+            file_paths[file_base_name] = file_path
+            file_lines[file_base_name] = num_lines
+
+            if num_lines > max_num_lines:
+                max_num_lines = num_lines
+                file_w_max_num_lines = file_full_name
+
+    # File-index of each file, and names of deleted files still holding one
+    (index_keys, deleted_names) = loc_index_keys(file_names, index_map)
+
+    # ########################################################################
+    # Using the hash of filenames, process the list of files to get the max
+    # filename length. This will used to auto-format the token in .h file.
+    #
+    (max_key_name, max_file_name) = find_max_name_lengths(file_names)
+    max_file_name = max_file_name + 1   # Add an extra space
+
+    gen_loc_doth_tokens(doth_fh, file_names, max_key_name, index_keys, file_lines,
+                        deleted_names)
+
+    # Generate the file names in the array of file names
+    gen_loc_dotc_filenames(dotc_fh, file_names, max_file_name, file_lines,
+                           index_keys, deleted_names)
+
+    if funcs_fh is not None:
+        gen_loc_dotc_func_ranges(funcs_fh, index_keys, file_paths, verbose)
+
+    if dump_dup_files:
+        pr_dup_file_names(dup_file_names)
+
+    return ((len(index_keys) - 1), max_num_lines, file_w_max_num_lines,
+            loc_file_table(file_names, file_lines, index_keys, deleted_names))
+    # pylint: enable-msg=too-many-locals
+    # pylint: enable-msg=too-many-arguments
+
+###############################################################################
+def loc_index_keys(file_names, index_map=None) -> (list, dict):
+    """
+    Assign file-indexes to the files in 'file_names': In sorted order of
+    their keys (tokens), or as persisted in 'index_map'.
+
+    Returns: (index-keys, deleted-names)
+              index-keys is the list of file's key in 'file_names', indexed by
+              file-index; None at index 0 (Unknown_file) and at indexes of
+              deleted files. deleted-names is a dict of the full-name of each
+              deleted file, on its file-index.
+    """
+    if index_map is None:
+        return ([None] + sorted(file_names.keys()), {})
+
+    file_keys = {file_full_name: file for (file, file_full_name) in file_names.items()}
+    file_indexes = index_map.assign(file_keys.keys())
+    deleted_names = index_map.deleted_names()
+
+    index_keys = [None] * (max([0] + list(file_indexes.values())
+                               + list(deleted_names.keys())) + 1)
+    for (file_full_name, file_index) in file_indexes.items():
+        index_keys[file_index] = file_keys[file_full_name]
+
+    return (index_keys, deleted_names)
+
+###############################################################################
+def loc_file_table(file_names, file_lines, index_keys, deleted_names) -> list:
+    """
+    Return the list of (file-full-name, line-count), indexed by file-index,
+    in the order the file names are generated in Loc_FileNamesList[].
+    Deleted files keep their name, with a line-count of 0.
+    """
+    file_table = [("Unknown_file", 0)]
+    for file_index in range(1, len(index_keys)):
+        file = index_keys[file_index]
+        if file is None:
+            file_table.append((deleted_names.get(file_index, ""), 0))
+        else:
+            file_table.append((file_names[file], file_lines[file]))
+
+    return file_table
+
+###############################################################################
+def gen_loc_doth_tokens(doth_fh, file_names, max_key_namelen, index_keys, file_lines,
+                        deleted_names):
+    """
+    Generate the #define mnemonics for each file's file-name-index
+
+    Arguments:
+        doth_fh     - File handle to output to
+        file_names  - Hash of file names
+        maxKeyName  - Max key-name length (.c file's basename is key)
+        index_keys  - List of file's key in file_names, on file-index; None
+                      for index 0 and for deleted files
+        file_lines  - Hash of file's line-count, on file name
+        deleted_names - Hash of deleted file's full-name, on file-index
+    """
+    # pylint: disable-msg=too-many-arguments
+    # pylint: disable-msg=too-many-locals
+    num_files = len(index_keys) - 1
+
+    # Print this as a comment right at the beginning, for ease of readability.
+    fprintf(doth_fh, "// LOC_MAX_FILE_NUM=%d   ... "
+                     + "Used to update generated file in the source tree.\n\n",
+            num_files)
+
+    # In #define, we prepend 'LOC_'. Account for that in field's width.
+    # Print format will be, e.g.: "#define %-37s %-5d // %s \n"
+    max_name_field_width = max_key_namelen + len("LOC_")
+
+    # pylint: disable-msg=line-too-long
+    token_printfmt = "#define %-" + str(max_name_field_width) + "s %-5d // %s: L=%d (line count)\n"
+    # pylint: enable-msg=line-too-long
+
+    fctr = 0
+    unknown_file = "Unknown_file"
+
+    fprintf(doth_fh, token_printfmt, "LOC_UNKNOWN_FILE", fctr, unknown_file, 0)
+
+    max_line_count = 0
+    token_printfmt = "#define %-" + str(max_name_field_width) + "s %-5d // %s: L=%d\n"
+    dup_printfmt = "// #define %-" + str(max_name_field_width - 3) + "s %-5d // %s: L=%d\n"
+    deleted_printfmt = ("// #define %-" + str(max_name_field_width - 3)
+                        + "s %-5d // %s: L=0 (deleted)\n")
+
+    unique_tokens = set() # To eliminate duplicate generated tokens
+
+    printfmt = token_printfmt
+    num_dup_tokens = 0
+    for file in index_keys[1:]:
+        fctr += 1
+
+        if file is None:
+            # Deleted file: Keep its name, so older LOC-IDs still decode.
+            deleted_name = deleted_names.get(fctr, "")
+            fprintf(doth_fh, deleted_printfmt,
+                    xform_fname_to_token(os.path.basename(deleted_name)), fctr, deleted_name)
+            continue
+
+        file_full_name = file_names[file]
+
+        # Generate the LOC_<token>, replacing '.' and '-' with "_"
+        fname_token = xform_fname_to_token(file)
+        if fname_token in unique_tokens:
+            printfmt = dup_printfmt
+            num_dup_tokens += 1 # Expect that likelihood of finding dups is very low
+        else:
+            # Save-off generated tokens to eliminate duplicates.
+            unique_tokens.add(fname_token)
+
+        fprintf(doth_fh, printfmt, fname_token, fctr, file_full_name, file_lines[file])
+
+        printfmt = token_printfmt
+
+        if file_lines[file] > max_line_count:
+            max_line_count = file_lines[file]
+
+    fprintf(doth_fh, "\n")
+    fprintf(doth_fh, token_printfmt, "LOC_MAX_FILE_NUM", fctr, "LOC MAX LINE COUNT",
+            max_line_count)
+
+    fprintf(doth_fh, token_printfmt, "LOC_NUM_FILES",
+            (fctr + 1), "Size of filenames lookup array",
+            0)
+    # pylint: enable-msg=too-many-locals
+    # pylint: enable-msg=too-many-arguments
+
+###############################################################################
+def gen_loc_interface_doth(doth_fh, loc_dotc, nbits_files, nbits_lines,
+                           func_ranges=False, index_shards=False):
+    """
+    Generate the external interfaces for this LOC-machinery.
+    The split of bits between the file-index and line-number components is
+    sized to the source code base processed; see loc_compute_nbits().
+
+    Arguments:
+        doth_fh     - File handle to output to
+        loc_dotc    - Name of generated dot-c file
+        nbits_files - # of bits for file-index component of a LOC-ID
+        nbits_lines - # of bits for line-number component of a LOC-ID
+        func_ranges - Boolean; Declare LOC_FUNC(), defined in loc_funcranges.c
+        index_shards - Boolean; LOC_FILE_INDEX comes from each file's index
+                       shard, rather than from loc_tokens.h
+    """
+    # pylint: disable-msg=too-many-arguments
+
+    fprintf(doth_fh, "#include <inttypes.h>    /* Needed for uint32_t */\n")
+    if index_shards:
+        fprintf(doth_fh, "\n/* LOC_FILE_INDEX is defined by each file's index shard,"
+                         + " e.g. -include <index-shards-dir>/<file-name>.h */\n\n")
+    else:
+        fprintf(doth_fh, "#include \"loc_tokens.h\"\n\n")
+
+    fprintf(doth_fh,
+            "#define LOC_NBITS_FILES %d       // # of bits for file-index component.\n",
+            nbits_files)
+
+    fprintf(doth_fh,
+            "#define LOC_NBITS_LINES %d       // # of bits for line-number component.\n",
+            nbits_lines)
+
+    # Masks are meant for internal use; hence LOC__
+    files_mask = (1 << nbits_files) -  1
+    fprintf(doth_fh,
+            "#define LOC__MASK_FILES 0x%x   // %d: Mask to extract file-index component.\n",
+            files_mask, files_mask)
+
+    lines_mask = (1 << nbits_lines) -  1
+    fprintf(doth_fh,
+            "#define LOC__MASK_LINES 0x%x   // %d: Mask to extract line-number component.\n",
+            lines_mask, lines_mask)
+
+    fprintf(doth_fh, "\ntypedef uint32_t loc_t;\n")
+
+    fprintf(doth_fh, "\n/* Encode a (f=file-index, l=line-number) into a loc_t value */\n")
+    fprintf(doth_fh, "#define LOC_ENCODE(f,l) (loc_t) (((f) << LOC_NBITS_LINES) | (l))\n")
+
+    fprintf(doth_fh, "\n/* Encode a (file-index, __LINE__) into a loc_t value */\n")
+    fprintf(doth_fh, "#define __LOC__ LOC_ENCODE(LOC_FILE_INDEX, __LINE__)\n")
+
+    fprintf(doth_fh, "\n/* Extract file-index from an encoded loc_t value */\n")
+    fprintf(doth_fh, "#define LOC_FILE_TOKEN(v) ((v) >> LOC_NBITS_LINES)\n")
+
+    fprintf(doth_fh, "\n/* External reference to lookup array defined in %s */\n",
+            loc_dotc)
+    fprintf(doth_fh, "extern const char *Loc_FileNamesList [];\n")
+    if index_shards:
+        fprintf(doth_fh, "extern int Loc_FileNamesList_len;\n")
+
+
+    # pylint: disable-msg=line-too-long
+    fprintf(doth_fh, "\n/* Safe-accessor at index 'i' from string-lookup array, 'lt', of size 'n'. */\n")
+
+    fprintf(doth_fh, "#define LOC__SAFE_LOOKUP(lt, i, n) ")
+    fprintf(doth_fh, "    ((((i) >= 0) && ((i) < (n))) ? (lt)[(i)] : (const char *) \"\")\n")
+
+    fprintf(doth_fh, "\n/* Extract file-name from an encoded loc_t value */\n")
+    fprintf(doth_fh, "#define LOC_FILE(v) LOC__SAFE_LOOKUP(Loc_FileNamesList, LOC_FILE_TOKEN(v), %s)\n",
+            ("Loc_FileNamesList_len" if index_shards else "LOC_NUM_FILES"))
+
+    fprintf(doth_fh, "\n/* Extract line-number from an encoded loc_t value */\n")
+    fprintf(doth_fh, "#define LOC_LINE(v) ((v) & LOC__MASK_LINES)\n")
+
+    if func_ranges:
+        fprintf(doth_fh, "\n/* Lookup of function enclosing a loc_t value, defined in %s */\n",
+                locf.LOC_FUNC_RANGES_DOTC)
+        fprintf(doth_fh, "extern const char *loc_func_name(loc_t loc);\n")
+
+        fprintf(doth_fh, "\n/* Extract function-name from an encoded loc_t value */\n")
+        fprintf(doth_fh, "#define LOC_FUNC(v) loc_func_name(v)\n")
+    # pylint: enable-msg=line-too-long
+    # pylint: enable-msg=too-many-arguments
+
+
+###############################################################################
+def gen_loc_dotc_filenames(dotc_fh, file_names, max_file_name, file_lines,
+                           index_keys, deleted_names):
+    """
+    Generate the static array of file names to the generated .c file. This is
+    where the meat of the work happens.
+
+    Arguments:
+        dotc_fh         - File handle to output to
+        file_names      - Hash of file names
+        max_file_name   - Max file-name-length
+        file_lines      - Hash of file's line-count, on file name
+        index_keys      - List of file's key in file_names, on file-index;
+                          None for index 0 and for deleted files
+        deleted_names   - Hash of deleted file's full-name, on file-index
+    """
+    # pylint: disable-msg=too-many-arguments
+
+    # Generate start of const char * filenames lookup array
+    gen_loc_file_names_array(dotc_fh, True)
+
+    fctr = 0
+    unknown_file = "Unknown_file"
+
+    # Now that we know the max file name length, generate the print format
+    # First '%s' is the file name, 2nd '%s' is generated spaces for alignment
+    dotc_print_fmt = '      "%s" %s// %d, L=%d (line count)\n'
+
+    # Generate the 0th entry for the unknown-file name
+    spaces = ' ' * (max_file_name - len(unknown_file))
+    fprintf(dotc_fh, dotc_print_fmt, unknown_file, spaces, fctr, 0)
+
+    # Redefine print fmt to have subsequent files separated by ", <filename>"
+    dotc_print_fmt = '    , "%s" %s// %d, L=%d\n'
+    deleted_print_fmt = '    , "%s" %s// %d, L=0 (deleted)\n'
+
+    size_of_string_array = 0
+    for file in index_keys[1:]:
+        fctr += 1
+
+        if file is None:
+            # Deleted file: Keep its name, so older LOC-IDs still decode.
+            file_full_name = deleted_names.get(fctr, "")
+        else:
+            file_full_name = file_names[file]
+
+        # Generate spaces to blank-pad generated name for alignment
+        spaces = ' ' * (max_file_name - len(file_full_name))
+
+        size_of_string_array += len(file_full_name)
+
+        if file is None:
+            fprintf(dotc_fh, deleted_print_fmt, file_full_name, spaces, fctr)
+        else:
+            fprintf(dotc_fh, dotc_print_fmt, file_full_name, spaces, fctr, file_lines[file])
+
+    # Generate closing of filenames lookup array
+    gen_loc_file_names_array(dotc_fh, False)
+
+    # Include n-ptrs in the total space consumed by this array.
+    size_of_string_array += (fctr * 8)
+
+    fprintf(dotc_fh, "\n/* Overhead of FilenamesList[] array"
+                     + ": %d bytes (%.f KB) */\n\n",
+                     size_of_string_array, (size_of_string_array / 1024.0))
+
+    filenames_list_len_str = "(sizeof(Loc_FileNamesList)/sizeof(*Loc_FileNamesList))"
+    fprintf(dotc_fh, "\nint Loc_FileNamesList_len = "
+                     + filenames_list_len_str + ";\n\n")
+
+    # fprintf(dotc_fh, "COMPILE_TIME_ASSERT(("
+    #                  + filenames_list_len_str
+    #                  + " == LOC_MAX_FILE_NUM + 1), "LengthOfFileNamesListArrayIsIncorrect");\n")
+    fprintf(dotc_fh,"// clang-format on\n")
+    # pylint: enable-msg=too-many-arguments
+
+###############################################################################
+def gen_loc_index_shards(shards_dir, file_table, deleted_names) -> dict:
+    """
+    Generate the index shards of all live files: For file <file-name>, as listed
+    in Loc_FileNamesList[], <file-name>.h #define's its LOC_FILE_INDEX and
+    <file-name>.rsp has the -D option defining it. Shards are small, and
+    only re-written if changed, so compile-time does not grow with the
+    number of files.
+
+    Arguments:
+        shards_dir      - Dir to generate shards in
+        file_table      - List of (file-full-name, line-count), indexed by
+                          file-index, as from loc_file_table()
+        deleted_names   - Hash of deleted file's full-name, on file-index;
+                          deleted files get no shard
+
+    Returns: { shard's full path-name: contents }, of all shards.
+    """
+    shards = {}
+    for (file_index, (file_full_name, _)) in enumerate(file_table):
+        if file_index == 0 or file_index in deleted_names or not file_full_name:
+            continue    # Unknown_file, deleted files and unused indexes
+
+        shard_base = os.path.join(shards_dir, file_full_name)
+        shards[shard_base + '.h'] = ("/* Generated LOC index shard of " + file_full_name
+                                     + " */\n#define LOC_FILE_INDEX " + str(file_index) + "\n")
+        shards[shard_base + '.rsp'] = "-DLOC_FILE_INDEX=" + str(file_index) + "\n"
+
+    return shards
+
+###############################################################################
+def gen_loc_dotc_func_ranges(funcs_fh, index_keys, file_paths, verbose):
+    """
+    Generate the table of function line-ranges of all files, and the
+    loc_func_name() lookup function, to the generated loc_funcranges.c file.
+    Ranges of file-index 'i' are in Loc_FuncRangesList[] from entry
+    Loc_FuncRangesIndex[i] up to entry Loc_FuncRangesIndex[i + 1], sorted by
+    start line, so the lookup is a binary search.
+
+    Arguments:
+        funcs_fh        - File handle to output to
+        index_keys      - List of file's key, on file-index; None for index 0
+                          and for deleted files, which have no ranges
+        file_paths      - Hash of file's path, on file name
+        verbose         - Boolean; Print verbose messages for debugging
+    """
+    fprintf(funcs_fh, "#include \"loc.h\"\n\n")
+    fprintf(funcs_fh, "// clang-format off\n")
+    fprintf(funcs_fh, "typedef struct loc_func_range {\n")
+    fprintf(funcs_fh, "    uint32_t    start;  // Line where function definition starts\n")
+    fprintf(funcs_fh, "    uint32_t    end;    // Line where function definition ends\n")
+    fprintf(funcs_fh, "    const char *func;   // Function name\n")
+    fprintf(funcs_fh, "} loc_func_range;\n\n")
+
+    # Entry 0 is a place-holder, so the array is never empty.
+    fprintf(funcs_fh, "static const loc_func_range Loc_FuncRangesList[] = {\n")
+    fprintf(funcs_fh, '      { 0, 0, "" }   // 0\n')
+
+    range_index = [1, 1]     # Unknown_file, at file-index 0, has no ranges
+    fctr = 0
+    for file in index_keys[1:]:
+        fctr += 1
+        if file is None:
+            range_index.append(range_index[-1])
+            continue
+        try:
+            func_ranges = locf.loc_scan_func_ranges(file_paths[file])
+        except OSError as exc:
+            if verbose:
+                fprintf(sys.stderr, "Skip function ranges of %s: %s\n",
+                        file_paths[file], str(exc))
+            func_ranges = []
+
+        for (start_line, end_line, func) in func_ranges:
+            fprintf(funcs_fh, '    , { %d, %d, "%s" }   // %d\n',
+                    start_line, end_line, func, fctr)
+        range_index.append(range_index[-1] + len(func_ranges))
+
+    fprintf(funcs_fh, "};\n\n")
+
+    fprintf(funcs_fh, "/* Index of 1st entry in Loc_FuncRangesList[] of each file-index */\n")
+    fprintf(funcs_fh, "#define LOC_FUNC_RANGES_NUM_FILES %d\n", fctr + 1)
+    fprintf(funcs_fh, "static const uint32_t"
+                      + " Loc_FuncRangesIndex[LOC_FUNC_RANGES_NUM_FILES + 1] = {\n")
+    fprintf(funcs_fh, "    %s\n", ", ".join(str(idx) for idx in range_index))
+    fprintf(funcs_fh, "};\n")
+
+    funcs_fh.write(r'''
+/* Return name of the function enclosing the code-location of LOC-ID 'loc' */
+const char *
+loc_func_name(loc_t loc)
+{
+    uint32_t fidx = LOC_FILE_TOKEN(loc);
+    uint32_t line = LOC_LINE(loc);
+    if (fidx >= LOC_FUNC_RANGES_NUM_FILES) {
+        return "";
+    }
+
+    /* Find the last range of this file starting at, or before, 'line' */
+    uint32_t lo = Loc_FuncRangesIndex[fidx];
+    uint32_t hi = Loc_FuncRangesIndex[fidx + 1];
+    while (lo < hi) {
+        uint32_t mid = lo + ((hi - lo) / 2);
+        if (Loc_FuncRangesList[mid].start <= line) {
+            lo = mid + 1;
+        } else {
+            hi = mid;
+        }
+    }
+    if ((lo > Loc_FuncRangesIndex[fidx]) && (line <= Loc_FuncRangesList[lo - 1].end)) {
+        return Loc_FuncRangesList[lo - 1].func;
+    }
+    return "";
+}
+''')
+    fprintf(funcs_fh, "// clang-format on\n")
+
+    if verbose:
+        fprintf(sys.stdout, "Found %d function ranges in %d files.\n",
+                range_index[-1] - 1, fctr)
+
+
+###############################################################################
+def loc_write_outputs(config, result, profile=None):
+    """
+    Write the generated files of 'result' to disk. Files are only re-written
+    if their contents changed, so build systems do not rebuild what depends
+    on them, and are replaced atomically, so concurrent compiles never see
+    a partially written file.
+    """
+    (nshards, nstale) = (0, 0)
+    prev_shards = []
+    if config.shards_dirname is not None:
+        prev_shards = loc_read_shards_manifest(config.shards_dirname)
+
+    with loc_profile_phase(profile, 'write', len(result.artifacts)):
+        for (file_name, contents) in result.artifacts.items():
+            is_shard = file_name in result.shards
+            if is_shard or file_name.endswith('/' + LOC_SHARDS_MANIFEST):
+                os.makedirs(os.path.dirname(file_name), exist_ok=True)
+            if not locu.write_if_changed(file_name, contents):
+                continue
+            result.written.append(file_name)
+
+            if is_shard:
+                nshards += 1
+            elif config.verbose:
+                fprintf(sys.stdout, 'Generated ' + file_name + '\n')
+
+        if config.shards_dirname is not None:
+            nstale = loc_remove_stale_shards(config.shards_dirname, prev_shards,
+                                             result.shards)
+
+    if config.shards_dirname is not None and config.verbose:
+        fprintf(sys.stdout, 'Generated %d of %d index shard files in %s,'
+                ' removed %d stale ones\n',
+                nshards, len(result.shards), config.shards_dirname, nstale)
+
+###############################################################################
+def gen_loc_shards_manifest(shards_dir, shard_files) -> str:
+    """
+    Return the contents of the shards manifest of 'shards_dir', listing the
+    index shards 'shard_files', one per line, relative to 'shards_dir'.
+    """
+    return ''.join(os.path.relpath(shard_file, shards_dir) + '\n'
+                   for shard_file in sorted(shard_files))
+
+###############################################################################
+def loc_read_shards_manifest(shards_dir) -> list:
+    """
+    Return the index shards listed in the shards manifest of 'shards_dir',
+    relative to 'shards_dir'; [] if there is no manifest.
+    """
+    try:
+        with open(os.path.join(shards_dir, LOC_SHARDS_MANIFEST), 'r',
+                  encoding='utf8') as manifest_fh:
+            return manifest_fh.read().splitlines()
+    except OSError:
+        return []
+
+###############################################################################
+def loc_remove_stale_shards(shards_dir, prev_shards, shard_files) -> int:
+    """
+    Remove the index shards 'prev_shards', as listed in the shards manifest
+    by the previous run, that are not in 'shard_files', i.e. those of files
+    deleted, or renamed, since, and any sub-dirs left empty. Only shards a
+    run generated are removed, so other files in 'shards_dir' are left
+    alone.
+
+    Returns: # of shard files removed.
+    """
+    nstale = 0
+    for shard in prev_shards:
+        shard_file = os.path.normpath(os.path.join(shards_dir, shard))
+        if (shard_file in shard_files
+                or os.path.commonpath([shards_dir, shard_file]) != shards_dir):
+            continue    # Still a shard, or not under shards_dir
+        try:
+            os.remove(shard_file)
+        except OSError:
+            continue
+        nstale += 1
+
+        # Remove sub-dirs of shards_dir left empty
+        dir_name = os.path.dirname(shard_file)
+        while dir_name != shards_dir and not os.listdir(dir_name):
+            os.rmdir(dir_name)
+            dir_name = os.path.dirname(dir_name)
+    return nstale
+
+###############################################################################
+def gen_doth_include_guards(doth_fh, file_name, begin_block):
+    """
+    Generate ifndef directives to guard against multiple .h file inclusions
+    """
+
+    # Build guard_name as '__LOC__'
+    guard_name = "__" + os.path.basename(file_name).upper() + "__"
+    guard_name = guard_name.replace(".", "_")
+
+    doth_fh.write("\n")
+    if begin_block:
+        doth_fh.write("// clang-format off\n")
+        doth_fh.write('''#ifndef ''' + guard_name)
+        doth_fh.write("\n")
+        doth_fh.write("\n")
+    else:
+        doth_fh.write("// clang-format off\n")
+        doth_fh.write("#endif  /* " + guard_name + " */")
+        doth_fh.write("\n")
+
+###############################################################################
+def gen_loc_file_names_array(dotc_fh, array_begin):
+    """
+    Generate start and end of the Loc_FileNames[] array definition
+    """
+    if array_begin:
+        dotc_fh.write("// clang-format off\n")
+        dotc_fh.write("const char *Loc_FileNamesList [] =\n{\n")
+    else:
+        dotc_fh.write("\n};\n")
+
+###############################################################################
+def gen_loc_file_banner_msg(file_hdl, src_dir, file_name):
+    """
+    Function to generate the banner for a generated file
+
+    Arguments:
+        file_hdl    - File handle for generated .h/.c file
+        src_dir     - Full path to source code root dir
+        file_name   - Generated .h file's name
+    """
+
+    file_hdl.write('''/*
+ * ****************************************************************************
+ * ''' + file_name + '''
+ *
+ * WARNING: This is a generated file.
+ * Any change you make here will be overwritten!
+ *
+ * This file was generated by processing all source files under
+ *     ''' + src_dir + '''
+ *
+ * Script executed:
+ * ''' + LOC_GEN_SCRIPT + '''
+ * ****************************************************************************
+ */
+''')
+
+###############################################################################
+def loc_src_roots_msg(src_root_dirs) -> str:
+    """
+    Return the list of source root-dirs, one per line in generated banners.
+    """
+    return '\n *     '.join(src_root_dirs)
+
+###############################################################################
+def find_max_name_lengths(file_names):
+    """
+    Helper function for auto-formatting output for readability.
+    Walk an input hash of file names, and find out the max key-name length
+    and max filename-length.
+
+    Arguments:
+        file_names - Hash of files found, key is files' base name
+
+    Return (max-key-name-length, max-file-name-length)
+    """
+
+    max_key_name  = 0
+    max_file_name = 0
+    for file in file_names.keys():
+        max_key_name = max(max_key_name, len(file))
+        max_file_name = max(max_file_name, len(file_names[file]))
+
+    return(max_key_name, max_file_name)
+
+###############################################################################
+# Helper routines:
+###############################################################################
+def xform_fname_to_token(filename):
+    """
+    Transform a filename to its token that will become the filename-index.
+    E.g. "murmum_hash.c" will become "LOC_murmur_hash_c"
+         "preproc-pointer-to-struct.c" becomes "preproc_pointer_to_struct.c"
+    """
+    fname_token = filename.replace(".", "_")
+    fname_token = fname_token.replace("-", "_")
+    return "LOC_" + fname_token
+
+# ------------------------------------------------------------------------------
+def pr_dup_file_names(dup_file_names):
+    """ Print a list of duplicate file names from a hash """
+
+    if len(dup_file_names) == 0:
+        return
+
+    fprintf(sys.stdout, "Duplicate file names found:\n")
+    pr_hash(dup_file_names)
+
+# ------------------------------------------------------------------------------
+def pr_hash(this_hash):
+    """ Print a list of names from a hash """
+    for file in this_hash.keys():
+        fprintf(sys.stdout, "  %s:%s\n", file, this_hash[file])
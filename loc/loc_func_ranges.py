@@ -0,0 +1,269 @@
+#!/usr/bin/python3
+################################################################################
+# loc_func_ranges.py
+# SPDX-License-Identifier: Apache-2.0
+################################################################################
+"""
+Lightweight scanner to find the line ranges of the function definitions in
+a C / C++ source file, without needing a compiler.
+
+The generator uses this to emit a per-file table of function ranges, so that
+decoders can map a (file-index, line) to its enclosing function by a binary
+search. This is purely a decode-time aid; __LOC__ is unchanged.
+
+The scanner blanks out comments, string / char literals and preprocessor
+lines, and tracks { } nesting. At file, namespace, extern "C" or class
+scope, a '{' that follows a name and a parenthesized parameter list opens
+a function body. Function names are qualified by the enclosing namespace /
+class names, e.g. 'ns::Klass::method'.
+
+This is a heuristic, and code hidden behind macros may be missed or
+mis-named; decoders fall back to "" when no function range is found.
+"""
+
+import re
+
+# Name of generated .c file with the table of function line-ranges
+LOC_FUNC_RANGES_DOTC = 'loc_funcranges.c'
+
+# Comments, string / char literals and preprocessor lines (w/continuations)
+LOC_FUNC_STRIP_RE = re.compile(r'//[^\n]*'
+                               r'|/\*.*?\*/'
+                               r'|"(?:\\.|[^"\\\n])*"'
+                               r"|'(?:\\.|[^'\\\n])*'"
+                               r'|^[ \t]*#(?:\\\n|[^\n])*',
+                               re.DOTALL | re.MULTILINE)
+
+# Identifiers, multi-char tokens that matter here, and any other character
+LOC_FUNC_TOKEN_RE = re.compile(r'[A-Za-z_]\w*|::|->|\S')
+
+LOC_FUNC_IDENT_RE = re.compile(r'[A-Za-z_]\w*$')
+
+# Identifiers that look like a function name when followed by '('
+LOC_FUNC_NOT_NAMES = frozenset(('if', 'for', 'while', 'switch', 'catch', 'return',
+                                'sizeof', 'alignof', 'alignas', 'decltype',
+                                'noexcept', 'throw', 'defined', 'static_assert',
+                                '_Static_assert', '__attribute__', '__declspec',
+                                'requires'))
+
+# Keywords opening a scope that may contain function definitions
+LOC_FUNC_CLASS_KEYWORDS = ('class', 'struct', 'union')
+
+LOC_FUNC_ACCESS_SPECIFIERS = ('public', 'private', 'protected')
+
+# Kinds of { } blocks tracked by the scanner
+LOC_BLOCK_SCOPE = 'scope'   # namespace / extern "C" / class body
+LOC_BLOCK_FUNC = 'func'     # Function body
+LOC_BLOCK_INIT = 'init'     # Brace-initializer in a constructor's init-list
+LOC_BLOCK_OTHER = 'other'   # Anything else
+
+###############################################################################
+def loc_scan_func_ranges(src_file:str) -> list:
+    """
+    Scan source file 'src_file' for function definitions.
+
+    Returns: List of (start-line, end-line, function-name), sorted by
+             start-line. Ranges do not overlap.
+    """
+    with open(src_file, 'rb') as src_fh:
+        code = src_fh.read().decode('utf8', errors='replace')
+    return loc_func_ranges(code)
+
+###############################################################################
+def loc_func_ranges(code:str) -> list:
+    """
+    Find the function definitions in C / C++ source 'code'.
+
+    Returns: List of (start-line, end-line, function-name), sorted by
+             start-line.
+    """
+    # Blank out comments, literals etc., preserving the line numbering.
+    code = LOC_FUNC_STRIP_RE.sub(lambda match: '\n' * match.group().count('\n'), code)
+
+    func_ranges = []
+    blocks = []     # Stack of (kind, name, start-line) of open { } blocks
+    pending = []    # (token, line) seen at a scope level since last ';', '{' or '}'
+    line = 1
+    pos = 0
+    for match in LOC_FUNC_TOKEN_RE.finditer(code):
+        line += code.count('\n', pos, match.start())
+        pos = match.start()
+        token = match.group()
+
+        at_scope = not blocks or blocks[-1][0] == LOC_BLOCK_SCOPE
+        if not at_scope:
+            loc_nested_token(token, line, blocks, pending, func_ranges)
+            continue
+
+        if token == '{':
+            (kind, name, start_line) = loc_classify_block(pending, blocks)
+            blocks.append((kind, name, start_line if start_line else line))
+            if kind != LOC_BLOCK_INIT:
+                pending = []
+        elif token == '}':
+            if blocks:
+                blocks.pop()
+            pending = []
+        elif token == ';':
+            pending = []
+        elif (token == ':' and len(pending) == 1
+              and pending[0][0] in LOC_FUNC_ACCESS_SPECIFIERS):
+            pending = []
+        else:
+            pending.append((token, line))
+
+    func_ranges.sort()
+    return func_ranges
+
+###############################################################################
+def loc_nested_token(token:str, line:int, blocks:list, pending:list, func_ranges:list):
+    """
+    Track the nesting of { } blocks inside a function body, or some other
+    block, adding the range of a function to 'func_ranges' as its body ends.
+    """
+    if token == '{':
+        blocks.append((LOC_BLOCK_OTHER, None, line))
+    elif token == '}':
+        (kind, name, start_line) = blocks.pop()
+        if kind == LOC_BLOCK_FUNC:
+            func_ranges.append((start_line, line, name))
+        elif kind == LOC_BLOCK_INIT and (not blocks or blocks[-1][0] == LOC_BLOCK_SCOPE):
+            pending.append((token, line))
+
+###############################################################################
+def loc_classify_block(pending:list, blocks:list) -> (str, str, int):
+    """
+    Classify the { } block about to be opened at a scope level, given the
+    'pending' tokens preceding its '{'.
+
+    Returns: (block-kind, name, start-line); name is the qualified function
+             name for a function body, or the scope's name for a scope.
+    """
+    tokens = [token for (token, _) in pending]
+    if not tokens:
+        return (LOC_BLOCK_OTHER, None, 0)
+
+    if 'namespace' in tokens:
+        name = ''.join(tokens[tokens.index('namespace') + 1:])
+        return (LOC_BLOCK_SCOPE, name if name else None, 0)
+
+    if tokens == ['extern']:
+        return (LOC_BLOCK_SCOPE, None, 0)
+
+    func_block = loc_classify_func_block(pending, tokens, blocks)
+    if func_block is not None:
+        return func_block
+
+    if '=' not in tokens:
+        for keyword in LOC_FUNC_CLASS_KEYWORDS:
+            if keyword in tokens:
+                idx = tokens.index(keyword) + 1
+                name = tokens[idx] if (idx < len(tokens)
+                                       and LOC_FUNC_IDENT_RE.match(tokens[idx])) else None
+                return (LOC_BLOCK_SCOPE, name, 0)
+
+    return (LOC_BLOCK_OTHER, None, 0)
+
+###############################################################################
+def loc_classify_func_block(pending:list, tokens:list, blocks:list):
+    """
+    Classify the { } block about to be opened, if its 'pending' tokens are
+    those of a function definition.
+
+    Returns: (block-kind, name, start-line), as for loc_classify_block(), of
+             a function body or a member's brace-initializer; None if the
+             tokens are not those of a function definition.
+    """
+    func = loc_find_func_signature(tokens)
+    if func is None:
+        return None
+
+    (name_start, name, param_end) = func
+    tail = tokens[param_end + 1:]
+    if ':' in tail and LOC_FUNC_IDENT_RE.match(tail[-1]):
+        # 'Klass() : member{' : Brace-initializer of a member
+        return (LOC_BLOCK_INIT, None, 0)
+
+    scope_names = [block[1] for block in blocks if block[1]]
+    return (LOC_BLOCK_FUNC, '::'.join(scope_names + [name]), pending[name_start][1])
+
+###############################################################################
+def loc_find_func_signature(tokens:list):
+    """
+    Find a function's name and parameter list in the tokens preceding a '{'.
+
+    Returns: (index-of-name's-first-token, name, index-of-params'-closing-')')
+             or None if 'tokens' are not those of a function definition.
+    """
+    depth = 0
+    for (idx, token) in enumerate(tokens):
+        if token == '=' and depth == 0 and 'operator' not in tokens[max(idx - 3, 0):idx]:
+            return None
+        if token == ')':
+            depth -= 1
+            continue
+        if token != '(':
+            continue
+        depth += 1
+        if depth != 1 or idx == 0:
+            continue
+
+        name_end = idx
+        if tokens[idx - 1] == 'operator' and tokens[idx + 1:idx + 2] == [')']:
+            # 'operator()(...)': Parameters follow the '()'
+            continue
+        name_start = loc_func_name_start(tokens, name_end)
+        if name_start is None:
+            continue
+
+        param_end = loc_match_paren(tokens, idx)
+        if param_end is None:
+            return None
+        return (name_start, ''.join(tokens[name_start:name_end]), param_end)
+
+    return None
+
+###############################################################################
+def loc_func_name_start(tokens:list, name_end:int):
+    """
+    Return the index of the first token of the (possibly qualified) function
+    name ending just before 'name_end'; None if there's no function name.
+    """
+    idx = name_end - 1
+    if tokens[idx] == ')' and tokens[idx - 1:idx] == ['(']:
+        idx -= 1    # 'operator()'
+
+    # 'operator' followed by the operator's symbol tokens
+    if not LOC_FUNC_IDENT_RE.match(tokens[idx]):
+        op_idx = idx
+        while op_idx >= 0 and tokens[op_idx] != 'operator' and name_end - op_idx <= 4:
+            op_idx -= 1
+        if op_idx < 0 or tokens[op_idx] != 'operator':
+            return None
+        idx = op_idx
+    elif tokens[idx] in LOC_FUNC_NOT_NAMES:
+        return None
+
+    # Qualifiers: 'ns::Klass::' and '~' of destructors
+    while True:
+        if idx >= 1 and tokens[idx - 1] == '~':
+            idx -= 1
+        if idx >= 2 and tokens[idx - 1] == '::' and LOC_FUNC_IDENT_RE.match(tokens[idx - 2]):
+            idx -= 2
+            continue
+        return idx
+
+###############################################################################
+def loc_match_paren(tokens:list, open_idx:int):
+    """
+    Return the index of the ')' matching the '(' at 'open_idx'; None if none.
+    """
+    depth = 0
+    for idx in range(open_idx, len(tokens)):
+        if tokens[idx] == '(':
+            depth += 1
+        elif tokens[idx] == ')':
+            depth -= 1
+            if depth == 0:
+                return idx
+    return None
@@ -0,0 +1,276 @@
+#!/usr/bin/python3
+################################################################################
+# loc_histogram.py
+# SPDX-License-Identifier: Apache-2.0
+################################################################################
+"""
+Hot call-site histogram over binary trace files of raw LOC-IDs.
+
+A trace file is an array of loc_t values, as dumped by a program, e.g. of
+its allocation or lock sites: little-endian uint32 values for LOC-IDs of the
+Python-generator based scheme, or int32 offsets for LOC2 LOC-IDs.
+
+The file is memory-mapped and consumed in chunks, so files larger than RAM
+are processed in bounded memory. Per-ID counts of each chunk are computed
+with NumPy, using bincount() when the chunk's LOC-IDs span a narrow range,
+and unique() otherwise, and are merged into a running histogram. Only the
+top-N LOC-IDs are then decoded, either through the generated file-names
+table (LocDecoder) or the 'loc_ids' section of a LOC2 program (LocElf).
+
+NumPy is required.
+
+Usage:
+    python3 loc/loc_histogram.py <trace-file> --gen-dir <dir> [ --top <N> ]
+    python3 loc/loc_histogram.py <trace-file> --elf <program-binary> [ --top <N> ]
+"""
+
+import os
+import sys
+import argparse
+from functools import partial
+
+# PYTHONPATH will become ".../LineOfCode" dir, to resolve loc package imports,
+# when run as a script.
+# pylint: disable-msg=wrong-import-position
+if not __package__:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + '/..')
+
+import loc.loc_xform as xform
+# pylint: enable-msg=wrong-import-position
+
+# Default # of LOC-IDs processed per chunk: 64 MB of trace file
+LOC_HIST_CHUNK_SIZE = 16 * 1024 * 1024
+
+# Use bincount() on chunks whose LOC-IDs span at most these many values
+LOC_HIST_BINCOUNT_MAX_RANGE = 4 * 1024 * 1024
+
+# Default # of hottest LOC-IDs reported
+LOC_HIST_TOP_N = 50
+
+###############################################################################
+# main() driver
+###############################################################################
+def main():
+    """
+    Shell to call do_main() with command-line arguments.
+    """
+    do_main(sys.argv[1:])
+
+###############################################################################
+def do_main(args:list):
+    """
+    Print the report of the hottest LOC-IDs in a trace file.
+    """
+    parsed_args = loc_histogram_parse_args(args)
+
+    if parsed_args.elf_file is not None:
+        # pylint: disable-msg=import-outside-toplevel
+        from loc.loc_elf import LocElf, LocElfError
+        # pylint: enable-msg=import-outside-toplevel
+        try:
+            decoder = LocElf(parsed_args.elf_file)
+        except (LocElfError, OSError) as exc:
+            print(exc, file=sys.stderr)
+            sys.exit(1)
+        decode = partial(loc_elf_location, decoder)
+        signed = True
+    elif parsed_args.gen_dir is not None:
+        # pylint: disable-msg=import-outside-toplevel
+        from loc.loc_decoder import LocDecoder
+        # pylint: enable-msg=import-outside-toplevel
+        decoder = LocDecoder(parsed_args.gen_dir)
+        decode = partial(loc_decoder_location, decoder)
+        signed = False
+    else:
+        decode = None
+        signed = parsed_args.signed
+
+    try:
+        report = loc_histogram_report(parsed_args.trace_file, parsed_args.top_n,
+                                      decode, signed, parsed_args.chunk_size)
+    except (ImportError, OSError) as exc:
+        print(exc, file=sys.stderr)
+        sys.exit(1)
+
+    print(loc_format_report(report))
+
+###############################################################################
+def loc_histogram_parse_args(args:list):
+    """
+    Command-line argument parser.
+    """
+    desc = "Report the hottest call-sites in a binary trace file of LOC-IDs."
+    parser = argparse.ArgumentParser(prog='loc_histogram.py', description=desc)
+
+    parser.add_argument('trace_file', metavar='<trace-file>'
+                        , help='File of raw little-endian 32-bit LOC-IDs')
+
+    add_decode_args(parser, LOC_HIST_TOP_N)
+
+    parser.add_argument('--signed', dest='signed'
+                        , action='store_true', default=False
+                        , help='LOC-IDs are signed int32 values, as LOC2 LOC-IDs are.'
+                                + ' Implied by --elf.')
+
+    parser.add_argument('--chunk-size', dest='chunk_size', type=int
+                        , metavar='<num-ids>', default=LOC_HIST_CHUNK_SIZE
+                        , help='# of LOC-IDs processed per chunk. Default: '
+                                + str(LOC_HIST_CHUNK_SIZE))
+
+    return parser.parse_args(args)
+
+###############################################################################
+def add_decode_args(parser, default_top:int):
+    """
+    Add the arguments of reports of the hottest call-sites, shared by this
+    script and loc_count.py, to 'parser': --top, and how to decode LOC-IDs.
+    """
+    parser.add_argument('--top', dest='top_n', type=int
+                        , metavar='<N>', default=default_top
+                        , help='# of hottest LOC-IDs to report. Default: '
+                                + str(default_top))
+
+    parser.add_argument('--gen-dir', dest='gen_dir'
+                        , metavar='<gen-source-dir>', default=None
+                        , help='Dir with the generated loc_filenames.c, to decode'
+                                + ' LOC-IDs with')
+
+    parser.add_argument('--elf', dest='elf_file'
+                        , metavar='<program-binary>', default=None
+                        , help='LOC2 program binary, to decode LOC-IDs with')
+
+###############################################################################
+def loc_histogram(trace_file:str, signed:bool=False,
+                  chunk_size:int=LOC_HIST_CHUNK_SIZE) -> tuple:
+    """
+    Count the occurrences of each LOC-ID in a binary trace file.
+
+    Arguments:
+        trace_file  - File of raw little-endian 32-bit LOC-IDs. Any trailing
+                      partial LOC-ID is ignored.
+        signed      - LOC-IDs are int32 (LOC2), rather than uint32, values
+        chunk_size  - # of LOC-IDs processed per chunk
+
+    Returns: (ids, counts) NumPy arrays; ids are sorted and distinct.
+    """
+    np = xform.loc_require_numpy()
+    dtype = np.dtype('<i4' if signed else '<u4')
+
+    hist_ids = np.empty(0, dtype=dtype.newbyteorder('='))
+    hist_counts = np.empty(0, dtype=np.int64)
+
+    num_ids = os.path.getsize(trace_file) // dtype.itemsize
+    if num_ids == 0:
+        return (hist_ids, hist_counts)
+
+    # Pages of the trace are only faulted-in as each chunk is processed.
+    trace = np.memmap(trace_file, dtype=dtype, mode='r', shape=(num_ids,))
+    for start in range(0, num_ids, chunk_size):
+        (chunk_ids, chunk_counts) = loc_count_chunk(np, trace[start:start + chunk_size])
+        (hist_ids, hist_counts) = loc_merge_counts(np, hist_ids, hist_counts,
+                                                   chunk_ids, chunk_counts)
+    del trace
+
+    return (hist_ids, hist_counts)
+
+###############################################################################
+def loc_count_chunk(np, chunk) -> tuple:
+    """
+    Count the occurrences of each LOC-ID in one chunk of a trace.
+    Returns: (ids, counts) NumPy arrays; ids are sorted and distinct.
+    """
+    chunk = chunk.astype(chunk.dtype.newbyteorder('='), copy=False)
+    min_id = int(chunk.min())
+    id_range = int(chunk.max()) - min_id + 1
+    if id_range <= LOC_HIST_BINCOUNT_MAX_RANGE:
+        counts = np.bincount((chunk.astype(np.int64) - min_id), minlength=id_range)
+        offsets = np.flatnonzero(counts)
+        return ((offsets + min_id).astype(chunk.dtype), counts[offsets].astype(np.int64))
+
+    (ids, counts) = np.unique(chunk, return_counts=True)
+    return (ids, counts.astype(np.int64))
+
+###############################################################################
+def loc_merge_counts(np, ids_a, counts_a, ids_b, counts_b) -> tuple:
+    """
+    Merge two histograms of (sorted, distinct ids, counts) into one.
+    """
+    if ids_a.size == 0:
+        return (ids_b, counts_b)
+
+    (ids, inverse) = np.unique(np.concatenate((ids_a, ids_b)), return_inverse=True)
+    counts = np.zeros(ids.size, dtype=np.int64)
+    np.add.at(counts, inverse.reshape(-1), np.concatenate((counts_a, counts_b)))
+    return (ids, counts)
+
+###############################################################################
+def loc_top_n(ids, counts, top_n:int) -> tuple:
+    """
+    Return the (ids, counts) of the 'top_n' most frequent LOC-IDs, in
+    descending order of counts. Ties are listed in ascending order of LOC-ID.
+    """
+    np = xform.loc_require_numpy()
+    order = np.lexsort((ids, -counts))[:top_n]
+    return (ids[order], counts[order])
+
+###############################################################################
+def loc_histogram_report(trace_file:str, top_n:int=LOC_HIST_TOP_N, decode=None,
+                         signed:bool=False, chunk_size:int=LOC_HIST_CHUNK_SIZE) -> list:
+    """
+    Report the 'top_n' hottest LOC-IDs in a trace file.
+
+    Arguments:
+        trace_file  - File of raw little-endian 32-bit LOC-IDs
+        top_n       - # of LOC-IDs to report
+        decode      - Callable returning the code-location string of a
+                      LOC-ID; None to not decode LOC-IDs
+        signed      - LOC-IDs are int32 (LOC2), rather than uint32, values
+        chunk_size  - # of LOC-IDs processed per chunk
+
+    Returns: List of (LOC-ID, count, percent-of-all-LOC-IDs, code-location)
+    """
+    # pylint: disable-msg=too-many-arguments
+    (ids, counts) = loc_histogram(trace_file, signed, chunk_size)
+    total = int(counts.sum())
+    (top_ids, top_counts) = loc_top_n(ids, counts, top_n)
+
+    report = []
+    for (loc_id, count) in zip(top_ids.tolist(), top_counts.tolist()):
+        report.append((loc_id, count, (100.0 * count / total),
+                       decode(loc_id) if decode is not None else ""))
+    return report
+
+###############################################################################
+def loc_format_report(report:list) -> str:
+    """
+    Format the report of loc_histogram_report() as a table.
+    """
+    lines = ["%12s %8s  %-12s %s" % ("Count", "Percent", "LOC-ID", "Location")]
+    for (loc_id, count, percent, location) in report:
+        lines.append("%12d %7.2f%%  %-12d %s" % (count, percent, loc_id, location))
+    return '\n'.join(lines)
+
+###############################################################################
+def loc_decoder_location(decoder, loc_id:int) -> str:
+    """
+    Return 'file:line [func()]' of a LOC-ID, decoded by a LocDecoder.
+    """
+    func = decoder.func_name(loc_id)
+    return decoder.format(loc_id) + ((' ' + func + '()') if func else '')
+
+###############################################################################
+def loc_elf_location(loc_elf, loc_id:int) -> str:
+    """
+    Return 'file:line func()' of a LOC2 LOC-ID, decoded by a LocElf.
+    """
+    try:
+        (func, file, line) = loc_elf.decode(loc_id)
+    except ValueError:
+        return "<invalid LOC-ID>"
+    return file + ':' + str(line) + ' ' + func + '()'
+
+###############################################################################
+# Start of the script: Execute only if run as a script
+###############################################################################
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/python3
+################################################################################
+# loc_index_map.py
+# SPDX-License-Identifier: Apache-2.0
+################################################################################
+"""
+Persisted, append-only map of source file names to their LOC file-index.
+
+By default the generator numbers files in sorted order of their names, so
+adding one file renumbers all files after it. With an index map, files keep
+the index they were first given across generator runs:
+
+  - Files already in the map keep their index.
+  - New files get fresh indexes, after all indexes ever handed out.
+  - Files no longer found leave a tombstone: their index is not re-used,
+    and LOC-IDs of older logs still decode to the deleted file's name. A
+    file that re-appears gets its old index back.
+
+Compaction renumbers the live files densely, in the order of their current
+indexes, and drops all tombstones. This changes LOC-IDs, so do it when the
+index space has become sparse, and with a full rebuild.
+
+The map is a JSON file, with sorted keys, so that it can be checked-in and
+its diffs reviewed:
+
+    { "version": 1, "next_index": <N>,
+      "files": { <file-name>: <index>, ... },
+      "deleted": { <file-name>: <index>, ... } }
+
+Usage:
+    python3 loc/loc_index_map.py <index-map-file> [ --compact ]
+"""
+
+import os
+import sys
+import json
+import argparse
+
+# pylint: disable-msg=wrong-import-position
+if not __package__:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + '/..')
+
+import loc.utils as locu
+# pylint: enable-msg=wrong-import-position
+
+LOC_INDEX_MAP_VERSION = 1
+
+###############################################################################
+# main() driver
+###############################################################################
+def main():
+    """
+    Shell to call do_main() with command-line arguments.
+    """
+    do_main(sys.argv[1:])
+
+###############################################################################
+def do_main(args:list):
+    """
+    Print statistics of an index map, and compact it if so asked.
+    """
+    parsed_args = loc_index_map_parse_args(args)
+
+    if not os.path.exists(parsed_args.map_file):
+        print(parsed_args.map_file + ": No such index map", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        index_map = LocIndexMap(parsed_args.map_file)
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        sys.exit(1)
+
+    print(index_map.stats_msg())
+    if parsed_args.compact:
+        index_map.compact()
+        index_map.save()
+        print("Compacted: " + index_map.stats_msg())
+        print("Re-run the LOC generator and rebuild, as file-indexes have changed.")
+
+###############################################################################
+def loc_index_map_parse_args(args:list):
+    """
+    Command-line argument parser.
+    """
+    desc = "Show, or compact, a LOC file-index map."
+    parser = argparse.ArgumentParser(prog='loc_index_map.py', description=desc)
+
+    parser.add_argument('map_file', metavar='<index-map-file>'
+                        , help='Index map, as generated with --index-map')
+
+    parser.add_argument('--compact', dest='compact'
+                        , action='store_true', default=False
+                        , help='Renumber live files densely and drop tombstones'
+                                + ' of deleted files.')
+
+    return parser.parse_args(args)
+
+###############################################################################
+class LocIndexMap:
+    """
+    Append-only map of file names to file-indexes, persisted in a JSON file.
+    """
+    def __init__(self, map_file:str, compact:bool=False):
+        """
+        Load the map from 'map_file', if it exists. If 'compact', the map
+        is compacted once files are next assigned indexes by assign().
+        """
+        self.map_file = map_file
+        self.compact_on_assign = compact
+        self.files = {}         # Live file name -> file-index
+        self.deleted = {}       # Deleted file name -> file-index (tombstone)
+        self.next_index = 1     # 0 is Unknown_file
+        self.saved = None       # Contents as last loaded / saved
+        self.load()
+
+    # -------------------------------------------------------------------------
+    def load(self):
+        """
+        Load the map, if its file exists. A corrupt map is an error, rather
+        than silently re-numbered, as LOC-IDs depend on it.
+        """
+        if not os.path.exists(self.map_file):
+            return
+
+        try:
+            with open(self.map_file, encoding="utf8") as map_fh:
+                contents = json.load(map_fh)
+        except (OSError, ValueError) as exc:
+            raise ValueError(self.map_file + ": Unreadable index map: " + str(exc)) from exc
+
+        if not isinstance(contents, dict) or contents.get('version') != LOC_INDEX_MAP_VERSION:
+            raise ValueError(self.map_file + ": Not an index map, version "
+                             + str(LOC_INDEX_MAP_VERSION))
+
+        self.files = contents.get('files', {})
+        self.deleted = contents.get('deleted', {})
+        self.next_index = contents.get('next_index', 1)
+        self.saved = self.contents()
+
+    # -------------------------------------------------------------------------
+    def assign(self, file_names) -> dict:
+        """
+        Assign file-indexes to the files found in this run, 'file_names'.
+        New files are numbered in sorted order of their names; files not
+        found in this run are tombstoned.
+
+        Returns: dict of file-index, on file name, of the files found.
+        """
+        found = set(file_names)
+        for file_name in sorted(found):
+            if file_name in self.files:
+                continue
+            if file_name in self.deleted:
+                self.files[file_name] = self.deleted.pop(file_name)
+            else:
+                self.files[file_name] = self.next_index
+                self.next_index += 1
+
+        for file_name in [name for name in self.files if name not in found]:
+            self.deleted[file_name] = self.files.pop(file_name)
+
+        if self.compact_on_assign:
+            self.compact()
+            self.compact_on_assign = False
+
+        return dict(self.files)
+
+    # -------------------------------------------------------------------------
+    def compact(self):
+        """
+        Renumber live files from 1, in the order of their current indexes,
+        and drop all tombstones.
+        """
+        live = sorted(self.files, key=self.files.get)
+        self.files = {file_name: idx for (idx, file_name) in enumerate(live, start=1)}
+        self.deleted = {}
+        self.next_index = len(live) + 1
+
+    # -------------------------------------------------------------------------
+    def deleted_names(self) -> dict:
+        """
+        Return dict of deleted file's name, on its file-index.
+        """
+        return {idx: file_name for (file_name, idx) in self.deleted.items()}
+
+    # -------------------------------------------------------------------------
+    def contents(self) -> dict:
+        """
+        Return a copy of the map's contents, as saved to its file.
+        """
+        return {'version': LOC_INDEX_MAP_VERSION, 'next_index': self.next_index,
+                'files': dict(self.files), 'deleted': dict(self.deleted)}
+
+    # -------------------------------------------------------------------------
+    def save(self):
+        """
+        Atomically re-write the map file, if it changed since it was loaded.
+        """
+        contents = self.contents()
+        if contents == self.saved:
+            return
+
+        locu.write_if_changed(self.map_file,
+                              json.dumps(contents, indent=1, sort_keys=True) + '\n')
+        self.saved = contents
+
+    # -------------------------------------------------------------------------
+    def stats_msg(self) -> str:
+        """ Return a one-line summary of live files and tombstones. """
+        num_indexes = self.next_index - 1
+        return ("Index map " + self.map_file + ": " + str(len(self.files))
+                + " files, " + str(len(self.deleted)) + " deleted, "
+                + str(num_indexes) + " indexes used ("
+                + ("%.1f" % (100.0 * len(self.files) / num_indexes) if num_indexes else "100.0")
+                + "% live)")
+
+###############################################################################
+# Start of the script: Execute only if run as a script
+###############################################################################
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/python3
+################################################################################
+# loc_manifest.py
+# SPDX-License-Identifier: Apache-2.0
+################################################################################
+"""
+Compact binary manifest of the LOC file-names table, emitted by the LOC
+generator script alongside the generated loc_filenames.c.
+
+The manifest is meant to be mmap()'ed as-is by decoders. There is nothing to
+parse at start-up, and its pages are shared by all processes that map it.
+All integers are little-endian. Layout:
+
+  Header (LOC_MANIFEST_HDR_SIZE bytes):
+    magic         4s   b'LOCM'
+    version       u16  LOC_MANIFEST_VERSION
+    hdr_size      u16  Size of this header
+    nbits_files   u8   # of bits for file-index component of a LOC-ID
+    nbits_lines   u8   # of bits for line-number component of a LOC-ID
+    reserved      u16
+    num_files     u32  # of entries in the file-names table (incl. index 0)
+    offsets_off   u32  Offset of offsets table: u32[num_files + 1]
+    lines_off     u32  Offset of line-counts table: u32[num_files]
+    blob_off      u32  Offset of string blob
+    blob_size     u32  Size of string blob
+
+  File name at index i is blob[offsets[i] : offsets[i + 1]], UTF-8 encoded.
+
+LocMappedFile, the mmap()'ed reader of such files of little-endian tables
+and a string blob, is shared with the LOC2 site index, loc_site_index.py.
+"""
+
+import sys
+import mmap
+import struct
+from array import array
+
+LOC_MANIFEST_MAGIC = b'LOCM'
+LOC_MANIFEST_VERSION = 1
+LOC_MANIFEST_HDR_FMT = '<4sHHBBHIIIII'
+LOC_MANIFEST_HDR_SIZE = struct.calcsize(LOC_MANIFEST_HDR_FMT)
+
+# Name of the generated manifest file
+LOC_MANIFEST_FILE = 'loc_manifest.bin'
+
+###############################################################################
+def loc_manifest_bytes(file_table:list, nbits_files:int, nbits_lines:int) -> bytes:
+    """
+    Build the manifest for a file-names table.
+
+    Arguments:
+        file_table  - List of (file-name, line-count), indexed by file-index
+        nbits_files - # of bits for file-index component of a LOC-ID
+        nbits_lines - # of bits for line-number component of a LOC-ID
+    """
+    (offsets, blob) = loc_string_blob(file_name for (file_name, _) in file_table)
+    lines = array('I', [num_lines for (_, num_lines) in file_table])
+
+    # Offsets of the offsets and lines tables, and of blob
+    (table_offs, tables) = loc_tables_bytes(LOC_MANIFEST_HDR_SIZE, [offsets, lines])
+
+    header = struct.pack(LOC_MANIFEST_HDR_FMT, LOC_MANIFEST_MAGIC,
+                         LOC_MANIFEST_VERSION, LOC_MANIFEST_HDR_SIZE,
+                         nbits_files, nbits_lines, 0,
+                         len(file_table), *table_offs, len(blob))
+
+    return header + tables + blob
+
+###############################################################################
+def loc_string_blob(strings) -> (array, bytes):
+    """
+    Return (offsets, blob) of 'strings', UTF-8 encoded and concatenated in
+    'blob': String i is blob[offsets[i] : offsets[i + 1]].
+    """
+    names = [string.encode() for string in strings]
+    offsets = array('I', [0] * (len(names) + 1))
+    for (idx, name) in enumerate(names):
+        offsets[idx + 1] = offsets[idx] + len(name)
+    return (offsets, b''.join(names))
+
+###############################################################################
+def loc_tables_bytes(offset:int, tables:list) -> (list, bytes):
+    """
+    Lay out the 32-bit int arrays 'tables' one after the other, little-endian,
+    starting at 'offset' of a file.
+
+    Returns: (offsets, bytes): The offset of each table, and of the end of
+             the last one, and the tables' bytes.
+    """
+    offsets = [offset]
+    for table in tables:
+        offsets.append(offsets[-1] + len(table) * 4)
+
+    if sys.byteorder != 'little':
+        tables = [array(table.typecode, table) for table in tables]
+        for table in tables:
+            table.byteswap()
+
+    return (offsets, b''.join(table.tobytes() for table in tables))
+
+###############################################################################
+class LocMappedFile:
+    """
+    Read-only, mmap()'ed file, of tables of little-endian 32-bit ints. Tables
+    are exposed as memoryviews over the mapping, released by close().
+    """
+
+    def __init__(self, file_name:str):
+        with open(file_name, 'rb') as file_fh:
+            self.mmap = mmap.mmap(file_fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buf = memoryview(self.mmap)
+
+    # -------------------------------------------------------------------------
+    def check_extents(self, extents:list, what:str):
+        """
+        Unmap the file, and raise ValueError, unless each (offset, size) of
+        'extents' lies within the file. 'what' names the file, for the error.
+        """
+        for (offset, size) in extents:
+            if offset + size > len(self.buf):
+                self.close()
+                raise ValueError(what + ": Truncated, or corrupt: "
+                                 + str(size) + " bytes at offset " + str(offset)
+                                 + " are past the end of the file.")
+
+    # -------------------------------------------------------------------------
+    def u32_table(self, offset:int, num_entries:int, typecode:str='I'):
+        """
+        Return a table of 'num_entries' little-endian 32-bit ints at 'offset'.
+        This is a zero-copy memoryview, except on big-endian hosts.
+        """
+        table = self.buf[offset:offset + num_entries * 4]
+        if sys.byteorder == 'little':
+            return table.cast(typecode)
+
+        swapped = array(typecode, table.tobytes())
+        swapped.byteswap()
+        return swapped
+
+    # -------------------------------------------------------------------------
+    def close(self):
+        """ Release the memoryviews and unmap the file. """
+        for (attr, view) in list(self.__dict__.items()):
+            if isinstance(view, memoryview) and view is not self.buf:
+                view.release()
+                del self.__dict__[attr]
+        self.buf.release()
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+###############################################################################
+class LocManifest(LocMappedFile):
+    """
+    Read-only, zero-copy view of a LOC manifest file.
+
+    The file is mmap()'ed; the offsets / line-counts tables are exposed as
+    memoryviews over the mapping, and file names are sliced out of the
+    string blob without copying.
+    """
+
+    def __init__(self, manifest_file:str):
+        """
+        Map 'manifest_file'. Raises ValueError if it is not a manifest, or
+        if its tables or string blob do not fit in the file.
+        """
+        super().__init__(manifest_file)
+        self.check_extents([(0, LOC_MANIFEST_HDR_SIZE)], manifest_file)
+        (magic, version, _, self.nbits_files, self.nbits_lines, _,
+         self.num_files, offsets_off, lines_off, blob_off, blob_size) \
+                = struct.unpack_from(LOC_MANIFEST_HDR_FMT, self.buf)
+
+        if magic != LOC_MANIFEST_MAGIC or version != LOC_MANIFEST_VERSION:
+            self.close()
+            raise ValueError(manifest_file + ": Not a version "
+                             + str(LOC_MANIFEST_VERSION) + " LOC manifest file.")
+
+        self.check_extents([(offsets_off, (self.num_files + 1) * 4),
+                            (lines_off, self.num_files * 4),
+                            (blob_off, blob_size)], manifest_file)
+        self.offsets = self.u32_table(offsets_off, self.num_files + 1)
+        self.lines = self.u32_table(lines_off, self.num_files)
+        self.blob = self.buf[blob_off:blob_off + blob_size]
+
+        # File names are sliced from the blob by the offsets table
+        if self.offsets[0] != 0 or self.offsets[self.num_files] != blob_size:
+            self.close()
+            raise ValueError(manifest_file + ": Corrupt LOC manifest file:"
+                             + " Offsets table does not match the string blob.")
+
+    # -------------------------------------------------------------------------
+    def file_name_bytes(self, file_index:int) -> memoryview:
+        """
+        Return the UTF-8 encoded file name at 'file_index' as a memoryview
+        into the manifest; empty if index is out-of-range.
+        """
+        if 0 <= file_index < self.num_files:
+            return self.blob[self.offsets[file_index]:self.offsets[file_index + 1]]
+        return self.blob[0:0]
+
+    # -------------------------------------------------------------------------
+    def file_name(self, file_index:int) -> str:
+        """ Return the file name at 'file_index'; "" if index is out-of-range. """
+        return str(self.file_name_bytes(file_index), 'utf8')
+
+    # -------------------------------------------------------------------------
+    def decode(self, loc_id:int) -> (str, int):
+        """ Crack open a LOC-ID and return a pair (file-name, line#) """
+        return (self.file_name(loc_id >> self.nbits_lines),
+                loc_id & ((1 << self.nbits_lines) - 1))
+
+    def __len__(self):
+        return self.num_files
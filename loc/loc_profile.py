@@ -0,0 +1,177 @@
+#!/usr/bin/python3
+################################################################################
+# loc_profile.py
+# SPDX-License-Identifier: Apache-2.0
+################################################################################
+"""
+Phase-level profile of a LOC generator run, gen_loc_files.py --profile.
+
+The generator's do_main() runs in phases: discover (find source files),
+count_lines (line-count them), emit (loc_tokens.h, loc_filenames.c), manifest,
+shards, loc_doth (loc.h) and decoder (generate and 'cc' the decoder binary).
+For each phase, its wall time, CPU time, # of files and # of bytes read are
+recorded, and are saved as one JSON record:
+
+    { "version": 1, "args": [ <generator arguments> ],
+      "wall_secs": <S>, "cpu_secs": <S>, "peak_rss_kb": <KB>,
+      "phases": { <phase>: { "wall_secs": <S>, "cpu_secs": <S>,
+                             "files": <N>, "bytes": <N>,
+                             "files_per_sec": <N>, "bytes_per_sec": <N> },
+                  ... } }
+
+Phases are listed in the order they first ran. CPU time is that of the
+whole process, i.e. of all its threads, while the phase ran; it excludes
+child processes, e.g. the 'cc' of the decoder_cc phase. With several
+source roots, the roots are scanned concurrently, and their discover and
+count_lines phase times add up, so may add up to more than the run's time.
+
+The run can also be profiled with cProfile, saving pstats output, e.g. for:
+
+    python3 -m pstats <cprofile-file>
+"""
+
+import os
+import sys
+import time
+import json
+import threading
+import contextlib
+
+LOC_PROFILE_VERSION = 1
+
+###############################################################################
+class LocProfile:
+    """
+    Wall time, CPU time, files and bytes of each phase of a generator run.
+    """
+    def __init__(self, args:list, cprofile_file:str=None):
+        """
+        Start profiling a run with arguments 'args'. If 'cprofile_file' is
+        given, the run is also profiled with cProfile, until stop().
+        """
+        self.args = list(args)
+        self.cprofile_file = cprofile_file
+        self.phases = {}
+        self.lock = threading.Lock()
+        # (wall, CPU) seconds of the run, once stopped; of its start, in 'start'
+        self.run_secs = None
+
+        self.cprofiler = None
+        if cprofile_file is not None:
+            # pylint: disable-msg=import-outside-toplevel
+            import cProfile
+            # pylint: enable-msg=import-outside-toplevel
+            self.cprofiler = cProfile.Profile()
+            self.cprofiler.enable()
+
+        self.start = (time.perf_counter(), time.process_time())
+
+    # -------------------------------------------------------------------------
+    @contextlib.contextmanager
+    def phase(self, name:str, files:int=0, nbytes:int=0):
+        """
+        Context manager adding the wall and CPU time of its block, and
+        'files' and 'nbytes', to phase 'name'.
+        """
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield self
+        finally:
+            self.add(name, files, nbytes, time.perf_counter() - start_wall,
+                     time.process_time() - start_cpu)
+
+    # -------------------------------------------------------------------------
+    def add(self, name:str, files:int=0, nbytes:int=0,
+            wall_secs:float=0.0, cpu_secs:float=0.0):
+        """
+        Add to the counters of phase 'name'. Can be called by several threads.
+        """
+        # pylint: disable-msg=too-many-arguments
+        with self.lock:
+            phase = self.phases.setdefault(name, { 'wall_secs': 0.0, 'cpu_secs': 0.0,
+                                                   'files': 0, 'bytes': 0 })
+            phase['wall_secs'] += wall_secs
+            phase['cpu_secs'] += cpu_secs
+            phase['files'] += files
+            phase['bytes'] += nbytes
+        # pylint: enable-msg=too-many-arguments
+
+    # -------------------------------------------------------------------------
+    def stop(self):
+        """
+        Stop the run's clocks and cProfile, saving its pstats output.
+        """
+        self.run_secs = (time.perf_counter() - self.start[0],
+                         time.process_time() - self.start[1])
+        if self.cprofiler is not None:
+            self.cprofiler.disable()
+            self.cprofiler.dump_stats(self.cprofile_file)
+            self.cprofiler = None
+
+    # -------------------------------------------------------------------------
+    def record(self) -> dict:
+        """
+        Return the run's profile, as saved by save(). Stops the run first,
+        if not yet stopped.
+        """
+        if self.run_secs is None:
+            self.stop()
+
+        phases = {}
+        for (name, counters) in self.phases.items():
+            phase = dict(counters)
+            wall_secs = phase['wall_secs']
+            phase['files_per_sec'] = (phase['files'] / wall_secs) if wall_secs > 0 else 0.0
+            phase['bytes_per_sec'] = (phase['bytes'] / wall_secs) if wall_secs > 0 else 0.0
+            phases[name] = phase
+
+        return { 'version': LOC_PROFILE_VERSION, 'args': self.args,
+                 'wall_secs': self.run_secs[0], 'cpu_secs': self.run_secs[1],
+                 'peak_rss_kb': loc_peak_rss_kb(), 'phases': phases }
+
+    # -------------------------------------------------------------------------
+    def save(self, profile_file:str):
+        """
+        Atomically write the run's profile to 'profile_file', as JSON; or to
+        stdout, if 'profile_file' is '-'.
+        """
+        record = self.record()
+        if profile_file == '-':
+            json.dump(record, sys.stdout, indent=1)
+            sys.stdout.write('\n')
+            return
+
+        tmp_file = profile_file + '.' + str(os.getpid()) + '.tmp'
+        with open(tmp_file, 'w', encoding="utf8") as profile_fh:
+            json.dump(record, profile_fh, indent=1)
+            profile_fh.write('\n')
+        os.replace(tmp_file, profile_file)
+
+###############################################################################
+def loc_profile_phase(profile:LocProfile, name:str, files:int=0, nbytes:int=0):
+    """
+    Return the context manager timing phase 'name' of 'profile'; a no-op
+    one if 'profile' is None.
+    """
+    if profile is None:
+        return contextlib.nullcontext()
+    return profile.phase(name, files, nbytes)
+
+###############################################################################
+def loc_peak_rss_kb() -> int:
+    """
+    Return the peak RSS of this process, in KB; 0 where it is not known.
+    """
+    try:
+        # pylint: disable-msg=import-outside-toplevel
+        import resource
+        # pylint: enable-msg=import-outside-toplevel
+    except ImportError:
+        return 0
+
+    # ru_maxrss is in KB on Linux, and in bytes on Mac/OSX
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak_rss //= 1024
+    return peak_rss
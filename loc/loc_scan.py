@@ -0,0 +1,294 @@
+#!/usr/bin/python3
+################################################################################
+# loc_scan.py
+# SPDX-License-Identifier: Apache-2.0
+################################################################################
+"""
+Scan of the source roots by gen_loc_files.py: discover the .c / .cpp / .cc
+files under each root, and count their lines, reusing line-counts from the
+scan-cache where the files are unchanged.
+"""
+
+import os
+import sys
+import threading
+
+from loc.utils import fprintf
+from loc.loc_profile import loc_profile_phase
+import loc.loc_discover as locd
+
+# Size of buffer used to read source files when counting lines
+LOC_COUNT_LINES_BUFSIZE = 1024 * 1024
+
+# Per-thread buffer of LOC_COUNT_LINES_BUFSIZE bytes, re-used across files
+Loc_count_lines_tls = threading.local()
+
+###############################################################################
+def loc_scan_src_roots(src_root_dirs, discover_fn, skip_files, scan_cache,
+                       jobs, verbose, profile=None) -> list:
+    """
+    Scan all source roots concurrently, with one worker thread per root.
+
+    Arguments:
+        src_root_dirs    - List of top-level source root-dirs
+        discover_fn      - Callable returning the list of (dir-path, file-name)
+                           found under a root-dir, in walk-order; None to walk
+                           each root-dir (without any exclusions)
+        skip_files       - Names of generated .c files to skip, if found
+        scan_cache       - LocScanCache to reuse line-counts from; may be None
+        jobs             - # of worker threads to count lines with, per root
+        verbose          - Boolean; Print verbose messages for debugging
+        profile          - LocProfile timing the 'discover' and 'count_lines'
+                           phases; may be None
+
+    Returns: List of (root-name, src-files), in the order of 'src_root_dirs',
+             where src-files is as returned by loc_scan_src_root().
+    """
+    # pylint: disable-msg=too-many-arguments
+    # pylint: disable-msg=import-outside-toplevel
+    root_names = loc_src_root_names(src_root_dirs)
+    if len(src_root_dirs) == 1:
+        return [(root_names[0], loc_scan_src_root(src_root_dirs[0], root_names[0],
+                                                  discover_fn, skip_files,
+                                                  scan_cache, jobs, verbose,
+                                                  profile))]
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=len(src_root_dirs)) as pool:
+        futures = [pool.submit(loc_scan_src_root, src_root_dir, root_name,
+                               discover_fn, skip_files, scan_cache, jobs, verbose,
+                               profile)
+                   for (src_root_dir, root_name) in zip(src_root_dirs, root_names)]
+
+        # Collect results by root's position, not by completion order.
+        return [(root_name, future.result())
+                for (root_name, future) in zip(root_names, futures)]
+    # pylint: enable-msg=import-outside-toplevel
+    # pylint: enable-msg=too-many-arguments
+
+###############################################################################
+def loc_scan_src_root(src_root_dir, root_name, discover_fn, skip_files,
+                      scan_cache, jobs, verbose, profile=None) -> list:
+    """
+    Find all .c / .cpp / .cc files under one source root, and count their lines.
+
+    Arguments: As for loc_scan_src_roots(), and:
+        src_root_dir     - Top-level source root-dir to run a 'find' for .c files
+        root_name        - Name of the root, that file names are qualified by
+
+    Returns: List of (file-path, file-base-name, file-full-name, line-count)
+             in walk-order; file-full-name is 'root_name/dir/file'.
+    """
+    # pylint: disable-msg=too-many-arguments
+    with loc_profile_phase(profile, 'discover'):
+        if discover_fn is None:
+            found_files = locd.loc_walk_sources(src_root_dir)
+        else:
+            found_files = discover_fn(src_root_dir)
+    if profile is not None:
+        profile.add('discover', files=len(found_files))
+
+    src_files = loc_src_files(src_root_dir, root_name, found_files, skip_files)
+
+    # ########################################################################
+    # Count lines of all files found, possibly fanned-out across 'jobs'
+    # workers. Line-counts come back in the order of the sorted walk above,
+    # so the generated output is identical to that of a serial run.
+    with loc_profile_phase(profile, 'count_lines', len(src_files)):
+        all_num_lines = count_lines_all([src_file[0] for src_file in src_files],
+                                        scan_cache, jobs, verbose, profile)
+
+    return [src_file + (num_lines,) for (src_file, num_lines) in zip(src_files, all_num_lines)]
+    # pylint: enable-msg=too-many-arguments
+
+###############################################################################
+def loc_src_files(src_root_dir, root_name, found_files, skip_files) -> list:
+    """
+    Pick out the .c / .cpp / .cc source files among 'found_files', the list
+    of (dir-path, file-name) found under 'src_root_dir', in walk-order.
+
+    Returns: List of (file-path, file-base-name, file-full-name) in walk-order.
+    """
+    src_files = []
+
+    # ########################################################################
+    # Go through all files found in the source-tree rooted at src_root_dir,
+    # picking out all .c files. found_files[] is in sorted walk-order, so we
+    # get a consistent numbering on all platforms.
+    for root, file in found_files:
+        # Skip files that are not .c source files
+        if (file.endswith('.c') is False
+           and file.endswith('.cpp') is False
+           and file.endswith('.cc') is False):
+            continue
+
+        # IF user has asked to generate *.c files in the same src-dir
+        # that is being processed, we will come upon loc_filenames.c also.
+        # Skip it.
+        if file in skip_files:
+            continue
+
+        # Munge file name to sort dups, and build full-path name
+        # root: ~/Code/someProduct/some-Dir/some-subDir
+        # Strip out prefix, to just grab: 'some-Dir/some-subDir'
+        root_dirname = root.replace(src_root_dir, "", 1)
+
+        src_files.append((root + "/" + file, file, root_name + root_dirname + "/" + file))
+
+    return src_files
+
+###############################################################################
+def loc_src_root_names(src_root_dirs) -> list:
+    """
+    Return the names that file names under each source root are qualified by.
+
+    Grab each code-base source's root-dir name. This way, if user runs this
+    script with '~/Code/<someProduct>', then we only store the file-names as:
+    <someProduct>/dir1/file1, <someProduct>/dir2/file2, and so on ...
+    If several roots have the same base name, e.g. 'repo1/src' and
+    'repo2/src', they are named by as many trailing dir-names as needed to
+    tell them apart.
+    """
+    split_dirs = [os.path.realpath(src_root_dir).split('/') for src_root_dir in src_root_dirs]
+    root_names = []
+    for (idx, src_root_dir) in enumerate(src_root_dirs):
+        ncomps = 1
+        while any(split_dirs[other][-ncomps:] == split_dirs[idx][-ncomps:]
+                  for other in range(len(split_dirs)) if other != idx):
+            ncomps += 1
+        if ncomps == 1:
+            root_names.append(os.path.basename(src_root_dir))
+        else:
+            root_names.append('/'.join(split_dirs[idx][-ncomps:]))
+    return root_names
+
+###############################################################################
+def count_lines(file_full_path, verbose, profile=None) -> int:
+    """
+    Open a source file and return # of lines; 0 if it cannot be read.
+    """
+    numlines = count_lines_or_none(file_full_path, verbose, profile)
+    return 0 if numlines is None else numlines
+
+# ------------------------------------------------------------------------------
+def count_lines_or_none(file_full_path, verbose, profile=None):
+    """
+    Open a source file and return # of lines; None if it cannot be read.
+    The # of bytes read is added to the 'count_lines' phase of 'profile',
+    if one is given.
+
+    The file is read in binary mode, in fixed-size chunks, into a buffer
+    re-used across all files counted by the calling thread, counting newline
+    bytes. Memory used is constant irrespective of the file's size, and no
+    decoding is done, so files in any encoding (e.g. Latin-1) are counted
+    correctly. As with readlines(), a last line that is not
+    newline-terminated is counted as a line.
+    """
+    numlines = 0
+    nbytes_read = 0
+    buf = getattr(Loc_count_lines_tls, 'buf', None)
+    if buf is None:
+        buf = Loc_count_lines_tls.buf = bytearray(LOC_COUNT_LINES_BUFSIZE)
+    last_byte = ord('\n')
+    try:
+        with open(file_full_path, 'rb', buffering=0) as src_fh:
+            while True:
+                nbytes = src_fh.readinto(buf)
+                if not nbytes:
+                    break
+                numlines += buf.count(b'\n', 0, nbytes)
+                nbytes_read += nbytes
+                last_byte = buf[nbytes - 1]
+    except OSError as exc:
+        if verbose:
+            fprintf(sys.stderr, "Error occurred trying to read %s: %s\n",
+                    file_full_path, str(exc))
+        return None
+
+    if profile is not None:
+        profile.add('count_lines', nbytes=nbytes_read)
+
+    if last_byte != ord('\n'):
+        numlines += 1
+
+    return numlines
+
+# ------------------------------------------------------------------------------
+def count_lines_stat(file_full_path):
+    """
+    Return (cache-key, stat-result) of a file, to look it up in the
+    scan-cache by; None if it cannot be stat()'ed, e.g. a dangling symlink,
+    or a file removed since it was discovered. Such a file is not cached.
+    """
+    cache_key = os.path.abspath(file_full_path)
+    try:
+        return (cache_key, os.stat(cache_key))
+    except OSError:
+        return None
+
+# ------------------------------------------------------------------------------
+def count_lines_cached(file_full_path, scan_cache, verbose, profile=None) -> int:
+    """
+    Return # of lines in a file, reusing the line-count from the scan-cache
+    if the file is unchanged since it was cached. Only line-counts of files
+    that were read are cached.
+    """
+    cache_stat = None if scan_cache is None else count_lines_stat(file_full_path)
+    if cache_stat is None:
+        return count_lines(file_full_path, verbose, profile)
+
+    (cache_key, stat_res) = cache_stat
+    numlines = scan_cache.lookup(cache_key, stat_res)
+    if numlines is None:
+        numlines = count_lines_or_none(file_full_path, verbose, profile)
+        if numlines is None:
+            return 0
+        scan_cache.store(cache_key, stat_res, numlines)
+
+    return numlines
+
+# ------------------------------------------------------------------------------
+def count_lines_all(file_paths, scan_cache, jobs, verbose, profile=None) -> list:
+    """
+    Return list of # of lines in each file in 'file_paths', in the same order.
+
+    Cache lookups are done serially; only the files missing from the cache
+    are handed-off to a pool of 'jobs' threads. Line counting is dominated
+    by I/O latency, so threads suffice to overlap it.
+    """
+    if jobs <= 1 or len(file_paths) <= 1:
+        return [count_lines_cached(file_path, scan_cache, verbose, profile)
+                for file_path in file_paths]
+
+    all_num_lines = [0] * len(file_paths)
+    miss_idxs = []
+    stat_results = {}
+    for idx, file_path in enumerate(file_paths):
+        cache_stat = None if scan_cache is None else count_lines_stat(file_path)
+        numlines = None
+        if cache_stat is not None:
+            numlines = scan_cache.lookup(*cache_stat)
+        if numlines is None:
+            miss_idxs.append(idx)
+            stat_results[idx] = cache_stat
+        else:
+            all_num_lines[idx] = numlines
+
+    # pylint: disable-msg=import-outside-toplevel
+    from concurrent.futures import ThreadPoolExecutor
+    # pylint: enable-msg=import-outside-toplevel
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        miss_num_lines = pool.map(count_lines_or_none,
+                                  [file_paths[idx] for idx in miss_idxs],
+                                  [verbose] * len(miss_idxs),
+                                  [profile] * len(miss_idxs))
+
+        for (idx, numlines) in zip(miss_idxs, miss_num_lines):
+            if numlines is None:
+                continue
+            all_num_lines[idx] = numlines
+            if stat_results[idx] is not None:
+                scan_cache.store(*stat_results[idx], numlines)
+
+    return all_num_lines
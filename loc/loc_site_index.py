@@ -0,0 +1,271 @@
+#!/usr/bin/python3
+################################################################################
+# loc_site_index.py
+# SPDX-License-Identifier: Apache-2.0
+################################################################################
+"""
+Pre-built, sorted index of all LOC2 code-sites of a program binary.
+
+Decoding LOC2 LOC-IDs with LocElf means reading a LOC{} record and chasing
+its func / file pointers into .rodata, for each lookup. For bulk decoding,
+e.g. of large log files, the index built here walks the 'loc_ids' section
+once, and records every site as (LOC-ID, func, file, line), sorted by LOC-ID,
+with the func / file strings de-duplicated. Decoding is then a binary search
+over an mmap()'ed array.
+
+Indexes are cached per binary, keyed on its build-id, so repeat decodes of
+LOC-IDs of the same build do not need to re-read the binary at all.
+
+All integers are little-endian. Layout:
+
+  Header (LOC_SITE_INDEX_HDR_SIZE bytes):
+    magic         4s   b'LOCS'
+    version       u16  LOC_SITE_INDEX_VERSION
+    hdr_size      u16  Size of this header
+    num_sites     u32  # of code-sites
+    num_strings   u32  # of de-duplicated strings
+    ids_off       u32  Offset of LOC-IDs column: i32[num_sites], sorted
+    funcs_off     u32  Offset of function-name string-index column: u32[num_sites]
+    files_off     u32  Offset of file-name string-index column: u32[num_sites]
+    lines_off     u32  Offset of line-number column: u32[num_sites]
+    str_offs_off  u32  Offset of string offsets table: u32[num_strings + 1]
+    blob_off      u32  Offset of string blob
+    blob_size     u32  Size of string blob
+
+  String i is blob[str_offs[i] : str_offs[i + 1]], UTF-8 encoded.
+
+Usage:
+    python3 loc/loc_site_index.py <program-binary> [ --index-file <file> ]
+"""
+
+import os
+import sys
+import struct
+import argparse
+from array import array
+from bisect import bisect_left
+
+# PYTHONPATH will become ".../LineOfCode" dir, to resolve loc package imports,
+# when run as a script.
+# pylint: disable-msg=wrong-import-position
+if not __package__:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + '/..')
+
+import loc.utils as locu
+from loc.loc_elf import LocElf, LocElfError
+from loc.loc_manifest import LocMappedFile, loc_string_blob, loc_tables_bytes
+# pylint: enable-msg=wrong-import-position
+
+LOC_SITE_INDEX_MAGIC = b'LOCS'
+LOC_SITE_INDEX_VERSION = 1
+LOC_SITE_INDEX_HDR_FMT = '<4sHHIIIIIIIII'
+LOC_SITE_INDEX_HDR_SIZE = struct.calcsize(LOC_SITE_INDEX_HDR_FMT)
+
+# Default per-user dir where site indexes are cached, keyed on the build-id
+LOC_SITE_INDEX_CACHE_DIR = locu.loc_user_cache_dir('site_index')
+
+###############################################################################
+# main() driver
+###############################################################################
+def main():
+    """
+    Shell to call do_main() with command-line arguments.
+    """
+    do_main(sys.argv[1:])
+
+###############################################################################
+def do_main(args:list):
+    """
+    Export the site index of a program binary, to the cache or to a file.
+    """
+    parsed_args = loc_site_index_parse_args(args)
+    try:
+        if parsed_args.index_file:
+            with LocElf(parsed_args.elf_file) as loc_elf:
+                loc_write_site_index(parsed_args.index_file,
+                                     loc_site_index_bytes(loc_elf_sites(loc_elf)))
+            index_file = parsed_args.index_file
+        else:
+            index_file = loc_cached_site_index(parsed_args.elf_file,
+                                               parsed_args.cache_dir)
+    except (LocElfError, OSError) as exc:
+        print(exc, file=sys.stderr)
+        sys.exit(1)
+
+    if parsed_args.verbose:
+        with LocSiteIndex(index_file) as site_index:
+            print("Exported " + str(len(site_index)) + " LOC2 code-sites to "
+                  + index_file)
+
+###############################################################################
+def loc_site_index_parse_args(args:list):
+    """
+    Command-line argument parser.
+    """
+    desc = "Export a sorted index of the LOC2 code-sites of a program binary."
+    parser = argparse.ArgumentParser(prog='loc_site_index.py', description=desc)
+
+    parser.add_argument('elf_file', metavar='<program-binary>'
+                        , help='Program binary built with LOC2 LOC-IDs')
+
+    parser.add_argument('--index-file', dest='index_file'
+                        , metavar='<index-file>', default=None
+                        , help='Write the index to this file, bypassing the cache')
+
+    parser.add_argument('--cache-dir', dest='cache_dir'
+                        , metavar='<cache-dir>', default=LOC_SITE_INDEX_CACHE_DIR
+                        , help='Dir where indexes are cached, by build-id. Default: '
+                                + LOC_SITE_INDEX_CACHE_DIR)
+
+    parser.add_argument('--verbose', dest='verbose'
+                        , action='store_true', default=False
+                        , help='Show verbose progress messages')
+
+    return parser.parse_args(args)
+
+###############################################################################
+def loc_elf_sites(loc_elf:LocElf) -> list:
+    """
+    Return list of (LOC-ID, func, file, line) of all code-sites in the
+    binary opened as 'loc_elf', sorted by LOC-ID.
+    """
+    return [(loc_id,) + loc_elf.decode(loc_id) for loc_id in loc_elf.loc_ids()]
+
+###############################################################################
+def loc_site_index_bytes(sites:list) -> bytes:
+    """
+    Build the site index for a list of code-sites.
+
+    Arguments:
+        sites - List of (LOC-ID, func, file, line)
+    """
+    (ids, funcs, files, lines, strings) = loc_site_columns(sorted(sites))
+    (str_offs, blob) = loc_string_blob(strings)
+
+    # Offsets of the ids, funcs, files, lines and str_offs tables, and of blob
+    (table_offs, tables) = loc_tables_bytes(LOC_SITE_INDEX_HDR_SIZE,
+                                            [ids, funcs, files, lines, str_offs])
+
+    header = struct.pack(LOC_SITE_INDEX_HDR_FMT, LOC_SITE_INDEX_MAGIC,
+                         LOC_SITE_INDEX_VERSION, LOC_SITE_INDEX_HDR_SIZE,
+                         len(ids), len(strings), *table_offs, len(blob))
+
+    return header + tables + blob
+
+###############################################################################
+def loc_site_columns(sites:list) -> tuple:
+    """
+    Split code-sites, sorted by LOC-ID, into the columns of the site index,
+    with their function / file names de-duplicated.
+
+    Returns: (ids, funcs, files, lines, strings): Arrays of the sites' LOC-IDs,
+             func / file string-indexes and line-numbers, and the list of
+             strings, by string-index.
+    """
+    string_ids = {}
+    (ids, funcs, files, lines) = (array('i'), array('I'), array('I'), array('I'))
+    for (loc_id, func, file, line) in sites:
+        ids.append(loc_id)
+        funcs.append(string_ids.setdefault(func, len(string_ids)))
+        files.append(string_ids.setdefault(file, len(string_ids)))
+        lines.append(line)
+    return (ids, funcs, files, lines, list(string_ids))
+
+###############################################################################
+def loc_write_site_index(index_file:str, index_bytes:bytes):
+    """
+    Write the site index to 'index_file', atomically, so that concurrent
+    readers never see a partially written index.
+    """
+    locu.write_if_changed(index_file, index_bytes)
+
+###############################################################################
+def loc_cached_site_index(elf_file:str, cache_dir:str=LOC_SITE_INDEX_CACHE_DIR) -> str:
+    """
+    Return the name of the cached site index of 'elf_file', exporting it to
+    the cache if this build of the binary has not been seen before, or if
+    its cached index is truncated or corrupt. The cache dir must be owned,
+    and only writable, by the user, else PermissionError is raised.
+    """
+    if not locu.loc_private_dir(cache_dir):
+        raise PermissionError(cache_dir + ": Site index cache dir is not owned,"
+                              + " and only writable, by the user.")
+
+    with LocElf(elf_file) as loc_elf:
+        index_file = os.path.join(cache_dir, loc_elf.build_id() + '.locs')
+        try:
+            with LocSiteIndex(index_file):
+                pass
+        except (OSError, ValueError):
+            loc_write_site_index(index_file, loc_site_index_bytes(loc_elf_sites(loc_elf)))
+    return index_file
+
+###############################################################################
+class LocSiteIndex(LocMappedFile):
+    """
+    Read-only, mmap()'ed view of a LOC2 site index file.
+
+    The columns are exposed as memoryviews over the mapping. Decoding a
+    LOC-ID is a binary search over the sorted LOC-IDs column.
+    """
+    # pylint: disable-msg=too-many-instance-attributes
+
+    def __init__(self, index_file:str):
+        super().__init__(index_file)
+        self.check_extents([(0, LOC_SITE_INDEX_HDR_SIZE)], index_file)
+        (magic, version, hdr_size, self.num_sites, self.num_strings, ids_off,
+         funcs_off, files_off, lines_off, str_offs_off, blob_off, blob_size) \
+                = struct.unpack_from(LOC_SITE_INDEX_HDR_FMT, self.buf)
+
+        if magic != LOC_SITE_INDEX_MAGIC or version != LOC_SITE_INDEX_VERSION:
+            self.close()
+            raise ValueError(index_file + ": Not a version "
+                             + str(LOC_SITE_INDEX_VERSION) + " LOC site index file.")
+
+        self.check_extents([(table_off, self.num_sites * 4)
+                            for table_off in (ids_off, funcs_off, files_off, lines_off)]
+                           + [(str_offs_off, (self.num_strings + 1) * 4),
+                              (blob_off, blob_size)], index_file)
+        self.hdr_size = hdr_size
+        self.ids = self.u32_table(ids_off, self.num_sites, 'i')
+        self.funcs = self.u32_table(funcs_off, self.num_sites)
+        self.files = self.u32_table(files_off, self.num_sites)
+        self.lines = self.u32_table(lines_off, self.num_sites)
+        self.str_offs = self.u32_table(str_offs_off, self.num_strings + 1)
+        self.blob = self.buf[blob_off:blob_off + blob_size]
+
+    # -------------------------------------------------------------------------
+    def string(self, string_index:int) -> str:
+        """ Return the de-duplicated string at 'string_index' """
+        return str(self.blob[self.str_offs[string_index]:self.str_offs[string_index + 1]],
+                   'utf8')
+
+    # -------------------------------------------------------------------------
+    def site_index(self, loc_id:int) -> int:
+        """ Return the index of the code-site for 'loc_id'; -1 if not found. """
+        site_index = bisect_left(self.ids, loc_id)
+        if site_index < self.num_sites and self.ids[site_index] == loc_id:
+            return site_index
+        return -1
+
+    # -------------------------------------------------------------------------
+    def decode(self, loc_id:int) -> (str, str, int):
+        """
+        Crack open a LOC2 LOC-ID and return a triple (function, file, line#)
+        Raises ValueError if the LOC-ID is not a code-site in the index.
+        """
+        site_index = self.site_index(loc_id)
+        if site_index < 0:
+            raise ValueError("LOC-ID " + str(loc_id) + " is not a valid LOC-ID.")
+        return (self.string(self.funcs[site_index]),
+                self.string(self.files[site_index]),
+                self.lines[site_index])
+
+    def __len__(self):
+        return self.num_sites
+
+###############################################################################
+# Start of the script: Execute only if run as a script
+###############################################################################
+if __name__ == "__main__":
+    main()
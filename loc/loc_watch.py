@@ -0,0 +1,234 @@
+#!/usr/bin/python3
+################################################################################
+# loc_watch.py
+# SPDX-License-Identifier: Apache-2.0
+################################################################################
+"""
+In-memory directory tree of a source root, kept current by polling the
+mtimes of its directories, and the loop of gen_loc_files.py --watch that
+re-generates the outputs as source files come and go.
+
+Adding, removing or renaming a file or sub-dir updates the mtime of the
+directory holding it. So, once a tree has been walked, a poll only stat()s
+each directory, and re-lists just those whose mtime changed; files are never
+stat()'ed or read. The files found are listed in the same walk-order, and
+with the same exclusions, as by loc_discover.loc_walk_sources().
+
+On file systems with coarse mtimes, a directory changed twice within one
+mtime tick would look unchanged after its first re-listing. So directories
+whose mtime is within LOC_WATCH_RACY_NSECS of the time they were listed are
+re-listed on every poll, until their mtime is old enough to be trusted.
+"""
+
+import os
+import sys
+import time
+import loc.loc_discover as locd
+from loc.loc_scan import loc_src_files, count_lines_all
+from loc.utils import fprintf
+
+# Directories modified this recently before being listed are re-listed.
+LOC_WATCH_RACY_NSECS = 2 * 1000 * 1000 * 1000
+
+###############################################################################
+class LocWatchTree:
+    """
+    Files under a source root-dir, re-listed per directory as they change.
+    """
+    def __init__(self, src_root_dir:str, exclude_dirs:list=None, excludes:list=None):
+        """
+        Walk the tree under 'src_root_dir', skipping sub-dirs matching
+        'exclude_dirs' and files matching 'excludes', as globs.
+        """
+        self.src_root_dir = src_root_dir
+        self.exclude_dir_match = locd.loc_glob_matcher(exclude_dirs)
+        self.exclude_match = locd.loc_glob_matcher(excludes)
+
+        # dir-path -> [ rel-path, mtime-ns, listed-at-ns, files, sub-dirs ]
+        self.dirs = {}
+        self.list_tree(src_root_dir, '')
+
+    # -------------------------------------------------------------------------
+    def list_tree(self, dir_path:str, rel_path:str):
+        """
+        List the directory 'dir_path', and all sub-dirs under it.
+        """
+        dirs_to_list = [(dir_path, rel_path)]
+        while dirs_to_list:
+            (dir_path, rel_path) = dirs_to_list.pop()
+            if self.list_dir(dir_path, rel_path) is None:
+                continue
+            for subdir in self.dirs[dir_path][4]:
+                dirs_to_list.append((dir_path + '/' + subdir, rel_path + subdir + '/'))
+
+    # -------------------------------------------------------------------------
+    def list_dir(self, dir_path:str, rel_path:str):
+        """
+        (Re-)list one directory. Returns its (files, sub-dirs), or None if it
+        is gone, in which case it is dropped from the tree.
+        """
+        listed_at = time.time_ns()
+        try:
+            mtime = os.stat(dir_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        listing = None if mtime is None else locd.loc_list_dir(dir_path, rel_path,
+                                                               self.exclude_dir_match,
+                                                               self.exclude_match)
+        if listing is None:
+            self.dirs.pop(dir_path, None)
+            return None
+
+        self.dirs[dir_path] = [rel_path, mtime, listed_at, listing[0], listing[1]]
+        return listing
+
+    # -------------------------------------------------------------------------
+    def drop_tree(self, dir_path:str):
+        """
+        Drop directory 'dir_path', and all sub-dirs under it, from the tree.
+        """
+        entry = self.dirs.pop(dir_path, None)
+        if entry is not None:
+            for subdir in entry[4]:
+                self.drop_tree(dir_path + '/' + subdir)
+
+    # -------------------------------------------------------------------------
+    def refresh(self) -> bool:
+        """
+        Re-list directories changed since they were last listed.
+
+        Returns: True if the files found under the root-dir changed.
+        """
+        changed = False
+        for dir_path in list(self.dirs):
+            entry = self.dirs.get(dir_path)
+            if entry is None:
+                continue        # Dropped along with a parent dir, below
+            (rel_path, mtime, listed_at, files, subdirs) = entry
+
+            try:
+                new_mtime = os.stat(dir_path).st_mtime_ns
+            except OSError:
+                new_mtime = None
+            if new_mtime == mtime and (mtime < listed_at - LOC_WATCH_RACY_NSECS):
+                continue
+
+            listing = self.list_dir(dir_path, rel_path)
+            if listing is None:
+                self.dirs[dir_path] = entry
+                self.drop_tree(dir_path)
+                changed = True
+                continue
+
+            (new_files, new_subdirs) = listing
+            if new_files != files:
+                changed = True
+            if new_subdirs != subdirs:
+                changed = True
+                for subdir in set(subdirs) - set(new_subdirs):
+                    self.drop_tree(dir_path + '/' + subdir)
+                for subdir in set(new_subdirs) - set(subdirs):
+                    self.list_tree(dir_path + '/' + subdir, rel_path + subdir + '/')
+
+        return changed
+
+    # -------------------------------------------------------------------------
+    def found_files(self) -> list:
+        """
+        Return the list of (dir-path, file-name) found, in walk-order.
+        """
+        found_files = []
+        dirs_to_visit = [self.src_root_dir] if self.src_root_dir in self.dirs else []
+        while dirs_to_visit:
+            dir_path = dirs_to_visit.pop()
+            entry = self.dirs.get(dir_path)
+            if entry is None:
+                continue
+            found_files.extend((dir_path, file) for file in entry[3])
+            for subdir in reversed(entry[4]):
+                dirs_to_visit.append(dir_path + '/' + subdir)
+        return found_files
+
+###############################################################################
+def loc_watch_src_roots(config, root_scans, skip_files, scan_cache, generate):
+    """
+    Poll the source roots for added, removed or renamed source files, and
+    re-generate all outputs whenever the set of source files changes.
+
+    The directory trees, and the line-counts of files, are kept in memory
+    between polls. Only new files are line-counted; line-counts of files
+    edited in place are not refreshed until the set of files next changes.
+    Runs until --watch-timeout seconds have passed, or until interrupted.
+
+    Arguments:
+        config           - LocGenConfig, as normalized by loc_check_config()
+        root_scans       - Scans of the source roots, the outputs were last
+                           generated from, as returned by loc_scan_src_roots()
+        skip_files       - Names of generated .c files to skip, if found
+        scan_cache       - LocScanCache to reuse line-counts from; may be None
+        generate         - Callable re-generating, and writing, the outputs
+                           from new scans of the source roots; returns its
+                           LocGenResult
+
+    Returns: LocGenResult of the last generation; None if the outputs were
+             not re-generated.
+    """
+    # pylint: disable-msg=too-many-locals
+    src_root_dirs = config.src_root_dirnames
+    verbose = config.verbose
+    deadline = None
+    if config.watch_timeout is not None:
+        deadline = time.monotonic() + config.watch_timeout
+
+    trees = [LocWatchTree(src_root_dir, config.exclude_dirs, config.excludes)
+             for src_root_dir in src_root_dirs]
+    all_num_lines = {src_file[0]: src_file[3]
+                     for (_, src_files) in root_scans for src_file in src_files}
+    fprintf(sys.stdout, "Watching %d source files under %s\n",
+            len(all_num_lines), ' '.join(src_root_dirs))
+
+    result = None
+    first_poll = True
+    while deadline is None or time.monotonic() < deadline:
+        # The trees were listed after the outputs were generated, so compare
+        # their files with those generated from, even if they seem unchanged.
+        if not first_poll:
+            time.sleep(config.watch_interval)
+            changed = [tree.refresh() for tree in trees]
+            if not any(changed):
+                continue
+        first_poll = False
+
+        new_scans = []
+        for (tree, src_root_dir, (root_name, _)) in zip(trees, src_root_dirs, root_scans):
+            src_files = loc_src_files(src_root_dir, root_name, tree.found_files(), skip_files)
+            new_paths = [src_file[0] for src_file in src_files
+                         if src_file[0] not in all_num_lines]
+            for (path, num_lines) in zip(new_paths,
+                                         count_lines_all(new_paths, scan_cache,
+                                                         config.jobs, verbose)):
+                all_num_lines[path] = num_lines
+            new_scans.append((root_name, [src_file + (all_num_lines[src_file[0]],)
+                                          for src_file in src_files]))
+
+        old_paths = [[src_file[0] for src_file in src_files] for (_, src_files) in root_scans]
+        new_paths = [[src_file[0] for src_file in src_files] for (_, src_files) in new_scans]
+        if new_paths == old_paths:
+            continue
+
+        live_paths = {path for paths in new_paths for path in paths}
+        added = len(live_paths - set(path for paths in old_paths for path in paths))
+        all_num_lines = {path: num_lines for (path, num_lines) in all_num_lines.items()
+                         if path in live_paths}
+        root_scans = new_scans
+
+        start = time.monotonic()
+        result = generate(root_scans)
+        fprintf(sys.stdout, "Re-generated for %d source files (%d added, %d removed)"
+                " in %.3f s\n", len(live_paths), added,
+                sum(len(paths) for paths in old_paths) + added - len(live_paths),
+                time.monotonic() - start)
+        sys.stdout.flush()
+
+    return result
+    # pylint: enable-msg=too-many-locals
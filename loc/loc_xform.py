@@ -6,21 +6,111 @@
 """
 Helper module to encode (fileindex / line #) pair to LOC-ID and to decode LOC-ID
 # to constituent fileindex / line #.
+
+The split of a LOC-ID's bits between the file-index and line-number
+components is sized by the generator to the code base scanned, and emitted
+into the generated loc.h and loc_manifest.bin. Use loc_load_nbits() to pick
+up the split of a generated code base; the defaults below are used otherwise.
 """
 
-# LOC-encoding numbers. -HARD-Dependency on what's generated in loc.h
-LOC_NBITS_FILES = 15
-LOC_NBITS_LINES = 16
-LOC__MASK_LINES = 0xffff
+import re
+
+import loc.loc_manifest as locm
+
+# Default, and minimum, LOC-encoding split. The generator only widens a
+# component beyond these if the code base needs it, so LOC-IDs stay stable.
+LOC_NBITS_FILES_DEFAULT = 15
+LOC_NBITS_LINES_DEFAULT = 16
+
+# Total # of bits available in a LOC-ID (loc_t is a uint32_t)
+LOC_NBITS_TOTAL = 32
+
+# LOC-encoding numbers in effect; changed by loc_set_nbits()
+LOC_NBITS_FILES = LOC_NBITS_FILES_DEFAULT
+LOC_NBITS_LINES = LOC_NBITS_LINES_DEFAULT
+LOC__MASK_LINES = (1 << LOC_NBITS_LINES) - 1
+
+# Matches the split #define'd in generated loc.h, e.g.:
+# #define LOC_NBITS_LINES 16       // # of bits for line-number component.
+LOC_NBITS_DEFINE_RE = re.compile(r'^#define\s+(LOC_NBITS_FILES|LOC_NBITS_LINES)\s+(\d+)')
+
+###############################################################################
+# Sizing of the LOC-encoding split
+#
+def loc_compute_nbits(max_file_num:int, max_num_lines:int) -> (int, int):
+    """
+    Compute the bit split (nbits_files, nbits_lines) that fits a code base
+    with file-indexes up to 'max_file_num' and files of up to 'max_num_lines'
+    lines. Each component is kept at least at its default width, as long as
+    the other component's needs allow it.
+
+    Raises ValueError if the code base does not fit in LOC_NBITS_TOTAL bits.
+    """
+    need_files = max(max_file_num.bit_length(), 1)
+    need_lines = max(max_num_lines.bit_length(), 1)
+    if need_files + need_lines > LOC_NBITS_TOTAL:
+        raise ValueError("Code base with " + str(max_file_num) + " files and "
+                         + str(max_num_lines) + " max lines/file needs "
+                         + str(need_files) + " + " + str(need_lines)
+                         + " bits, which exceeds the " + str(LOC_NBITS_TOTAL)
+                         + "-bit LOC-ID.")
+
+    nbits_lines = min(max(need_lines, LOC_NBITS_LINES_DEFAULT),
+                      LOC_NBITS_TOTAL - need_files)
+    nbits_files = min(max(need_files, LOC_NBITS_FILES_DEFAULT),
+                      LOC_NBITS_TOTAL - nbits_lines)
+    return (nbits_files, nbits_lines)
+#
+def loc_set_nbits(nbits_files:int, nbits_lines:int):
+    """
+    Set the LOC-encoding split used by the encode / decode routines.
+    """
+    # pylint: disable-msg=global-statement
+    global LOC_NBITS_FILES, LOC_NBITS_LINES, LOC__MASK_LINES
+    # pylint: enable-msg=global-statement
+    LOC_NBITS_FILES = nbits_files
+    LOC_NBITS_LINES = nbits_lines
+    LOC__MASK_LINES = (1 << nbits_lines) - 1
+#
+def loc_read_nbits(gen_file:str) -> (int, int):
+    """
+    Read the LOC-encoding split (nbits_files, nbits_lines) of a generated
+    code base, from its generated loc.h or loc_manifest.bin file.
+    """
+    if gen_file.endswith('.h'):
+        nbits = {}
+        with open(gen_file, encoding="utf8") as doth_fh:
+            for line in doth_fh:
+                match = LOC_NBITS_DEFINE_RE.match(line)
+                if match is not None:
+                    nbits[match.group(1)] = int(match.group(2))
+        if len(nbits) != 2:
+            raise ValueError(gen_file + ": LOC_NBITS_FILES / LOC_NBITS_LINES not found.")
+        return (nbits['LOC_NBITS_FILES'], nbits['LOC_NBITS_LINES'])
+
+    with locm.LocManifest(gen_file) as manifest:
+        return (manifest.nbits_files, manifest.nbits_lines)
+#
+def loc_load_nbits(gen_file:str) -> (int, int):
+    """
+    Read the LOC-encoding split of a generated code base and put it in
+    effect. Returns the split, (nbits_files, nbits_lines).
+    """
+    (nbits_files, nbits_lines) = loc_read_nbits(gen_file)
+    loc_set_nbits(nbits_files, nbits_lines)
+    return (nbits_files, nbits_lines)
 
 ###############################################################################
 # Minimalist encode / decode routines live here
 #
-def loc_encode(file_index:int, line_num:int) -> int:
+def loc_encode(file_index:int, line_num:int, nbits_lines:int=None) -> int:
     """
-    Encode a pair of (file-index, line#) and return a LOC-ID.
+    Encode a pair of (file-index, line#) and return a LOC-ID, using the
+    split of 'nbits_lines' bits for line#; by default, the split in effect.
     """
-    return (file_index << LOC_NBITS_LINES) | line_num
+    if nbits_lines is None:
+        nbits_lines = LOC_NBITS_LINES
+    return (file_index << nbits_lines) | line_num
 #
 def loc_decode(loc_id:int) -> (int, int):
     """
@@ -29,3 +119,59 @@ def loc_decode(loc_id:int) -> (int, int):
     file_index = loc_id >> LOC_NBITS_LINES
     line_num = loc_id & LOC__MASK_LINES
     return (file_index, line_num)
+
+###############################################################################
+# Vectorized encode / decode routines, operating on NumPy arrays.
+# NumPy is an optional dependency, only needed by these routines.
+#
+def loc_require_numpy():
+    """
+    Import and return the numpy module, raising an ImportError with a
+    helpful message if it's not installed.
+    """
+    try:
+        # pylint: disable-msg=import-outside-toplevel
+        import numpy
+        # pylint: enable-msg=import-outside-toplevel
+    except ImportError as exc:
+        raise ImportError("NumPy is required for array-level LOC-ID encode / decode."
+                          + " Install it with: pip install numpy") from exc
+    return numpy
+#
+def loc_encode_array(file_idx, lines):
+    """
+    Encode arrays of file-indexes and line#s, element-wise, into an array
+    of uint32 LOC-IDs. Inputs may be any array-like; scalars broadcast.
+    """
+    np = loc_require_numpy()
+    file_idx = np.asarray(file_idx, dtype=np.uint32)
+    lines = np.asarray(lines, dtype=np.uint32)
+    return (file_idx << np.uint32(LOC_NBITS_LINES)) | lines
+#
+def loc_decode_array(ids):
+    """
+    Crack open an array of LOC-IDs and return a pair of uint32 arrays
+    (file-indexes, line#s).
+    """
+    np = loc_require_numpy()
+    ids = np.asarray(ids, dtype=np.uint32)
+    return (ids >> np.uint32(LOC_NBITS_LINES), ids & np.uint32(LOC__MASK_LINES))
+#
+def loc_decode_columns(ids):
+    """
+    Columnar decode of an array of LOC-IDs, for building tables of decoded
+    LOC-IDs without creating a Python object per element.
+
+    Returns a triple (file_indexes, file_codes, lines), where:
+      file_indexes - Sorted array of distinct file-indexes found in 'ids'
+      file_codes   - Array, same length as 'ids', of positions in file_indexes[].
+                     That is, file_indexes[file_codes] is the file-index column.
+      lines        - Array, same length as 'ids', of line#s.
+
+    (file_indexes, file_codes) is a categorical column: only len(file_indexes)
+    file names need to be looked-up to label all rows.
+    """
+    np = loc_require_numpy()
+    (file_idx, lines) = loc_decode_array(ids)
+    (file_indexes, file_codes) = np.unique(file_idx, return_inverse=True)
+    return (file_indexes, file_codes.reshape(file_idx.shape), lines)
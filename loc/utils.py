@@ -8,7 +8,7 @@ Purpose: Utility helper methods used in different LOC Python scripts.
 """
 
 import os
-from inspect import currentframe
+import sys
 
 ###############################################################################
 # Minimalist helper routines live here
@@ -29,7 +29,9 @@ def lineno():
     """
     Return line number at calling function.
     """
-    curr_frame = currentframe()
+    # pylint: disable=protected-access
+    curr_frame = sys._getframe()
+    # pylint: enable=protected-access
     return curr_frame.f_back.f_lineno
 
 # ------------------------------------------------------------------------------
@@ -39,9 +41,75 @@ def fnl():
     Ref: https://stackoverflow.com/questions/35701624/pylint-w0212-protected-access
     ... on need for use of pylint disable directive.
     """
-    curr_frame = currentframe()
     # pylint: disable=protected-access
+    curr_frame = sys._getframe()
     func_name = curr_frame.f_back.f_back.f_code.co_name
     # pylint: enable=protected-access
     line_num = curr_frame.f_back.f_back.f_lineno
     return func_name + ':' + str(line_num)
+
+# ------------------------------------------------------------------------------
+def write_if_changed(file_name, contents) -> bool:
+    """
+    Write 'contents', a str or bytes, to file 'file_name', unless the file
+    already has exactly these contents. An unchanged file keeps its
+    modification time, so build systems do not rebuild what depends on it.
+
+    A changed file is written to a temp file in the same dir, which is then
+    renamed over it. So readers, e.g. compiles of a parallel make, see either
+    the old or the new file, never a partially written one.
+
+    Returns: True if the file was written, False if it was unchanged.
+    """
+    if isinstance(contents, str):
+        contents = contents.encode('utf8')
+
+    try:
+        if os.stat(file_name).st_size == len(contents):
+            with open(file_name, 'rb') as file_fh:
+                if file_fh.read() == contents:
+                    return False
+    except OSError:
+        pass
+
+    tmp_file = file_name + '.' + str(os.getpid()) + '.tmp'
+    try:
+        with open(tmp_file, 'wb') as file_fh:
+            file_fh.write(contents)
+        os.replace(tmp_file, file_name)
+    except OSError:
+        if os.path.exists(tmp_file):
+            os.unlink(tmp_file)
+        raise
+    return True
+
+# ------------------------------------------------------------------------------
+def fprintf(stream, format_spec, *args):
+    """ C-like fprintf() interface. """
+    stream.write(format_spec % args)
+
+# ------------------------------------------------------------------------------
+def loc_user_cache_dir(name) -> str:
+    """
+    Return the per-user cache dir 'name' of LOC tools: $XDG_CACHE_HOME/loc/<name>,
+    or ~/.cache/loc/<name> if $XDG_CACHE_HOME is not set. Unlike a fixed dir in
+    the shared temp dir, other users cannot create it first, and plant entries
+    in it.
+    """
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(cache_home, 'loc', name)
+
+# ------------------------------------------------------------------------------
+def loc_private_dir(dir_name) -> bool:
+    """
+    Create dir 'dir_name', if need be, accessible only by the user. Return True
+    if the dir is owned by the user, and is neither group- nor world-writable,
+    so its entries can only have been created by the user, and are safe to
+    reuse; False otherwise, or if it cannot be created.
+    """
+    try:
+        os.makedirs(dir_name, mode=0o700, exist_ok=True)
+        dir_stat = os.stat(dir_name)
+    except OSError:
+        return False
+    return dir_stat.st_uid == os.getuid() and not dir_stat.st_mode & 0o022
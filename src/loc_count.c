@@ -0,0 +1,304 @@
+/**
+ * ****************************************************************************
+ * loc_count.c: Per-call-site hit counters, keyed on LOC-IDs.
+ * SPDX-License-Identifier: Apache-2.0
+ *
+ * Layout of the counters' file, in native byte-order; read by loc/loc_count.py:
+ *
+ *  loc_count_hdr{}             - LOC_COUNT_HDR_SIZE bytes
+ *  shard[0] .. shard[n-1]      - Each: nslots x loc_count_slot{}
+ *
+ * A slot's key is 0 when empty, else (LOC_COUNT_KEY_USED | <LOC-ID>).
+ *
+ * Shards 0 .. n-2 are owned, each by at most one thread at a time: a thread
+ * claims one on its first hit, and returns it when it exits, for re-use by
+ * a later thread. The owner is the only writer of its shard, so counts are
+ * incremented by a relaxed load and store; no locked read-modify-write is
+ * done on the hot path. Threads that find no free owned shard share the
+ * last shard, shard[n-1], whose counts are incremented by (relaxed) atomic
+ * adds, so shared counts remain exact. Keys are claimed by compare-and-swap
+ * in either kind of shard, which is only done on a LOC-ID's first hit.
+ *
+ * A child fork()'ed after the file is mapped shares the mapping with its
+ * parent, but not the parent's record of which owned shards are free. So,
+ * in the child, threads only use the shared shard: the fork()'ing thread
+ * drops the owned shard it inherited, via a pthread_atfork() child handler.
+ * ****************************************************************************
+ */
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <errno.h>
+#include <limits.h>
+#include <fcntl.h>
+#include <unistd.h>
+#include <pthread.h>
+#include <sys/mman.h>
+
+#include "loc_count.h"
+
+#define LOC_COUNT_MAGIC         "LOCC"
+#define LOC_COUNT_VERSION       1
+#define LOC_COUNT_HDR_SIZE      64
+#define LOC_COUNT_KEY_USED      (((uint64_t) 1) << 32)
+
+/* Flags in loc_count_hdr{}.flags */
+#define LOC_COUNT_FLAG_SIGNED   0x1     // LOC-IDs are int32 offsets (LOC2)
+
+typedef struct loc_count_slot {
+    uint64_t    key;        // 0: Empty, else LOC_COUNT_KEY_USED | LOC-ID
+    uint64_t    count;      // # of hits of LOC-ID
+} loc_count_slot;
+
+typedef struct loc_count_hdr {
+    char        magic[4];   // LOC_COUNT_MAGIC
+    uint32_t    version;    // LOC_COUNT_VERSION
+    uint32_t    hdr_size;   // LOC_COUNT_HDR_SIZE: Offset of shard[0]
+    uint32_t    flags;      // LOC_COUNT_FLAG_*
+    uint32_t    nshards;    // # of shards
+    uint32_t    nslots;     // # of slots per shard; a power of 2
+    uint32_t    shard_size; // Size of a shard, in bytes
+    uint32_t    nthreads;   // # of threads that claimed a shard
+    uint64_t    ndropped;   // # of hits not counted, as a shard was full
+    uint64_t    pid;        // Process whose hits are counted
+} loc_count_hdr;
+
+/* Arguments of loc_count_init(), consumed by loc_count_do_init() */
+static const char *Loc_count_path_arg;
+static uint32_t    Loc_count_nshards_arg;
+static uint32_t    Loc_count_nslots_arg;
+
+static pthread_once_t   Loc_count_once = PTHREAD_ONCE_INIT;
+static loc_count_hdr   *Loc_count_hdr;      // NULL: Hits are not counted
+static loc_count_slot  *Loc_count_shards;
+static uint32_t         Loc_count_nslots;
+static uint32_t         Loc_count_hash_shift;
+
+/* Owned shards not yet claimed, and those returned by exited threads */
+static pthread_mutex_t  Loc_count_lock = PTHREAD_MUTEX_INITIALIZER;
+static pthread_key_t    Loc_count_exit_key;     // Returns owned shards on exit
+static int              Loc_count_exit_key_ok;
+static uint32_t         Loc_count_next_shard;   // Next never-claimed owned shard
+static uint32_t        *Loc_count_free;         // Returned owned shards
+static uint32_t         Loc_count_nfree;
+static int              Loc_count_forked;       // 1: In a child fork()'ed after init
+
+/* This thread's shard; NULL until its first hit */
+static __thread loc_count_slot *Loc_count_shard;
+static __thread int             Loc_count_shard_owned;  // 1: Only this thread writes it
+
+static void loc_count_release_shard(void *shard);
+static void loc_count_atfork_child(void);
+
+/**
+ * Create and map the counters' file. Runs once, via pthread_once().
+ */
+static void
+loc_count_do_init(void)
+{
+    char path_buf[PATH_MAX];
+    const char *path = Loc_count_path_arg;
+    if (path == NULL) {
+        path = getenv("LOC_COUNT_FILE");
+    }
+    if (path == NULL) {
+        /* Per-user runtime dir, if there is one, else the shared /tmp */
+        const char *dir = getenv("XDG_RUNTIME_DIR");
+        if ((dir == NULL) || (*dir == '\0')) {
+            dir = "/tmp";
+        }
+        int len = snprintf(path_buf, sizeof(path_buf), "%s/loc_count.%d",
+                           dir, (int) getpid());
+        if ((len < 0) || ((size_t) len >= sizeof(path_buf))) {
+            fprintf(stderr, "%s/loc_count.%d: Path name too long\n", dir, (int) getpid());
+            return;
+        }
+        path = path_buf;
+    }
+
+    uint32_t nshards = (Loc_count_nshards_arg ? Loc_count_nshards_arg
+                                              : LOC_COUNT_NUM_SHARDS);
+    uint32_t nslots_req = (Loc_count_nslots_arg ? Loc_count_nslots_arg
+                                                : LOC_COUNT_NUM_SLOTS);
+
+    /* Min of 4 slots, so shards are multiples of a 64-byte cache line */
+    uint32_t nslots = 4;
+    uint32_t shift = 30;
+    while ((nslots < nslots_req) && (nslots < (1U << 28))) {
+        nslots <<= 1;
+        shift--;
+    }
+
+    size_t shard_size = (nslots * sizeof(loc_count_slot));
+    size_t file_size = LOC_COUNT_HDR_SIZE + (nshards * shard_size);
+
+    /*
+     * Create the file afresh, readable only by the user. Any existing file,
+     * or symlink, at 'path' is unlinked, not written through: In a shared
+     * dir, e.g. /tmp, a symlink planted there would otherwise make us
+     * overwrite its target. One planted by another user cannot be unlinked
+     * from a sticky dir, and then O_EXCL fails, so nothing is counted.
+     */
+    if ((unlink(path) != 0) && (errno != ENOENT)) {
+        perror(path);
+        return;
+    }
+    int fd = open(path, (O_RDWR | O_CREAT | O_EXCL | O_NOFOLLOW | O_CLOEXEC), 0600);
+    if (fd < 0) {
+        perror(path);
+        return;
+    }
+    if (ftruncate(fd, (off_t) file_size) != 0) {
+        perror(path);
+        close(fd);
+        return;
+    }
+    void *base = mmap(NULL, file_size, (PROT_READ | PROT_WRITE), MAP_SHARED, fd, 0);
+    close(fd);
+    if (base == MAP_FAILED) {
+        perror(path);
+        return;
+    }
+
+    /* Without the free-list, or the exit hook, owned shards are not re-used */
+    Loc_count_free = (uint32_t *) calloc(nshards, sizeof(*Loc_count_free));
+    Loc_count_exit_key_ok = ((Loc_count_free != NULL)
+                             && (pthread_key_create(&Loc_count_exit_key,
+                                                    loc_count_release_shard) == 0));
+
+    loc_count_hdr *hdr = (loc_count_hdr *) base;
+    hdr->version = LOC_COUNT_VERSION;
+    hdr->hdr_size = LOC_COUNT_HDR_SIZE;
+#ifdef CREATE_LOCID
+    hdr->flags = LOC_COUNT_FLAG_SIGNED;     // include/loc.h: LOC2 LOC-IDs
+#endif
+    hdr->nshards = nshards;
+    hdr->nslots = nslots;
+    hdr->shard_size = (uint32_t) shard_size;
+    hdr->pid = (uint64_t) getpid();
+    memcpy(hdr->magic, LOC_COUNT_MAGIC, sizeof(hdr->magic));
+
+    Loc_count_shards = (loc_count_slot *) ((char *) base + LOC_COUNT_HDR_SIZE);
+    Loc_count_nslots = nslots;
+    Loc_count_hash_shift = shift;
+    pthread_atfork(NULL, NULL, loc_count_atfork_child);
+    __atomic_store_n(&Loc_count_hdr, hdr, __ATOMIC_RELEASE);
+}
+
+/**
+ * In a child fork()'ed after init: Drop the owned shard the fork()'ing
+ * thread inherited, which its parent thread keeps writing to, so the next
+ * hit claims the shared shard. Hits of the parent and its children are
+ * then counted together, in the parent's file, and remain exact.
+ */
+static void
+loc_count_atfork_child(void)
+{
+    Loc_count_forked = 1;
+    Loc_count_shard = NULL;
+    Loc_count_shard_owned = 0;
+    if (Loc_count_exit_key_ok) {
+        pthread_setspecific(Loc_count_exit_key, NULL);
+    }
+}
+
+int
+loc_count_init(const char *path, uint32_t nshards, uint32_t nslots)
+{
+    Loc_count_path_arg = path;
+    Loc_count_nshards_arg = nshards;
+    Loc_count_nslots_arg = nslots;
+    pthread_once(&Loc_count_once, loc_count_do_init);
+    return (Loc_count_hdr ? 0 : -1);
+}
+
+/**
+ * Claim a shard for this thread, on its first hit: A returned owned shard,
+ * else a never-claimed one, else the shared shard. Owned shards are handed
+ * out in order, so the reader need only scan the first 'nthreads' shards.
+ * In a fork()'ed child, the shared shard is always claimed.
+ */
+static loc_count_slot *
+loc_count_claim_shard(void)
+{
+    pthread_once(&Loc_count_once, loc_count_do_init);
+    loc_count_hdr *hdr = __atomic_load_n(&Loc_count_hdr, __ATOMIC_ACQUIRE);
+    if (hdr == NULL) {
+        return NULL;
+    }
+    __atomic_fetch_add(&hdr->nthreads, 1, __ATOMIC_RELAXED);
+
+    uint32_t shared_idx = (hdr->nshards - 1);
+    uint32_t idx = shared_idx;
+    if (!Loc_count_forked) {
+        pthread_mutex_lock(&Loc_count_lock);
+        if (Loc_count_nfree > 0) {
+            idx = Loc_count_free[--Loc_count_nfree];
+        } else if (Loc_count_next_shard < shared_idx) {
+            idx = Loc_count_next_shard++;
+        }
+        pthread_mutex_unlock(&Loc_count_lock);
+    }
+
+    Loc_count_shard = Loc_count_shards + ((size_t) idx * Loc_count_nslots);
+    Loc_count_shard_owned = (idx != shared_idx);
+    if (Loc_count_shard_owned && Loc_count_exit_key_ok) {
+        pthread_setspecific(Loc_count_exit_key, Loc_count_shard);
+    }
+    return Loc_count_shard;
+}
+
+/**
+ * Return an owned shard to the free-list, when its thread exits. Its counts
+ * stay in the shard, and the next owner adds to them. The lock orders the
+ * exited owner's last updates before those of the next owner.
+ */
+static void
+loc_count_release_shard(void *shard)
+{
+    uint32_t idx = (uint32_t) (((loc_count_slot *) shard - Loc_count_shards)
+                               / Loc_count_nslots);
+    pthread_mutex_lock(&Loc_count_lock);
+    Loc_count_free[Loc_count_nfree++] = idx;
+    pthread_mutex_unlock(&Loc_count_lock);
+}
+
+void
+loc_count_hit(uint32_t loc)
+{
+    loc_count_slot *shard = Loc_count_shard;
+    if (shard == NULL) {
+        shard = loc_count_claim_shard();
+        if (shard == NULL) {
+            return;
+        }
+    }
+
+    uint64_t key = (LOC_COUNT_KEY_USED | loc);
+    uint32_t mask = (Loc_count_nslots - 1);
+    uint32_t idx = ((loc * 2654435761U) >> Loc_count_hash_shift) & mask;
+
+    /* Linear probing, starting at the slot 'loc' hashes to */
+    for (uint32_t nprobes = 0; nprobes <= mask; nprobes++, idx = ((idx + 1) & mask)) {
+        loc_count_slot *slot = &shard[idx];
+        uint64_t slot_key = __atomic_load_n(&slot->key, __ATOMIC_ACQUIRE);
+        if (slot_key == 0) {
+            if (__atomic_compare_exchange_n(&slot->key, &slot_key, key, 0,
+                                            __ATOMIC_ACQ_REL, __ATOMIC_ACQUIRE)) {
+                slot_key = key;
+            }
+        }
+        if (slot_key == key) {
+            if (Loc_count_shard_owned) {
+                /* Sole writer: No locked read-modify-write needed */
+                __atomic_store_n(&slot->count,
+                                 (__atomic_load_n(&slot->count, __ATOMIC_RELAXED) + 1),
+                                 __ATOMIC_RELAXED);
+            } else {
+                __atomic_fetch_add(&slot->count, 1, __ATOMIC_RELAXED);
+            }
+            return;
+        }
+    }
+    __atomic_fetch_add(&Loc_count_hdr->ndropped, 1, __ATOMIC_RELAXED);
+}
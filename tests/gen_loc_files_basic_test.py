@@ -8,9 +8,14 @@ end-to-end.
 
 # #############################################################################
 import os
+import time
 import subprocess as sp
 import pytest
 import loc.gen_loc_files as loc_main
+import loc.loc_xform as xform
+import loc.loc_scan as locs
+from loc.loc_decoder import LocDecoder
+from tests.loc_test_utils import gen_loc_files
 
 # #############################################################################
 # Setup some variables pointing to diff dir/sub-dir full-paths.
@@ -198,6 +203,257 @@ def test_two_files_program_with_loc_decoder_dir_arg():
     exec_binary([codedir + '/' + binname + '_loc',
                  '65540', '65541', '131082', '131089'])
 
+# #############################################################################
+def test_jobs_output_matches_serial_run(tmp_path):
+    """
+    Generated files with --jobs must be byte-identical to a serial run.
+    """
+    gen_files = ['loc_tokens.h', 'loc_filenames.c', 'loc.h']
+    outputs = {}
+    for jobs in ['1', '4']:
+        gendir = tmp_path / ('jobs-' + jobs)
+        gendir.mkdir()
+        (retval, num_files, _, _) = \
+          loc_main.do_main(['--src-root-dir', LocTestCodeDir,
+                            '--gen-includes-dir', str(gendir),
+                            '--gen-source-dir', str(gendir),
+                            '--jobs', jobs])
+        assert retval is True
+        assert num_files > 2
+        outputs[jobs] = [(gendir / gen_file).read_text(encoding="utf8")
+                         for gen_file in gen_files]
+
+    assert outputs['1'] == outputs['4']
+
+# #############################################################################
+def test_count_lines(tmp_path):
+    """
+    Exercise count_lines() on files that are empty, not newline-terminated,
+    not UTF-8 encoded, or larger than one read-buffer; and on a short file
+    after a large one, read into the same re-used buffer.
+    """
+    cases = [(b'', 0),
+             (b'int x;', 1),
+             (b'int x;\nint y;\n', 2),
+             (b'/* Caf\xe9 */\nint x;\n', 2),     # Latin-1, not valid UTF-8
+             (b'int x;\r\nint y;\r\n', 2),
+             (b'int x;\n' * (locs.LOC_COUNT_LINES_BUFSIZE // 3), \
+                 locs.LOC_COUNT_LINES_BUFSIZE // 3),
+             (b'int x;', 1)]
+
+    for (idx, (contents, exp_num_lines)) in enumerate(cases):
+        src_file = tmp_path / ('file' + str(idx) + '.c')
+        src_file.write_bytes(contents)
+        assert locs.count_lines(str(src_file), False) == exp_num_lines
+
+# #############################################################################
+def test_decoder_cache(tmp_path, monkeypatch):
+    """
+    A re-run that generates identical sources reuses the cached decoder
+    binary, without invoking the compiler.
+    """
+    codedir = LocTestCodeDir + '/two-files-program'
+    gen_args = ['--src-root-dir', codedir,
+                '--gen-includes-dir', str(tmp_path),
+                '--gen-source-dir', str(tmp_path),
+                '--loc-decoder-dir', str(tmp_path),
+                '--decoder-cache-dir', str(tmp_path / 'cache')]
+
+    loc_main.do_main(gen_args)
+    assert len(os.listdir(str(tmp_path / 'cache'))) == 1
+
+    decoder_bin = tmp_path / 'two-files-program_loc'
+    decoder_bin.unlink()
+
+    def no_cc(*args, **kwargs):
+        raise AssertionError("Compiler invoked despite cached decoder binary")
+    monkeypatch.setattr(sp, 'run', no_cc)
+
+    (retval, num_files, _, _) = loc_main.do_main(gen_args)
+    assert retval is True
+    assert num_files == 2
+    verify_file_exists(str(tmp_path), decoder_bin.name)
+
+# #############################################################################
+def test_decoder_cache_not_private(tmp_path, monkeypatch):
+    """
+    The default decoder cache dir is the user's, under $XDG_CACHE_HOME. A
+    cached binary is not reused from a cache dir others can write to, as it
+    may have been planted there.
+    """
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'xdg'))
+    codedir = LocTestCodeDir + '/two-files-program'
+    gen_args = ['--src-root-dir', codedir,
+                '--gen-includes-dir', str(tmp_path),
+                '--gen-source-dir', str(tmp_path),
+                '--loc-decoder-dir', str(tmp_path)]
+    loc_main.do_main(gen_args)
+    cache_dir = tmp_path / 'xdg' / 'loc' / 'decoder'
+    assert len(os.listdir(str(cache_dir))) == 1
+    assert os.stat(str(cache_dir)).st_mode & 0o777 == 0o700
+
+    # Plant a binary in the cache, as another user could, were it writable
+    cached_bin = cache_dir / os.listdir(str(cache_dir))[0]
+    cached_bin.write_bytes(b'planted')
+    os.chmod(str(cache_dir), 0o777)
+    (tmp_path / 'two-files-program_loc').unlink()
+
+    (retval, _, _, _) = loc_main.do_main(gen_args)
+    assert retval is True
+    assert (tmp_path / 'two-files-program_loc').read_bytes() != b'planted'
+    assert cached_bin.read_bytes() == b'planted'
+
+# #############################################################################
+def test_decoder_cache_eviction(tmp_path):
+    """Only the most recently used binaries are kept in the decoder cache."""
+    # pylint: disable-msg=import-outside-toplevel
+    import loc.loc_decoder_bin as locdb
+    # pylint: enable-msg=import-outside-toplevel
+
+    cache_dir = tmp_path / 'cache'
+    cache_dir.mkdir()
+    for idx in range(5):
+        (cache_dir / ('bin' + str(idx))).write_bytes(b'')
+        os.utime(str(cache_dir / ('bin' + str(idx))), ns=(idx * 10**9, idx * 10**9))
+    (cache_dir / 'bin9.1234.tmp').write_bytes(b'')
+
+    assert locdb.loc_evict_decoder_cache(str(cache_dir), 2) == 3
+    assert sorted(os.listdir(str(cache_dir))) == ['bin3', 'bin4', 'bin9.1234.tmp']
+
+# #############################################################################
+def test_no_decoder(tmp_path):
+    """--no-decoder skips generating the decoder's source and binary."""
+    (_, num_files, _, _) = gen_loc_files(LocTestCodeDir + '/two-files-program', tmp_path)
+    assert num_files == 2
+    verify_file_exists(str(tmp_path), 'loc_filenames.c')
+    assert not (tmp_path / 'two-files-program_loc').exists()
+
+# #############################################################################
+def test_adaptive_nbits(tmp_path):
+    """
+    A file with more than 64K lines widens the line-number component of the
+    LOC-ID. loc.h, the manifest and the decoder binary all use the new split.
+    """
+    src_dir = tmp_path / 'big-file-program'
+    src_dir.mkdir()
+    (src_dir / 'big.c').write_text('int x;\n' * 70000, encoding="utf8")
+    gen_dir = tmp_path / 'gen'
+    gen_dir.mkdir()
+
+    (retval, _, max_num_lines, _) = \
+        loc_main.do_main(['--src-root-dir', str(src_dir),
+                          '--gen-includes-dir', str(gen_dir),
+                          '--gen-source-dir', str(gen_dir),
+                          '--loc-decoder-dir', str(gen_dir)])
+    assert retval is True
+    assert max_num_lines == 70000
+
+    assert xform.loc_read_nbits(str(gen_dir / 'loc.h')) == (15, 17)
+    assert xform.loc_read_nbits(str(gen_dir / 'loc_manifest.bin')) == (15, 17)
+
+    # Generating leaves the split in effect in loc_xform alone
+    assert (xform.LOC_NBITS_FILES, xform.LOC_NBITS_LINES) \
+            == (xform.LOC_NBITS_FILES_DEFAULT, xform.LOC_NBITS_LINES_DEFAULT)
+
+    loc_id = xform.loc_encode(1, 69999, 17)
+    assert loc_id == (1 << 17) | 69999
+    result = sp.run([str(gen_dir / 'big-file-program_loc'), '--brief', str(loc_id)],
+                    text=True, check=True, capture_output=True)
+    assert result.stdout.split() == ['big-file-program/big.c:69999']
+    assert LocDecoder(str(gen_dir)).format(loc_id) == 'big-file-program/big.c:69999'
+
+# #############################################################################
+def test_multiple_src_roots(tmp_path, monkeypatch):
+    """
+    Several source roots go into one file-names table, with root-qualified
+    names and distinct tokens, even for the same dir / file names under each
+    root. The output is the same whichever root's scan finishes first.
+    """
+    src_roots = [tmp_path / 'repo1' / 'src', tmp_path / 'repo2' / 'src',
+                 tmp_path / 'lib']
+    for src_root in src_roots:
+        (src_root / 'util').mkdir(parents=True)
+        (src_root / 'main.c').write_text('int main;\n', encoding="utf8")
+        (src_root / 'util' / 'main.c').write_text('int x;\nint y;\n', encoding="utf8")
+
+    def gen_files(gen_dir):
+        gen_dir.mkdir()
+        args = []
+        for src_root in src_roots:
+            args += ['--src-root-dir', str(src_root)]
+        (retval, num_files, _, _) = \
+            loc_main.do_main(args + ['--gen-includes-dir', str(gen_dir),
+                                     '--gen-source-dir', str(gen_dir),
+                                     '--no-decoder'])
+        assert retval is True
+        assert num_files == 6
+        return {name: (gen_dir / name).read_text(encoding="utf8")
+                for name in ('loc_tokens.h', 'loc_filenames.c')}
+
+    gen_files_in_order = gen_files(tmp_path / 'gen1')
+
+    # Make the first root's scan finish last.
+    scan_src_root = locs.loc_scan_src_root
+    def slow_first_root(src_root_dir, *args):
+        if src_root_dir == str(src_roots[0]):
+            time.sleep(0.2)
+        return scan_src_root(src_root_dir, *args)
+    monkeypatch.setattr(locs, 'loc_scan_src_root', slow_first_root)
+    assert gen_files(tmp_path / 'gen2') == gen_files_in_order
+
+    decoder = LocDecoder(str(tmp_path / 'gen1'))
+    assert sorted(decoder.file_name(idx) for idx in range(1, len(decoder))) \
+            == sorted(['repo1/src/main.c', 'repo1/src/util/main.c',
+                       'repo2/src/main.c', 'repo2/src/util/main.c',
+                       'lib/main.c', 'lib/util/main.c'])
+
+    tokens = [line.split()[1] for line in gen_files_in_order['loc_tokens.h'].splitlines()
+              if line.startswith('#define LOC_') and '.c: L=' in line]
+    assert len(set(tokens)) == 6
+
+# #############################################################################
+def test_outputs_rewritten_only_if_changed(tmp_path, monkeypatch):
+    """
+    A re-run only re-writes the generated files whose contents changed, so
+    the others keep their mtime. Files are replaced atomically: a write that
+    fails leaves the old file in place, and no temp files behind.
+    """
+    src_dir = tmp_path / 'prog'
+    src_dir.mkdir()
+    (src_dir / 'a.c').write_text('int a;\n', encoding="utf8")
+    (src_dir / 'b.c').write_text('int b;\n', encoding="utf8")
+    gen_dir = tmp_path / 'gen'
+    gen_dir.mkdir()
+    gen_args = ['--src-root-dir', str(src_dir),
+                '--gen-includes-dir', str(gen_dir),
+                '--gen-source-dir', str(gen_dir),
+                '--no-decoder']
+    gen_files = ['loc_tokens.h', 'loc_filenames.c', 'loc.h', 'loc_manifest.bin']
+
+    def rewritten_files() -> list:
+        for gen_file in gen_files:
+            os.utime(gen_dir / gen_file, ns=(10**9, 10**9))
+        loc_main.do_main(gen_args)
+        return [gen_file for gen_file in gen_files
+                if os.stat(gen_dir / gen_file).st_mtime_ns != 10**9]
+
+    loc_main.do_main(gen_args)
+    assert not rewritten_files()
+
+    (src_dir / 'b.c').write_text('int b;\nint c;\n', encoding="utf8")
+    assert rewritten_files() == ['loc_tokens.h', 'loc_filenames.c', 'loc_manifest.bin']
+
+    old_contents = {gen_file: (gen_dir / gen_file).read_bytes() for gen_file in gen_files}
+    (src_dir / 'c.c').write_text('int c;\n', encoding="utf8")
+    def failed_replace(src, dst):
+        raise OSError("Failed to rename " + src + " to " + dst)
+    monkeypatch.setattr(os, 'replace', failed_replace)
+    with pytest.raises(OSError):
+        loc_main.do_main(gen_args)
+    assert sorted(os.listdir(gen_dir)) == sorted(gen_files)
+    assert {gen_file: (gen_dir / gen_file).read_bytes() for gen_file in gen_files} \
+            == old_contents
+
 # #############################################################################
 # Helper test methods
 # #############################################################################
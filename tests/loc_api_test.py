@@ -0,0 +1,181 @@
+# #############################################################################
+# loc_api_test.py
+#
+"""
+Unit-tests for the generator's library API: a run configured by a
+LocGenConfig returns its generated files in memory, and a batch of targets
+shares the scans of their source roots.
+"""
+
+# #############################################################################
+import os
+import pytest
+import loc.gen_loc_files as loc_main
+import loc.loc_scan as locs
+from loc.gen_loc_files import LocGenConfig, LocGenError
+from tests.loc_test_utils import gen_args, make_tree
+
+# #############################################################################
+def read_files(gen_dir) -> dict:
+    """Return { full-path-name: contents } of all files under gen_dir."""
+    files = {}
+    for (root, _, file_names) in os.walk(gen_dir):
+        for file_name in file_names:
+            file_path = os.path.join(root, file_name)
+            with open(file_path, 'rb') as file_fh:
+                files[file_path] = file_fh.read()
+    return files
+
+# #############################################################################
+def encoded(artifacts) -> dict:
+    """Return the in-memory 'artifacts' as bytes, as they are written."""
+    return {file_name: (contents if isinstance(contents, bytes)
+                        else contents.encode('utf8'))
+            for (file_name, contents) in artifacts.items()}
+
+# #############################################################################
+def test_generate_in_memory(tmp_path):
+    """
+    Without writing, the generated files come back in memory, identical to
+    those written by a command-line run, and nothing is written to disk.
+    """
+    src_dir = tmp_path / 'prog'
+    make_tree(src_dir, ['a.c', 'sub/b.cpp', 'sub/c.cc', 'README'])
+    gen_dir = tmp_path / 'gen'
+    gen_dir.mkdir()
+
+    config = LocGenConfig([str(src_dir) + '/'], inc_dirname=str(gen_dir),
+                          src_dirname=str(gen_dir),
+                          shards_dirname=str(gen_dir / 'shards'))
+    result = loc_main.loc_generate(config, write=False)
+    assert not os.listdir(gen_dir)
+    assert config.src_root_dirnames == [str(src_dir)]
+    assert not result.written
+    assert result.max_file_num == 3
+    assert result.max_num_lines == 3
+    assert result.file_w_max_num_lines == 'prog/sub/c.cc'
+    assert [name for (name, _) in result.file_table] \
+                == ['Unknown_file', 'prog/a.c', 'prog/sub/b.cpp', 'prog/sub/c.cc']
+
+    loc_main.do_main(gen_args(src_dir, gen_dir)
+                     + ['--gen-index-shards', str(gen_dir / 'shards')])
+    assert read_files(gen_dir) == encoded(result.artifacts)
+
+    result = loc_main.loc_generate(config, write=True)
+    assert not result.written
+
+# #############################################################################
+def test_config_errors(tmp_path):
+    """Bad configs raise LocGenError, and the command-line exits."""
+    with pytest.raises(LocGenError):
+        LocGenConfig([str(tmp_path)], no_such_option=True)
+
+    with pytest.raises(LocGenError):
+        loc_main.loc_generate(LocGenConfig([str(tmp_path / 'no-such-dir')]),
+                              write=False)
+
+    with pytest.raises(LocGenError):
+        loc_main.loc_generate(LocGenConfig([str(tmp_path), str(tmp_path)]),
+                              write=False)
+
+    # Output dirs need only exist when writing
+    config = LocGenConfig([str(tmp_path)], inc_dirname=str(tmp_path / 'no-such-dir'),
+                          gen_decoder=False)
+    loc_main.loc_generate(config, write=False)
+    with pytest.raises(LocGenError):
+        loc_main.loc_generate(config, write=True)
+
+    with pytest.raises(SystemExit):
+        loc_main.do_main(['--batch', str(tmp_path / 'no-such-batch')])
+
+# #############################################################################
+def test_generate_batch(tmp_path, monkeypatch):
+    """
+    A batch scans each shared source root once, and generates the same
+    files as running each target on its own.
+    """
+    # pylint: disable-msg=too-many-locals
+    src_dir = tmp_path / 'prog'
+    make_tree(src_dir, ['a.c', 'sub/b.c'])
+    lib_dir = tmp_path / 'lib'
+    make_tree(lib_dir, ['l.c'])
+
+    targets = [(str(src_dir),), (str(src_dir) + '/',), (str(src_dir), str(lib_dir))]
+    def target_configs() -> list:
+        return [LocGenConfig(src_roots, inc_dirname=str(tmp_path / ('gen%d' % num)),
+                             src_dirname=str(tmp_path / ('gen%d' % num)),
+                             gen_decoder=False)
+                for (num, src_roots) in enumerate(targets)]
+    singles = [encoded(loc_main.loc_generate(config, write=False).artifacts)
+               for config in target_configs()]
+
+    scanned = []
+    scan_src_root = locs.loc_scan_src_root
+    def count_scans(src_root_dir, *args):
+        scanned.append(src_root_dir)
+        return scan_src_root(src_root_dir, *args)
+    monkeypatch.setattr(locs, 'loc_scan_src_root', count_scans)
+
+    for num in range(len(targets)):
+        os.mkdir(tmp_path / ('gen%d' % num))
+    configs = target_configs()
+    results = loc_main.loc_generate_batch(configs)
+    assert sorted(scanned) == sorted([str(src_dir), str(lib_dir)])
+    for (result, single, config) in zip(results, singles, configs):
+        assert encoded(result.artifacts) == single
+        assert read_files(config.inc_dirname) == single
+    assert results[2].file_table[-1][0] == 'lib/l.c'
+    # pylint: enable-msg=too-many-locals
+
+# #############################################################################
+def test_batch_cmdline(tmp_path):
+    """--batch generates all targets listed in its file."""
+    src_dir = tmp_path / 'prog'
+    make_tree(src_dir, ['a.c', 'b.c', 'c.c'])
+    gen_dirs = [tmp_path / 'gen1', tmp_path / 'gen2']
+    batch_file = tmp_path / 'targets.txt'
+    batch_file.write_text('# Targets\n\n'
+                          + '\n'.join(' '.join(gen_args(src_dir, gen_dir))
+                                      for gen_dir in gen_dirs) + '\n',
+                          encoding="utf8")
+    for gen_dir in gen_dirs:
+        gen_dir.mkdir()
+
+    (retval, max_file_num, max_num_lines, file_w_max) \
+        = loc_main.do_main(['--batch', str(batch_file)])
+    assert (retval, max_file_num, max_num_lines, file_w_max) == (True, 3, 3, 'prog/c.c')
+    assert (gen_dirs[0] / 'loc_tokens.h').read_text(encoding="utf8") \
+            == (gen_dirs[1] / 'loc_tokens.h').read_text(encoding="utf8")
+
+    batch_file.write_text(' '.join(gen_args(src_dir, gen_dirs[0])) + ' --watch\n',
+                          encoding="utf8")
+    with pytest.raises(SystemExit):
+        loc_main.do_main(['--batch', str(batch_file)])
+
+# #############################################################################
+def test_scan_cache_saved_once(tmp_path, monkeypatch):
+    """A run saves its --cache-file once, also when shared by a batch's targets."""
+    src_dir = tmp_path / 'prog'
+    make_tree(src_dir, ['a.c', 'b.c'])
+    cache_file = str(tmp_path / 'cache.json')
+
+    saved = []
+    save = loc_main.LocScanCache.save
+    def count_saves(self):
+        saved.append(self.cache_file)
+        save(self)
+    monkeypatch.setattr(loc_main.LocScanCache, 'save', count_saves)
+
+    configs = [LocGenConfig([str(src_dir)], inc_dirname=str(tmp_path / ('gen%d' % num)),
+                            src_dirname=str(tmp_path / ('gen%d' % num)),
+                            cache_file=cache_file, gen_decoder=False)
+               for num in range(2)]
+    for num in range(2):
+        os.mkdir(tmp_path / ('gen%d' % num))
+
+    loc_main.loc_generate(configs[0], write=True)
+    assert saved == [cache_file]
+
+    saved.clear()
+    loc_main.loc_generate_batch(configs)
+    assert saved == [os.path.abspath(cache_file)]
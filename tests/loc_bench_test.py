@@ -0,0 +1,88 @@
+# #############################################################################
+# loc_bench_test.py
+#
+"""
+Unit-tests for the generator benchmark on synthetic source trees: the trees
+are reproducible, runs report per-phase timings, and saved results are
+compared against a baseline.
+"""
+
+# #############################################################################
+import os
+import json
+import loc.loc_bench as locb
+
+# #############################################################################
+def tree_files(tree_dir) -> dict:
+    """Return { relative-file-name: contents } of all files under tree_dir."""
+    files = {}
+    for (root, _, file_names) in os.walk(tree_dir):
+        for file_name in file_names:
+            with open(os.path.join(root, file_name), 'rb') as file_fh:
+                files[os.path.relpath(os.path.join(root, file_name), tree_dir)] = file_fh.read()
+    return files
+
+# #############################################################################
+def test_bench_gen_tree(tmp_path):
+    """Trees depend only on their parameters, and have the asked-for mix."""
+    params = { 'files': 400, 'depth': 2, 'lines': 20,
+               'dup_rate': 0.25, 'non_utf8_rate': 0.1 }
+    stats = locb.loc_bench_gen_tree(str(tmp_path / 'a'), **params)
+    assert locb.loc_bench_gen_tree(str(tmp_path / 'b'), **params) == stats
+    assert tree_files(tmp_path / 'a') == tree_files(tmp_path / 'b')
+
+    files = tree_files(tmp_path / 'a')
+    assert stats['files'] == len(files) == 400
+    assert stats['bytes'] == sum(len(contents) for contents in files.values())
+    assert max(file_name.count('/') for file_name in files) == 2
+    assert 50 <= stats['dup_files'] <= 150
+    assert 10 <= stats['non_utf8_files'] <= 70
+
+    non_utf8 = 0
+    for contents in files.values():
+        try:
+            contents.decode('utf8')
+        except UnicodeDecodeError:
+            non_utf8 += 1
+    assert non_utf8 == stats['non_utf8_files']
+
+# #############################################################################
+def test_bench_run_and_compare(tmp_path, capsys):
+    """
+    A run reports per-phase timings; comparing against its own results finds
+    no regressions, and against a faster baseline does.
+    """
+    results_file = str(tmp_path / 'results.json')
+    bench_args = ['--files', '50', '--lines', '10', '--work-dir', str(tmp_path / 'work')]
+    assert locb.do_main(bench_args + ['--save', results_file]) == 0
+
+    with open(results_file, encoding="utf8") as results_fh:
+        results = json.load(results_fh)
+    case = results['cases']['custom']
+    assert case['num_files'] == 50
+    assert case['tree']['files'] == 50
+    assert case['peak_rss_kb'] > 0
+    assert sorted(case['phases']) == ['count_lines', 'discover', 'emit', 'loc_doth',
+                                      'manifest', 'save_caches', 'write']
+    assert sum(case['phases'].values()) <= case['wall_secs']
+
+    assert not locb.loc_bench_compare(results, results, 0.0)
+
+    baseline = json.loads(json.dumps(results))
+    baseline['cases']['custom']['wall_secs'] = case['wall_secs'] / 2
+    baseline['cases']['custom']['phases']['count_lines'] = 1.0
+    case['phases']['count_lines'] = 2.0
+    regressions = locb.loc_bench_compare(baseline, results, 20.0)
+    assert len(regressions) == 2
+    assert regressions[0].startswith('custom: wall_secs ')
+    assert regressions[1] == 'custom: phase count_lines 1.000 -> 2.000 (+100.0%)'
+
+    baseline['cases']['custom']['params']['files'] = 60
+    assert not locb.loc_bench_compare(baseline, results, 20.0)
+    capsys.readouterr()
+
+    baseline_file = str(tmp_path / 'baseline.json')
+    baseline['cases']['custom'] = dict(case, wall_secs=case['wall_secs'] / 1000)
+    locb.loc_bench_save(baseline_file, baseline)
+    assert locb.do_main(bench_args + ['--baseline', baseline_file]) == 1
+    assert 'REGRESSION: custom: wall_secs ' in capsys.readouterr().out
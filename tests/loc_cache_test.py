@@ -0,0 +1,109 @@
+# #############################################################################
+# loc_cache_test.py
+#
+"""
+Unit-tests for the persistent scan-cache used by the LOC generator.
+"""
+
+# #############################################################################
+import os
+import loc.gen_loc_files as loc_main
+import loc.loc_scan as locs
+from loc.loc_cache import LocScanCache
+
+# #############################################################################
+# Setup some variables pointing to diff dir/sub-dir full-paths.
+LocTestsDir    = os.path.realpath(os.path.dirname(__file__))
+LocDirRoot     = os.path.realpath(LocTestsDir + '/..')
+LocTestCodeDir = LocDirRoot + '/' + 'test-code'
+
+# #############################################################################
+def test_scan_cache_hit_and_miss(tmp_path):
+    """
+    A file is a cache-miss the first time, and a hit once it's been cached
+    and saved, until the file changes.
+    """
+    cache_file = str(tmp_path / 'loc-scan-cache.json')
+    src_file = str(tmp_path / 'file1.c')
+    with open(src_file, 'w', encoding="utf8") as src_fh:
+        src_fh.write("int x;\nint y;\n")
+
+    scan_cache = LocScanCache(cache_file)
+    assert locs.count_lines_cached(src_file, scan_cache, False) == 2
+    assert (scan_cache.hits, scan_cache.misses) == (0, 1)
+    scan_cache.save()
+
+    scan_cache = LocScanCache(cache_file)
+    assert locs.count_lines_cached(src_file, scan_cache, False) == 2
+    assert (scan_cache.hits, scan_cache.misses) == (1, 0)
+
+    # Changing the file's size invalidates its cached entry.
+    with open(src_file, 'a', encoding="utf8") as src_fh:
+        src_fh.write("int z;\n")
+
+    scan_cache = LocScanCache(cache_file)
+    assert locs.count_lines_cached(src_file, scan_cache, False) == 3
+    assert (scan_cache.hits, scan_cache.misses) == (0, 1)
+
+# #############################################################################
+def test_scan_cache_ignores_corrupt_file(tmp_path):
+    """A corrupt cache file is treated as an empty cache."""
+    cache_file = str(tmp_path / 'loc-scan-cache.json')
+    with open(cache_file, 'w', encoding="utf8") as cache_fh:
+        cache_fh.write("{ not json")
+
+    scan_cache = LocScanCache(cache_file)
+    assert scan_cache.lookup(cache_file, os.stat(cache_file)) is None
+
+# #############################################################################
+def test_do_main_with_cache_file(tmp_path):
+    """
+    Re-running the generator with --cache-file produces identical generated
+    files, serving all line-counts from the cache.
+    """
+    cache_file = str(tmp_path / 'loc-scan-cache.json')
+    gen_args = ['--src-root-dir', LocTestCodeDir + '/two-files-program',
+                '--gen-includes-dir', str(tmp_path),
+                '--gen-source-dir', str(tmp_path),
+                '--cache-file', cache_file]
+
+    rv1 = loc_main.do_main(gen_args)
+    with open(str(tmp_path / 'loc_tokens.h'), encoding="utf8") as doth_fh:
+        tokens1 = doth_fh.read()
+
+    rv2 = loc_main.do_main(gen_args)
+    with open(str(tmp_path / 'loc_tokens.h'), encoding="utf8") as doth_fh:
+        tokens2 = doth_fh.read()
+
+    assert rv1 == rv2
+    assert tokens1 == tokens2
+
+    scan_cache = LocScanCache(cache_file)
+    assert len(scan_cache.prev_entries) == 2
+
+# #############################################################################
+def test_scan_cache_unreadable_files(tmp_path):
+    """
+    Files that cannot be stat()'ed, e.g. dangling symlinks, or read are
+    counted as 0 lines, and are not cached, with or without --jobs.
+    """
+    src_dir = tmp_path / 'prog'
+    src_dir.mkdir()
+    (src_dir / 'a.c').write_text("int x;\n", encoding="utf8")
+    os.symlink(str(tmp_path / 'no-such-file.c'), str(src_dir / 'b.c'))
+
+    cache_file = str(tmp_path / 'loc-scan-cache.json')
+    for jobs in ('1', '2'):
+        loc_main.do_main(['--src-root-dir', str(src_dir),
+                          '--gen-includes-dir', str(tmp_path),
+                          '--gen-source-dir', str(tmp_path),
+                          '--no-decoder', '--jobs', jobs,
+                          '--cache-file', cache_file])
+        assert list(LocScanCache(cache_file).prev_entries) == [str(src_dir / 'a.c')]
+        with open(str(tmp_path / 'loc_filenames.c'), encoding="utf8") as dotc_fh:
+            assert '// 2, L=0\n' in dotc_fh.read()
+
+    # A dir is stat()'ed, but cannot be read.
+    scan_cache = LocScanCache(cache_file)
+    assert locs.count_lines_cached(str(src_dir), scan_cache, False) == 0
+    assert not scan_cache.curr_entries
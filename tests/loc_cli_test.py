@@ -0,0 +1,124 @@
+# #############################################################################
+# loc_cli_test.py
+#
+"""
+Unit-tests for the 'python3 -m loc' entry point: its sub-commands, and their
+start-up time budget, as measured by python3 -X importtime.
+"""
+
+# #############################################################################
+import os
+import sys
+import subprocess as sp
+import pytest
+import loc.__main__ as loc_cli
+from tests.loc_test_utils import LocTestCodeDir, gen_args
+
+# Root-dir of the package, containing loc/
+LocPackageDir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# Program generated for, with the generator's extra arguments
+LOC_CLI_TEST_CODE = LocTestCodeDir + '/two-files-program'
+LOC_CLI_GEN_ARGS = ['--gen-func-ranges']
+
+# Budget of time to import all modules, after the interpreter's own start-up,
+# of one decode, and of one no-op generate, in micro-seconds. Both take well
+# under half of this, on a warm cache of compiled modules.
+LOC_STARTUP_BUDGET_USECS = 60 * 1000
+
+# Modules slow to import, not needed to decode nor to re-generate unchanged
+# files with --no-decoder. (shutil is not listed, as argparse imports it.)
+LOC_SLOW_IMPORTS = {'subprocess', 'tempfile', 'hashlib', 'inspect', 'random',
+                    'concurrent.futures', 'numpy', 'loc.loc_watch', 'loc.loc_elf',
+                    'loc.loc_decoder_bin'}
+
+# #############################################################################
+def run_loc(tmp_path, args) -> (str, dict):
+    """
+    Run 'python3 -X importtime -m loc <args>' twice, the first time just to
+    compile the modules, and return the stdout of the second run, and the
+    { module-name: self-import-time-usecs } of modules it imported after
+    the interpreter's start-up.
+    """
+    env = dict(os.environ, PYTHONPATH=LocPackageDir,
+               PYTHONPYCACHEPREFIX=str(tmp_path / 'pycache'))
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    for _ in range(2):
+        result = sp.run([sys.executable, '-X', 'importtime', '-m', 'loc'] + args,
+                        env=env, check=True, capture_output=True, text=True)
+
+    # Lines are: 'import time: <self-usecs> | <cumulative-usecs> | <module>'
+    import_times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        (self_usecs, _, module) = line[len('import time:'):].split('|')
+        import_times[module.strip()] = int(self_usecs)
+
+    # Drop modules imported by the interpreter's start-up, before 'loc'
+    modules = list(import_times)
+    for module in modules[:modules.index('loc')]:
+        del import_times[module]
+    return (result.stdout, import_times)
+
+# #############################################################################
+def test_cli_commands(tmp_path, capsys):
+    """Commands run in-process; unknown commands are an error."""
+    assert loc_cli.do_main(['gen'] + gen_args(LOC_CLI_TEST_CODE, tmp_path) + LOC_CLI_GEN_ARGS) == 0
+    assert loc_cli.do_main(['decode', str(tmp_path), '65541', '--brief', '65547']) == 0
+    assert loc_cli.do_main(['stats', str(tmp_path)]) == 0
+    out = capsys.readouterr().out.splitlines()
+    assert out[0] == 'two-files-program/two-files-file1.c:5'
+    assert out[1] == 'two-files-program/two-files-file1.c:11 file1_function1()'
+    assert out[2] == str(tmp_path / 'loc_filenames.c') + ':'
+    assert out[3].split() == ['Files', ':', '2,', 'max', 'file-index', '2', 'of', '32767']
+
+    assert loc_cli.do_main([]) == 1
+    assert loc_cli.do_main(['no-such-command']) == 1
+    assert 'Unknown command: no-such-command' in capsys.readouterr().err
+    with pytest.raises(SystemExit):
+        loc_cli.do_main(['decode', str(tmp_path / 'no-such-dir'), '1'])
+
+# #############################################################################
+def test_decode_stdin(tmp_path):
+    """--stdin and --stdin-binary decode LOC-IDs as the compiled decoder does."""
+    loc_cli.do_main(['gen'] + gen_args(LOC_CLI_TEST_CODE, tmp_path) + LOC_CLI_GEN_ARGS)
+    decode = [sys.executable, '-m', 'loc', 'decode', str(tmp_path)]
+    env = dict(os.environ, PYTHONPATH=LocPackageDir)
+
+    result = sp.run(decode + ['--stdin'], input=b'65541\nnot-a-loc-id\n 65547 x\n',
+                    env=env, check=True, capture_output=True)
+    assert result.stdout.decode().splitlines() \
+            == ['65541: [fnum=1] two-files-program/two-files-file1.c:5',
+                '65547: [fnum=1] two-files-program/two-files-file1.c:11 file1_function1()']
+
+    result = sp.run(decode + ['--stdin-binary', '--brief'],
+                    input=(65541).to_bytes(4, 'little') + b'\x05\x00',
+                    env=env, check=True, capture_output=True)
+    assert result.stdout.decode().splitlines() == ['two-files-program/two-files-file1.c:5']
+    assert b'Ignored 2 trailing bytes' in result.stderr
+
+# #############################################################################
+@pytest.mark.parametrize('command', ['decode', 'gen'])
+def test_startup_budget(tmp_path, command):
+    """
+    Decoding a LOC-ID, and re-generating unchanged files, do not import slow
+    modules they do not need, and import all they do need within budget.
+    """
+    gen_dir = tmp_path / 'gen'
+    gen_dir.mkdir()
+    gen_cmd = ['gen'] + gen_args(LOC_CLI_TEST_CODE, gen_dir) + LOC_CLI_GEN_ARGS
+    loc_cli.do_main(gen_cmd)
+
+    if command == 'decode':
+        (out, import_times) = run_loc(tmp_path, ['decode', str(gen_dir), '65541'])
+        assert out == '65541: [fnum=1] two-files-program/two-files-file1.c:5\n'
+        assert 'loc.gen_loc_files' not in import_times
+    else:
+        mtime = os.stat(gen_dir / 'loc.h').st_mtime_ns
+        (_, import_times) = run_loc(tmp_path, gen_cmd)
+        assert os.stat(gen_dir / 'loc.h').st_mtime_ns == mtime
+
+    assert not LOC_SLOW_IMPORTS & set(import_times)
+    assert sum(import_times.values()) < LOC_STARTUP_BUDGET_USECS, \
+           sorted(import_times.items(), key=lambda item: item[1])[-10:]
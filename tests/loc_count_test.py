@@ -0,0 +1,265 @@
+# #############################################################################
+# loc_count_test.py
+#
+"""
+Unit-tests for the per-call-site hit counters of include/loc_count.h and
+src/loc_count.c, read by loc/loc_count.py while the counting program runs.
+The program is built with either LOC scheme: LOC2 (include/loc.h) or the
+generated loc.h.
+"""
+
+# #############################################################################
+import os
+import shutil
+import subprocess as sp
+import pytest
+import loc.gen_loc_files as loc_main
+from loc.loc_count import LocCounters
+from loc.loc_decoder import LocDecoder
+from loc.loc_elf import LocElf
+
+# #############################################################################
+# Setup some variables pointing to diff dir/sub-dir full-paths.
+LocTestsDir    = os.path.realpath(os.path.dirname(__file__))
+LocDirRoot     = os.path.realpath(LocTestsDir + '/..')
+
+# Threads hit site-a 1000, 2000, 3000, 4000 times, and site-b a tenth of
+# that. After all threads are done, main() hits site-main once and waits for
+# a line on stdin before exiting, so the counters can be read while it runs.
+LOC_COUNT_TEST_PROG = r'''
+#include <stdio.h>
+#include <stdlib.h>
+#include <pthread.h>
+#include "loc_count.h"
+
+#define NUM_THREADS 4
+
+static void *
+worker(void *arg)
+{
+    long nhits = (long) arg;
+    for (long i = 0; i < nhits; i++) {
+        LOC_COUNT();    // site-a
+        if ((i % 10) == 0) {
+            LOC_COUNT();    // site-b
+        }
+    }
+    return NULL;
+}
+
+int
+main(int argc, char *argv[])
+{
+    if ((argc > 1) && loc_count_init(NULL, (uint32_t) atoi(argv[1]), 0)) {
+        return 1;
+    }
+    pthread_t threads[NUM_THREADS];
+    for (long t = 0; t < NUM_THREADS; t++) {
+        pthread_create(&threads[t], NULL, worker, (void *) (1000 * (t + 1)));
+    }
+    for (long t = 0; t < NUM_THREADS; t++) {
+        pthread_join(threads[t], NULL);
+    }
+    LOC_COUNT();    // site-main
+
+    printf("ready\n");
+    fflush(stdout);
+    getchar();
+    return 0;
+}
+'''
+
+# main() hits site-parent 1000 times, then fork()'s a child that hits
+# site-child 2000 times, while main() hits site-parent 3000 more times.
+LOC_COUNT_FORK_TEST_PROG = r'''
+#include <stdio.h>
+#include <unistd.h>
+#include <sys/wait.h>
+#include "loc_count.h"
+
+static void
+hit(int nhits, int child)
+{
+    for (int i = 0; i < nhits; i++) {
+        if (child) {
+            LOC_COUNT();    // site-child
+        } else {
+            LOC_COUNT();    // site-parent
+        }
+    }
+}
+
+int
+main(void)
+{
+    hit(1000, 0);
+    pid_t pid = fork();
+    if (pid == 0) {
+        hit(2000, 1);
+        _exit(0);
+    }
+    hit(3000, 0);
+    waitpid(pid, NULL, 0);
+
+    printf("ready\n");
+    fflush(stdout);
+    getchar();
+    return 0;
+}
+'''
+
+# Expected counts of the sites, by their marker comments
+LOC_COUNT_EXPECTED = { 'site-a': 10000, 'site-b': 1000, 'site-main': 1 }
+LOC_COUNT_FORK_EXPECTED = { 'site-parent': 4000, 'site-child': 2000 }
+
+# #############################################################################
+def site_lines(prog=LOC_COUNT_TEST_PROG, expected=None):
+    """Return { line-number: expected-count } of the test program's sites."""
+    expected = LOC_COUNT_EXPECTED if expected is None else expected
+    lines = {}
+    for (line_num, line) in enumerate(prog.splitlines(), start=1):
+        for (site, count) in expected.items():
+            if line.endswith('// ' + site):
+                lines[line_num] = count
+    return lines
+
+# #############################################################################
+def build_prog(tmp_path, scheme, prog=LOC_COUNT_TEST_PROG):
+    """
+    Build the test program 'prog' with LOC 'scheme'. Returns (binary, decode),
+    where decode() returns the line-number of a LOC-ID.
+    """
+    if shutil.which('cc') is None:
+        pytest.skip("No C compiler available")
+
+    src_dir = tmp_path / 'src'
+    src_dir.mkdir()
+    prog_src = src_dir / 'loc_count_prog.c'
+    prog_src.write_text(prog, encoding="utf8")
+    prog_bin = str(tmp_path / 'loc_count_prog')
+    cmd = ['cc', '-O2', '-pthread', '-o', prog_bin, str(prog_src),
+           LocDirRoot + '/src/loc_count.c']
+
+    if scheme == 'loc2':
+        sp.run(cmd + ['-I', LocDirRoot + '/include', LocDirRoot + '/src/loc.c'],
+               check=True, capture_output=True)
+        loc_elf = LocElf(prog_bin)
+        return (prog_bin, lambda loc_id: loc_elf.decode(loc_id)[2])
+
+    gen_dir = tmp_path / 'gen'
+    gen_dir.mkdir()
+    (retval, _, _, _) = \
+      loc_main.do_main(['--src-root-dir', str(src_dir),
+                        '--gen-includes-dir', str(gen_dir),
+                        '--gen-source-dir', str(gen_dir),
+                        '--loc-decoder-dir', str(gen_dir),
+                        '--no-decoder'])
+    assert retval is True
+    sp.run(cmd + ['-I', str(gen_dir), '-I', LocDirRoot + '/include',
+                  '-DLOC_FILE_INDEX=LOC_loc_count_prog_c',
+                  str(gen_dir / 'loc_filenames.c')],
+           check=True, capture_output=True)
+    decoder = LocDecoder(str(gen_dir))
+    return (prog_bin, lambda loc_id: decoder.decode(loc_id)[1])
+
+# #############################################################################
+@pytest.mark.parametrize('nshards', [None, 2, 1],
+                         ids=['private-shards', 'shared-shards', 'one-shard'])
+@pytest.mark.parametrize('scheme', ['loc2', 'generated'])
+def test_loc_count_live_snapshot(tmp_path, scheme, nshards):
+    """
+    Counters read while the program runs are exact, also when threads share
+    shards, or re-use shards of exited threads, and their LOC-IDs decode to
+    the sites' lines.
+    """
+    (prog_bin, decode) = build_prog(tmp_path, scheme)
+
+    counters_file = str(tmp_path / 'counters.bin')
+    env = dict(os.environ, LOC_COUNT_FILE=counters_file)
+    args = [prog_bin] + ([str(nshards)] if nshards else [])
+    with sp.Popen(args, env=env, text=True, stdin=sp.PIPE, stdout=sp.PIPE) as proc:
+        try:
+            assert proc.stdout.readline() == 'ready\n'
+            with LocCounters(counters_file) as counters:
+                assert counters.pid == proc.pid
+                assert counters.signed == (scheme == 'loc2')
+                assert counters.nthreads() == 5
+                assert counters.ndropped() == 0
+                counts = counters.snapshot()
+        finally:
+            proc.communicate('\n')
+    assert proc.returncode == 0
+
+    assert {decode(loc_id): count for (loc_id, count) in counts.items()} == site_lines()
+
+# #############################################################################
+def test_loc_count_fork(tmp_path):
+    """
+    A child fork()'ed after the parent's first hit counts its hits into the
+    parent's file, without sharing the parent thread's shard, so counts of
+    both are exact.
+    """
+    (prog_bin, decode) = build_prog(tmp_path, 'loc2', LOC_COUNT_FORK_TEST_PROG)
+
+    counters_file = str(tmp_path / 'counters.bin')
+    env = dict(os.environ, LOC_COUNT_FILE=counters_file)
+    with sp.Popen([prog_bin], env=env, text=True, stdin=sp.PIPE, stdout=sp.PIPE) as proc:
+        try:
+            assert proc.stdout.readline() == 'ready\n'
+            with LocCounters(counters_file) as counters:
+                assert counters.pid == proc.pid
+                assert counters.nthreads() == 2
+                counts = counters.snapshot()
+        finally:
+            proc.communicate('\n')
+    assert proc.returncode == 0
+
+    assert {decode(loc_id): count for (loc_id, count) in counts.items()} \
+            == site_lines(LOC_COUNT_FORK_TEST_PROG, LOC_COUNT_FORK_EXPECTED)
+
+# #############################################################################
+def test_loc_counters_errors(tmp_path):
+    """Files that are not counters' files are rejected."""
+    bad_file = tmp_path / 'bad.bin'
+    bad_file.write_bytes(b'LOCM' + bytes(60))
+    with pytest.raises(ValueError):
+        LocCounters(str(bad_file))
+
+    bad_file.write_bytes(b'LOCC')
+    with pytest.raises(ValueError):
+        LocCounters(str(bad_file))
+
+# #############################################################################
+def test_loc_count_file_private(tmp_path):
+    """
+    The default counters' file is in $XDG_RUNTIME_DIR, readable only by the
+    user, and a symlink planted at its name is replaced, not written through.
+    """
+    (prog_bin, _) = build_prog(tmp_path, 'loc2')
+    run_dir = tmp_path / 'run'
+    run_dir.mkdir()
+    target = tmp_path / 'target'
+    target.write_text('precious\n', encoding="utf8")
+
+    env = dict(os.environ, XDG_RUNTIME_DIR=str(run_dir))
+    env.pop('LOC_COUNT_FILE', None)
+    with sp.Popen([prog_bin], env=env, text=True, stdin=sp.PIPE, stdout=sp.PIPE) as proc:
+        try:
+            assert proc.stdout.readline() == 'ready\n'
+            counters_file = run_dir / ('loc_count.' + str(proc.pid))
+            assert os.stat(str(counters_file)).st_mode & 0o777 == 0o600
+        finally:
+            proc.communicate('\n')
+
+    counters_file.unlink()
+    counters_file.symlink_to(target)
+    env['LOC_COUNT_FILE'] = str(counters_file)
+    with sp.Popen([prog_bin], env=env, text=True, stdin=sp.PIPE, stdout=sp.PIPE) as proc:
+        try:
+            assert proc.stdout.readline() == 'ready\n'
+            assert not counters_file.is_symlink()
+            with LocCounters(str(counters_file)) as counters:
+                assert counters.pid == proc.pid
+        finally:
+            proc.communicate('\n')
+    assert target.read_text(encoding="utf8") == 'precious\n'
@@ -0,0 +1,113 @@
+# #############################################################################
+# loc_decoder_test.py
+#
+"""
+Unit-tests for the in-process Python LocDecoder. Cross-check its decoding
+against that of the generated <product>_loc decoder binary.
+"""
+
+# #############################################################################
+import os
+import subprocess as sp
+import loc.gen_loc_files as loc_main
+from loc.loc_decoder import LocDecoder
+from tests.loc_test_utils import gen_loc_files
+
+# #############################################################################
+# Setup some variables pointing to diff dir/sub-dir full-paths.
+LocTestsDir    = os.path.realpath(os.path.dirname(__file__))
+LocDirRoot     = os.path.realpath(LocTestsDir + '/..')
+LocTestCodeDir = LocDirRoot + '/' + 'test-code'
+
+# Some LOC-IDs, including ones with out-of-range file-indexes.
+LOC_TEST_IDS = [65540, 65541, 131082, 131089, 0, 9 << 16 | 3]
+
+# #############################################################################
+def gen_two_files_program(tmp_path):
+    """Run the generator on the two-files-program, generating into tmp_path."""
+    (retval, num_files, _, _) = \
+      loc_main.do_main(['--src-root-dir', LocTestCodeDir + '/two-files-program',
+                        '--gen-includes-dir', str(tmp_path),
+                        '--gen-source-dir', str(tmp_path),
+                        '--loc-decoder-dir', str(tmp_path)])
+    assert retval is True
+    assert num_files == 2
+
+# #############################################################################
+def test_loc_decoder(tmp_path):
+    """Decode LOC-IDs using the generated loc_filenames.c and loc_tokens.h."""
+    gen_two_files_program(tmp_path)
+
+    decoder = LocDecoder(str(tmp_path))
+    assert len(decoder) == 3
+    assert decoder.decode(65541) == ('two-files-program/two-files-file1.c', 5)
+    assert decoder.decode(131089) == ('two-files-program/two-files-main.c', 17)
+    assert decoder.decode(9 << 16 | 3) == ('', 3)
+    assert decoder.format(65541) == 'two-files-program/two-files-file1.c:5'
+
+    # Repeat lookups are served from the LRU cache.
+    decoder.format(65541)
+    assert decoder.format.cache_info().hits == 1
+
+    doth_decoder = LocDecoder(str(tmp_path / 'loc_tokens.h'))
+    assert doth_decoder.file_names == decoder.file_names
+    assert doth_decoder.file_lines == decoder.file_lines
+
+# #############################################################################
+def test_loc_decoder_matches_decoder_binary(tmp_path):
+    """Python decoder's output is the same as the generated decoder binary's."""
+    gen_two_files_program(tmp_path)
+
+    result = sp.run([str(tmp_path / 'two-files-program_loc'), '--brief']
+                    + [str(loc_id) for loc_id in LOC_TEST_IDS],
+                    text=True, check=True, capture_output=True)
+
+    decoder = LocDecoder(str(tmp_path / 'loc_filenames.c'))
+    assert result.stdout.split() == [decoder.format(loc_id) for loc_id in LOC_TEST_IDS]
+
+# #############################################################################
+def test_decoder_binary_stdin_streams(tmp_path):
+    """
+    Generated decoder binary decodes LOC-IDs streamed on stdin, as text or
+    as little-endian uint32s, identically to LOC-IDs passed as arguments.
+    LOC-IDs above INT_MAX must decode correctly.
+    """
+    gen_two_files_program(tmp_path)
+    decoder_bin = str(tmp_path / 'two-files-program_loc')
+    loc_ids = LOC_TEST_IDS + [(1 << 31) | (2 << 16) | 5, 0xffffffff]
+
+    from_args = sp.run([decoder_bin] + [str(loc_id) for loc_id in loc_ids],
+                       check=True, capture_output=True).stdout
+
+    text_input = ''.join(str(loc_id) + '\n' for loc_id in loc_ids).encode()
+    from_text = sp.run([decoder_bin, '--stdin'], input=text_input,
+                       check=True, capture_output=True).stdout
+
+    binary_input = b''.join(loc_id.to_bytes(4, 'little') for loc_id in loc_ids)
+    from_binary = sp.run([decoder_bin, '--stdin-binary'], input=binary_input,
+                         check=True, capture_output=True).stdout
+
+    assert from_args == from_text == from_binary
+    assert from_args.decode().splitlines()[-2] == '2147614725: [fnum=32770] :5 '
+
+# #############################################################################
+def test_loc_decoder_func_names(tmp_path):
+    """
+    With --gen-func-ranges, the Python decoder and the decoder binary both
+    decode LOC-IDs to their enclosing function.
+    """
+    gen_loc_files(LocTestCodeDir + '/two-files-program', tmp_path,
+                  ['--gen-func-ranges'], decoder=True)
+
+    decoder = LocDecoder(str(tmp_path))
+    loc_ids = [65547, 65554, 131090, 131101, 131092, 65537, 9 << 16 | 3]
+    func_names = [decoder.func_name(loc_id) for loc_id in loc_ids]
+    assert func_names == ['file1_function1', 'file1_function2', 'function2',
+                          'main', '', '', '']
+
+    result = sp.run([str(tmp_path / 'two-files-program_loc'), '--brief']
+                    + [str(loc_id) for loc_id in loc_ids],
+                    text=True, check=True, capture_output=True)
+    assert result.stdout.splitlines() \
+            == [decoder.format(loc_id) + ' ' + (func + '() ' if func else '')
+                for (loc_id, func) in zip(loc_ids, func_names)]
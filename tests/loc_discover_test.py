@@ -0,0 +1,140 @@
+# #############################################################################
+# loc_discover_test.py
+#
+"""
+Unit-tests for the source-discovery backends used by the LOC generator.
+Every backend must list the same files in the same order as the dir-walk.
+"""
+
+# #############################################################################
+import io
+import os
+import json
+import random
+import subprocess as sp
+import pytest
+import loc.loc_discover as locd
+
+# Files, relative to the source root-dir, of the synthetic tree used below.
+LOC_TREE_FILES = ['main.c', 'b.c', 'a/z.c', 'a/a.c', 'a/b/x.cpp',
+                'ab/c.cc', 'a.b/d.c', 'z/y/x/w.c', 'A/upper.c']
+
+# #############################################################################
+def make_src_tree(root_dir):
+    """Create the synthetic source tree under 'root_dir'."""
+    for rel_path in LOC_TREE_FILES:
+        src_file = root_dir / rel_path
+        src_file.parent.mkdir(parents=True, exist_ok=True)
+        src_file.write_text("int x;\n", encoding="utf8")
+
+# #############################################################################
+def test_walk_order_of_rel_paths(tmp_path):
+    """
+    Sorting a shuffled list of relative paths reproduces the dir-walk order.
+    """
+    make_src_tree(tmp_path)
+    src_root_dir = str(tmp_path)
+
+    walked = locd.loc_walk_sources(src_root_dir)
+    assert len(walked) == len(LOC_TREE_FILES)
+
+    rel_paths = list(LOC_TREE_FILES)
+    random.Random(42).shuffle(rel_paths)
+    assert locd.loc_rel_paths_to_walk_order(src_root_dir, rel_paths) == walked
+
+# #############################################################################
+def test_discover_compile_commands(tmp_path):
+    """
+    compile_commands.json entries, relative or absolute, are listed in walk
+    order. Files outside the source root-dir and duplicates are dropped.
+    """
+    make_src_tree(tmp_path)
+    src_root_dir = str(tmp_path)
+
+    entries = [{'directory': src_root_dir + '/a', 'file': 'z.c'},
+               {'directory': '/somewhere/else', 'file': src_root_dir + '/main.c'},
+               {'directory': src_root_dir, 'file': 'a/z.c'},
+               {'directory': src_root_dir, 'file': '../outside.c'}]
+    cc_file = tmp_path / 'compile_commands.json'
+    cc_file.write_text(json.dumps(entries), encoding="utf8")
+
+    found_files = locd.loc_discover_sources(src_root_dir, 'compile-commands')
+    assert found_files == [(src_root_dir, 'main.c'), (src_root_dir + '/a', 'z.c')]
+
+    with pytest.raises(locd.LocDiscoverError):
+        locd.loc_discover_sources(src_root_dir, 'compile-commands',
+                                  str(tmp_path / 'no-such-file.json'))
+
+    # Malformed databases: Not a list, or entries without a "file"
+    for bad_entries in ({'file': 'main.c'}, [{'directory': src_root_dir}],
+                        ['main.c'], [{'file': 42}]):
+        cc_file.write_text(json.dumps(bad_entries), encoding="utf8")
+        with pytest.raises(locd.LocDiscoverError):
+            locd.loc_discover_sources(src_root_dir, 'compile-commands')
+
+# #############################################################################
+def test_discover_stdin(tmp_path, monkeypatch):
+    """File names read from stdin are listed in walk order."""
+    make_src_tree(tmp_path)
+    src_root_dir = str(tmp_path)
+
+    stdin_list = '\n'.join(src_root_dir + '/' + f for f in reversed(LOC_TREE_FILES))
+    monkeypatch.setattr('sys.stdin', io.StringIO(stdin_list + '\n'))
+
+    found_files = locd.loc_discover_sources(src_root_dir, 'stdin')
+    assert found_files == locd.loc_walk_sources(src_root_dir)
+
+# #############################################################################
+def test_discover_git(tmp_path):
+    """Files in the git index are listed in walk order; others are not."""
+    make_src_tree(tmp_path)
+    src_root_dir = str(tmp_path)
+
+    try:
+        sp.run(['git', 'init', '-q', src_root_dir], check=True, capture_output=True)
+        sp.run(['git', '-C', src_root_dir, 'add'] + LOC_TREE_FILES,
+               check=True, capture_output=True)
+    except (OSError, sp.CalledProcessError):
+        pytest.skip("git is not usable in this environment")
+
+    (tmp_path / 'untracked.c').write_text("int x;\n", encoding="utf8")
+
+    found_files = locd.loc_discover_sources(src_root_dir, 'git')
+    walked = [found for found in locd.loc_walk_sources(src_root_dir)
+              if '/.git' not in found[0] and found[1] != 'untracked.c']
+    assert found_files == walked
+
+    with pytest.raises(locd.LocDiscoverError):
+        locd.loc_discover_sources(str(tmp_path / 'a'), 'git-typo')
+
+# #############################################################################
+def test_walk_matches_os_walk(tmp_path):
+    """The scandir-based walker lists the same files as a sorted os.walk()."""
+    make_src_tree(tmp_path)
+    (tmp_path / 'a' / 'link-to-z').symlink_to(tmp_path / 'z', target_is_directory=True)
+    src_root_dir = str(tmp_path)
+
+    os_walked = []
+    for root, dirs, files in os.walk(src_root_dir):
+        dirs.sort()
+        os_walked.extend((root, file) for file in sorted(files))
+
+    assert locd.loc_walk_sources(src_root_dir) == os_walked
+
+# #############################################################################
+def test_exclude_dirs_and_files(tmp_path):
+    """
+    --exclude-dir prunes sub-dirs matched by name or relative path, and
+    --exclude skips files. Walk and list-based backends agree.
+    """
+    make_src_tree(tmp_path)
+    src_root_dir = str(tmp_path)
+    exclude_dirs = ['b', 'z/y']
+    excludes = ['*.cc', 'a/z.c']
+
+    walked = locd.loc_walk_sources(src_root_dir, exclude_dirs, excludes)
+    assert [root.replace(src_root_dir, '', 1) + '/' + file for root, file in walked] \
+            == ['/b.c', '/main.c', '/A/upper.c', '/a/a.c', '/a.b/d.c']
+
+    rel_paths = locd.loc_exclude_rel_paths(LOC_TREE_FILES, exclude_dirs, excludes)
+    assert locd.loc_rel_paths_to_walk_order(src_root_dir, rel_paths) == walked
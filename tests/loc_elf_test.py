@@ -0,0 +1,90 @@
+# #############################################################################
+# loc_elf_test.py
+#
+"""
+Unit-tests for the offline LocElf decoder of LOC2 LOC-IDs. A small program
+built with include/loc.h and src/loc.c prints its LOC-IDs and their decoded
+(function, file, line), which must match what LocElf reads off the binary.
+"""
+
+# #############################################################################
+import os
+import shutil
+import subprocess as sp
+import pytest
+from loc.loc_elf import LocElf, LocElfError
+
+# #############################################################################
+# Setup some variables pointing to diff dir/sub-dir full-paths.
+LocTestsDir    = os.path.realpath(os.path.dirname(__file__))
+LocDirRoot     = os.path.realpath(LocTestsDir + '/..')
+
+LOC_ELF_TEST_PROG = r'''
+#include <stdio.h>
+#include "loc.h"
+
+static loc_t
+minion(int x)
+{
+    return (x ? __LOC__ : __LOC__);
+}
+
+int
+main(void)
+{
+    loc_t ids[] = { __LOC__, minion(0), minion(1), __LOC__ };
+    for (int i = 0; i < (int) (sizeof(ids) / sizeof(*ids)); i++) {
+        printf("%d %s %s %u\n", ids[i], LOC_FUNC(ids[i]), LOC_FILE(ids[i]),
+               LOC_LINE(ids[i]));
+    }
+    return 0;
+}
+'''
+
+# #############################################################################
+def build_and_run(tmp_path, cflags):
+    """Build the test program with 'cflags'; return (binary, output lines)."""
+    if shutil.which('cc') is None:
+        pytest.skip("No C compiler available")
+
+    prog_src = tmp_path / 'loc_elf_prog.c'
+    prog_src.write_text(LOC_ELF_TEST_PROG, encoding="utf8")
+    prog_bin = str(tmp_path / 'loc_elf_prog')
+    sp.run(['cc'] + cflags + ['-I', LocDirRoot + '/include', '-o', prog_bin,
+            str(prog_src), LocDirRoot + '/src/loc.c'],
+           check=True, capture_output=True)
+
+    result = sp.run([prog_bin], text=True, check=True, capture_output=True)
+    return (prog_bin, result.stdout.splitlines())
+
+# #############################################################################
+@pytest.mark.parametrize('cflags', [['-fPIE', '-pie'], ['-fno-pie', '-no-pie']],
+                         ids=['pie', 'no-pie'])
+def test_loc_elf_decode(tmp_path, cflags):
+    """LocElf decodes LOC-IDs exactly as the running program does."""
+    (prog_bin, lines) = build_and_run(tmp_path, cflags)
+    assert len(lines) == 4
+
+    with LocElf(prog_bin) as loc_elf:
+        for line in lines:
+            (loc_id, func, file, line_num) = line.split()
+            assert loc_elf.decode(int(loc_id)) == (func, file, int(line_num))
+
+        # All LOC-IDs in the program are found, and nothing else.
+        assert sorted(loc_elf.loc_ids()) == sorted(int(line.split()[0]) for line in lines)
+
+        with pytest.raises(ValueError):
+            loc_elf.decode(int(lines[0].split()[0]) + 1)
+
+# #############################################################################
+def test_loc_elf_errors(tmp_path):
+    """Non-ELF files and ELF files without a loc_ids section are rejected."""
+    not_elf = tmp_path / 'not_elf'
+    not_elf.write_bytes(b'#!/bin/sh\n')
+    with pytest.raises(LocElfError):
+        LocElf(str(not_elf))
+
+    if not os.path.exists('/bin/sh'):
+        pytest.skip("No ELF binary to test with")
+    with pytest.raises(LocElfError):
+        LocElf(os.path.realpath('/bin/sh'))
@@ -0,0 +1,75 @@
+# #############################################################################
+# loc_func_ranges_test.py
+#
+"""
+Unit-tests for the lightweight scanner of function line-ranges in C / C++
+source files, used by the LOC generator's --gen-func-ranges option.
+"""
+
+# #############################################################################
+import os
+import loc.loc_func_ranges as locf
+
+# #############################################################################
+# Setup some variables pointing to diff dir/sub-dir full-paths.
+LocTestsDir    = os.path.realpath(os.path.dirname(__file__))
+LocDirRoot     = os.path.realpath(LocTestsDir + '/..')
+LocTestCodeDir = LocDirRoot + '/' + 'test-code'
+
+# #############################################################################
+def test_func_ranges_c():
+    """
+    Functions are found in C code; braces in comments, literals, macros and
+    initializers are not mistaken for function bodies.
+    """
+    code = '\n'.join(['#include <stdio.h>',                     # 1
+                      '#define BODY(x) { \\',                   # 2
+                      '    return (x); }',                      # 3
+                      '/* int fake(void) { } */',               # 4
+                      'static int',                             # 5
+                      'minion(int x)',                          # 6
+                      '{',                                      # 7
+                      '    if (x) { return 1; }',               # 8
+                      '    const char *s = "}{";',              # 9
+                      "    return '{';",                        # 10
+                      '}',                                      # 11
+                      'struct pt { int x, y; } pts[] = { {1, 2} };',  # 12
+                      'int main(void) { return minion(0); }'])  # 13
+
+    assert locf.loc_func_ranges(code) == [(6, 11, 'minion'), (13, 13, 'main')]
+
+# #############################################################################
+def test_func_ranges_cpp():
+    """
+    Methods, constructors with init-lists, destructors and operators are
+    found in C++ code, qualified by their namespace and class names.
+    """
+    code = '\n'.join(['extern "C" {',                                   # 1
+                      'int cfunc(void) { return 0; }',                  # 2
+                      '}',                                              # 3
+                      'namespace ns {',                                 # 4
+                      'class Klass : public Base {',                    # 5
+                      '  public:',                                      # 6
+                      '    Klass() : m_x{1}, m_y(2) {',                 # 7
+                      '    }',                                          # 8
+                      '    int get() const noexcept { return m_x; }',   # 9
+                      '    bool operator==(const Klass &o) const { return true; }',  # 10
+                      '  private:',                                     # 11
+                      '    int m_x = 0;',                               # 12
+                      '};',                                             # 13
+                      'Klass::~Klass() {}',                             # 14
+                      'auto lam = [](int a) { return a; };',            # 15
+                      '}'])                                             # 16
+
+    assert locf.loc_func_ranges(code) == [(2, 2, 'cfunc'),
+                                          (7, 8, 'ns::Klass::Klass'),
+                                          (9, 9, 'ns::Klass::get'),
+                                          (10, 10, 'ns::Klass::operator=='),
+                                          (14, 14, 'ns::Klass::~Klass')]
+
+# #############################################################################
+def test_scan_func_ranges():
+    """Scan a test-code source file."""
+    assert locf.loc_scan_func_ranges(LocTestCodeDir
+                                     + '/two-files-program/two-files-main.c') \
+            == [(14, 19, 'function2'), (22, 26, 'function1'), (29, 35, 'main')]
@@ -0,0 +1,68 @@
+# #############################################################################
+# loc_histogram_test.py
+#
+"""
+Unit-tests for the hot call-site histogram over binary trace files of
+LOC-IDs. Chunked, vectorized counting must match a plain Counter().
+"""
+
+# #############################################################################
+import random
+from collections import Counter
+import pytest
+import loc.loc_histogram as loch
+from tests.loc_test_utils import LocTestCodeDir, gen_loc_files
+
+# #############################################################################
+def write_trace(trace_file, loc_ids, signed=False):
+    """Write 'loc_ids' as a binary trace file of little-endian 32-bit values."""
+    with open(trace_file, 'wb') as trace_fh:
+        for loc_id in loc_ids:
+            trace_fh.write(loc_id.to_bytes(4, 'little', signed=signed))
+
+# #############################################################################
+@pytest.mark.parametrize('signed', [False, True], ids=['uint32', 'int32'])
+def test_histogram_matches_counter(tmp_path, signed):
+    """
+    Counts are exact across chunk boundaries, on both the bincount() path
+    (narrow range of LOC-IDs) and the unique() path (wide range).
+    """
+    pytest.importorskip("numpy")
+    rng = random.Random(42)
+    if signed:
+        loc_ids = [rng.choice([-96, -64, -32, 0, 32, -(1 << 30)]) for _ in range(5000)]
+    else:
+        loc_ids = [rng.choice([65541, 65542, 131089, 0xffffffff, 7 << 16])
+                   for _ in range(5000)]
+    trace_file = str(tmp_path / 'trace.bin')
+    write_trace(trace_file, loc_ids, signed)
+
+    # Add a trailing partial LOC-ID, which is ignored.
+    with open(trace_file, 'ab') as trace_fh:
+        trace_fh.write(b'\x01\x02')
+
+    (ids, counts) = loch.loc_histogram(trace_file, signed, chunk_size=777)
+    assert dict(zip(ids.tolist(), counts.tolist())) == Counter(loc_ids)
+
+    (top_ids, top_counts) = loch.loc_top_n(ids, counts, 3)
+    assert list(zip(top_ids.tolist(), top_counts.tolist())) \
+            == sorted(Counter(loc_ids).items(), key=lambda item: (-item[1], item[0]))[:3]
+
+# #############################################################################
+def test_histogram_report(tmp_path, capsys):
+    """Top-N LOC-IDs are decoded through the generated file-names table."""
+    pytest.importorskip("numpy")
+    gen_loc_files(LocTestCodeDir + '/two-files-program', tmp_path)
+
+    trace_file = str(tmp_path / 'trace.bin')
+    write_trace(trace_file, [131089] * 3 + [65541] * 5 + [65542])
+
+    loch.do_main([trace_file, '--gen-dir', str(tmp_path), '--top', '2'])
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 3
+    assert lines[1].split() == ['5', '55.56%', '65541', 'two-files-program/two-files-file1.c:5']
+    assert lines[2].split() == ['3', '33.33%', '131089', 'two-files-program/two-files-main.c:17']
+
+    empty_file = str(tmp_path / 'empty.bin')
+    write_trace(empty_file, [])
+    assert not loch.loc_histogram_report(empty_file)
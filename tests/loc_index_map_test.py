@@ -0,0 +1,124 @@
+# #############################################################################
+# loc_index_map_test.py
+#
+"""
+Unit-tests for the persisted file-index map (--index-map): files keep their
+index across generator runs, deleted files leave tombstones that still
+decode, and compaction renumbers files densely.
+"""
+
+# #############################################################################
+import json
+import subprocess as sp
+import pytest
+import loc.gen_loc_files as loc_main
+import loc.loc_index_map as locim
+from loc.loc_index_map import LocIndexMap
+from loc.loc_decoder import LocDecoder
+from tests.loc_test_utils import gen_loc_files
+
+# #############################################################################
+def gen_files(tmp_path, extra_args=()):
+    """
+    Run the generator on tmp_path/prog with an index map, and return the
+    { file-name: file-index } of the decoded Loc_FileNamesList[].
+    """
+    gen_dir = tmp_path / 'gen'
+    gen_dir.mkdir(exist_ok=True)
+    gen_loc_files(tmp_path / 'prog', gen_dir,
+                  ['--index-map', str(tmp_path / 'index_map.json')] + list(extra_args))
+
+    decoder = LocDecoder(str(gen_dir))
+    assert LocDecoder(str(gen_dir / 'loc_tokens.h')).file_names == decoder.file_names
+    return {decoder.file_name(idx): idx for idx in range(1, len(decoder))}
+
+# #############################################################################
+def test_index_map_stable_indexes(tmp_path):
+    """
+    Adding a file that sorts first does not renumber other files; a deleted
+    file's index is not re-used, and is given back if the file re-appears.
+    """
+    src_dir = tmp_path / 'prog'
+    src_dir.mkdir()
+    for file in ('b.c', 'c.c'):
+        (src_dir / file).write_text('int x;\n', encoding="utf8")
+    assert gen_files(tmp_path) == {'prog/b.c': 1, 'prog/c.c': 2}
+
+    (src_dir / 'aaa.c').write_text('int a;\n', encoding="utf8")
+    assert gen_files(tmp_path) == {'prog/b.c': 1, 'prog/c.c': 2, 'prog/aaa.c': 3}
+
+    (src_dir / 'c.c').unlink()
+    (src_dir / 'd.c').write_text('int d;\n', encoding="utf8")
+    assert gen_files(tmp_path) == {'prog/b.c': 1, 'prog/c.c': 2, 'prog/aaa.c': 3,
+                                   'prog/d.c': 4}
+    loc_dotc = (tmp_path / 'gen' / 'loc_filenames.c').read_text(encoding="utf8")
+    assert [line for line in loc_dotc.splitlines() if '"prog/c.c"' in line][0] \
+            .endswith('// 2, L=0 (deleted)')
+
+    (src_dir / 'c.c').write_text('int c;\n', encoding="utf8")
+    assert gen_files(tmp_path)['prog/c.c'] == 2
+
+# #############################################################################
+def test_index_map_compact(tmp_path):
+    """Compaction drops tombstones, and keeps the relative order of files."""
+    src_dir = tmp_path / 'prog'
+    src_dir.mkdir()
+    for file in ('c.c', 'd.c'):
+        (src_dir / file).write_text('int x;\n', encoding="utf8")
+    gen_files(tmp_path)
+    (src_dir / 'a.c').write_text('int a;\n', encoding="utf8")
+    (src_dir / 'c.c').unlink()
+    assert gen_files(tmp_path) == {'prog/c.c': 1, 'prog/d.c': 2, 'prog/a.c': 3}
+
+    map_file = str(tmp_path / 'index_map.json')
+    assert LocIndexMap(map_file).stats_msg().endswith(
+        '2 files, 1 deleted, 3 indexes used (66.7% live)')
+
+    assert gen_files(tmp_path, ['--compact-index-map']) == {'prog/d.c': 1, 'prog/a.c': 2}
+    with open(map_file, encoding="utf8") as map_fh:
+        assert json.load(map_fh) == {'version': 1, 'next_index': 3, 'deleted': {},
+                                     'files': {'prog/d.c': 1, 'prog/a.c': 2}}
+
+# #############################################################################
+def test_index_map_decoder_binary(tmp_path):
+    """The compiled decoder decodes LOC-IDs of deleted files, too."""
+    src_dir = tmp_path / 'prog'
+    src_dir.mkdir()
+    for file in ('a.c', 'b.c'):
+        (src_dir / file).write_text('int x;\n', encoding="utf8")
+    gen_files(tmp_path)
+    (src_dir / 'a.c').unlink()
+
+    gen_dir = tmp_path / 'gen'
+    (retval, max_file_num, _, _) = \
+      loc_main.do_main(['--src-root-dir', str(src_dir),
+                        '--gen-includes-dir', str(gen_dir),
+                        '--gen-source-dir', str(gen_dir),
+                        '--loc-decoder-dir', str(gen_dir),
+                        '--index-map', str(tmp_path / 'index_map.json')])
+    assert retval is True
+    assert max_file_num == 2
+
+    result = sp.run([str(gen_dir / 'prog_loc'), '--brief', str((1 << 16) | 5),
+                     str((2 << 16) | 7)], text=True, check=True, capture_output=True)
+    assert result.stdout.split() == ['prog/a.c:5', 'prog/b.c:7']
+
+# #############################################################################
+def test_index_map_errors_and_cli(tmp_path, capsys):
+    """A corrupt map is an error; the CLI reports and compacts a map."""
+    map_file = tmp_path / 'index_map.json'
+    map_file.write_text('{ not json', encoding="utf8")
+    with pytest.raises(ValueError):
+        LocIndexMap(str(map_file))
+
+    map_file.write_text(json.dumps({'version': 1, 'next_index': 5,
+                                    'files': {'x.c': 4}, 'deleted': {'y.c': 2}}),
+                        encoding="utf8")
+    locim.do_main([str(map_file), '--compact'])
+    out = capsys.readouterr().out.splitlines()
+    assert out[0].endswith('1 files, 1 deleted, 4 indexes used (25.0% live)')
+    assert out[1].endswith('1 files, 0 deleted, 1 indexes used (100.0% live)')
+    assert LocIndexMap(str(map_file)).files == {'x.c': 1}
+
+    with pytest.raises(SystemExit):
+        locim.do_main([str(tmp_path / 'no-such-map.json')])
@@ -0,0 +1,197 @@
+# #############################################################################
+# loc_index_shards_test.py
+#
+"""
+Unit-tests for the per-file index shards (--gen-index-shards): each file
+is compiled with just its own LOC_FILE_INDEX, loc.h no longer pulls in
+loc_tokens.h, and re-generating only re-writes what changed.
+"""
+
+# #############################################################################
+import os
+import shutil
+import subprocess as sp
+import pytest
+import loc.gen_loc_files as loc_main
+from loc.gen_loc_files import LocGenConfig, LocGenError
+from loc.loc_emit import LOC_SHARDS_MANIFEST
+
+LOC_SHARDS_TEST_PROG = r'''
+#include <stdio.h>
+#include "loc.h"
+
+int
+main(void)
+{
+    loc_t loc = __LOC__;
+    printf("%s:%u\n", LOC_FILE(loc), LOC_LINE(loc));
+    return 0;
+}
+'''
+
+# #############################################################################
+def gen_shards(src_dir, gen_dir, shards_dir, extra_args=()):
+    """Run the generator with --gen-index-shards."""
+    (retval, _, _, _) = \
+      loc_main.do_main(['--src-root-dir', str(src_dir),
+                        '--gen-includes-dir', str(gen_dir),
+                        '--gen-source-dir', str(gen_dir),
+                        '--gen-index-shards', str(shards_dir),
+                        '--no-decoder'] + list(extra_args))
+    assert retval is True
+
+# #############################################################################
+def shard_mtimes(shards_dir) -> dict:
+    """Return { shard-file: mtime } of all shard files."""
+    mtimes = {}
+    for (root, _, files) in os.walk(shards_dir):
+        for file in files:
+            if file == LOC_SHARDS_MANIFEST:
+                continue
+            mtimes[os.path.join(root, file)] = os.stat(os.path.join(root, file)).st_mtime_ns
+    return mtimes
+
+# #############################################################################
+def test_index_shards(tmp_path):
+    """
+    Shards define each file's index, as listed in Loc_FileNamesList[], and
+    loc.h is usable without loc_tokens.h.
+    """
+    src_dir = tmp_path / 'prog'
+    src_dir.mkdir()
+    (src_dir / 'a-main.c').write_text(LOC_SHARDS_TEST_PROG, encoding="utf8")
+    (src_dir / 'b.c').write_text('int b;\n', encoding="utf8")
+    gen_dir = tmp_path / 'gen'
+    gen_dir.mkdir()
+    shards_dir = tmp_path / 'shards'
+    gen_shards(src_dir, gen_dir, shards_dir)
+
+    loc_doth = (gen_dir / 'loc.h').read_text(encoding="utf8")
+    assert 'loc_tokens.h' not in loc_doth
+    assert (shards_dir / 'prog' / 'a-main.c.h').read_text(encoding="utf8").endswith(
+        '#define LOC_FILE_INDEX 1\n')
+    assert (shards_dir / 'prog' / 'a-main.c.rsp').read_text(encoding="utf8") \
+            == '-DLOC_FILE_INDEX=1\n'
+    assert (shards_dir / 'prog' / 'b.c.rsp').read_text(encoding="utf8") \
+            == '-DLOC_FILE_INDEX=2\n'
+
+    if shutil.which('cc') is None:
+        pytest.skip("No C compiler available")
+
+    for (shard_args, prog_name) in ((['@' + str(shards_dir / 'prog' / 'a-main.c.rsp')], 'rsp'),
+                                    (['-include', str(shards_dir / 'prog' / 'a-main.c.h')],
+                                     'doth')):
+        prog_bin = str(tmp_path / prog_name)
+        sp.run(['cc', '-I', str(gen_dir)] + shard_args
+               + ['-o', prog_bin, str(src_dir / 'a-main.c'), str(gen_dir / 'loc_filenames.c')],
+               check=True, capture_output=True)
+        result = sp.run([prog_bin], text=True, check=True, capture_output=True)
+        assert result.stdout == 'prog/a-main.c:8\n'
+
+# #############################################################################
+def test_index_shards_rewrite_if_changed(tmp_path):
+    """
+    Re-generating leaves unchanged shards and loc.h alone; a new file only
+    adds its shard.
+    """
+    src_dir = tmp_path / 'prog'
+    src_dir.mkdir()
+    for file in ('a.c', 'b.c'):
+        (src_dir / file).write_text('int x;\n', encoding="utf8")
+    gen_dir = tmp_path / 'gen'
+    gen_dir.mkdir()
+    shards_dir = tmp_path / 'shards'
+    gen_shards(src_dir, gen_dir, shards_dir)
+
+    loc_doth = str(gen_dir / 'loc.h')
+    loc_doth_mtime = os.stat(loc_doth).st_mtime_ns
+    mtimes = shard_mtimes(shards_dir)
+    assert len(mtimes) == 4
+
+    gen_shards(src_dir, gen_dir, shards_dir)
+    assert shard_mtimes(shards_dir) == mtimes
+    assert os.stat(loc_doth).st_mtime_ns == loc_doth_mtime
+
+    (src_dir / 'c.c').write_text('int c;\n', encoding="utf8")
+    gen_shards(src_dir, gen_dir, shards_dir)
+    new_mtimes = shard_mtimes(shards_dir)
+    assert sorted(set(new_mtimes) - set(mtimes)) \
+            == [str(shards_dir / 'prog' / 'c.c.h'), str(shards_dir / 'prog' / 'c.c.rsp')]
+    assert {shard: new_mtimes[shard] for shard in mtimes} == mtimes
+    assert os.stat(loc_doth).st_mtime_ns == loc_doth_mtime
+
+# #############################################################################
+@pytest.mark.parametrize('index_map', [False, True], ids=['sorted', 'index-map'])
+def test_index_shards_of_deleted_files(tmp_path, index_map):
+    """
+    A deleted file's shards are removed, also when its index is kept as a
+    tombstone by --index-map, along with sub-dirs left empty; other shards
+    are left alone.
+    """
+    src_dir = tmp_path / 'prog'
+    (src_dir / 'sub').mkdir(parents=True)
+    for file in ('a.c', 'b.c', 'sub/c.c'):
+        (src_dir / file).write_text('int x;\n', encoding="utf8")
+    gen_dir = tmp_path / 'gen'
+    gen_dir.mkdir()
+    shards_dir = tmp_path / 'shards'
+    extra_args = ['--index-map', str(tmp_path / 'index_map.json')] if index_map else []
+    gen_shards(src_dir, gen_dir, shards_dir, extra_args)
+    mtimes = shard_mtimes(shards_dir)
+    assert len(mtimes) == 6
+
+    (src_dir / 'sub' / 'c.c').unlink()
+    gen_shards(src_dir, gen_dir, shards_dir, extra_args)
+    assert shard_mtimes(shards_dir) == {shard: mtime for (shard, mtime) in mtimes.items()
+                                        if '/sub/' not in shard}
+    assert not (shards_dir / 'prog' / 'sub').exists()
+
+# #############################################################################
+def test_index_shards_keep_other_files(tmp_path):
+    """
+    Only shards listed in the shards manifest by a previous run are removed;
+    other files in the shards dir are left alone.
+    """
+    src_dir = tmp_path / 'prog'
+    src_dir.mkdir()
+    for file in ('a.c', 'b.c'):
+        (src_dir / file).write_text('int x;\n', encoding="utf8")
+    gen_dir = tmp_path / 'gen'
+    gen_dir.mkdir()
+    shards_dir = tmp_path / 'shards'
+    (shards_dir / 'prog').mkdir(parents=True)
+    (shards_dir / 'keep_me.h').write_text('int keep_me;\n', encoding="utf8")
+    (shards_dir / 'prog' / 'keep_me.c.h').write_text('int keep_me;\n', encoding="utf8")
+    gen_shards(src_dir, gen_dir, shards_dir)
+    assert (shards_dir / LOC_SHARDS_MANIFEST).read_text(encoding="utf8") \
+            == 'prog/a.c.h\nprog/a.c.rsp\nprog/b.c.h\nprog/b.c.rsp\n'
+
+    (src_dir / 'b.c').unlink()
+    gen_shards(src_dir, gen_dir, shards_dir)
+    assert sorted(shard_mtimes(shards_dir)) \
+            == [str(shards_dir / 'keep_me.h'), str(shards_dir / 'prog' / 'a.c.h'),
+                str(shards_dir / 'prog' / 'a.c.rsp'), str(shards_dir / 'prog' / 'keep_me.c.h')]
+
+# #############################################################################
+def test_index_shards_dir_overlaps(tmp_path):
+    """
+    The shards dir may not be, nor contain, the dirs of the other generated
+    files; it may be a sub-dir of them.
+    """
+    src_dir = tmp_path / 'prog'
+    src_dir.mkdir()
+    (src_dir / 'a.c').write_text('int x;\n', encoding="utf8")
+    gen_dir = tmp_path / 'gen'
+    (gen_dir / 'src').mkdir(parents=True)
+    for shards_dir in (gen_dir, tmp_path):
+        config = LocGenConfig([str(src_dir)], inc_dirname=str(gen_dir),
+                              src_dirname=str(gen_dir / 'src'),
+                              shards_dirname=str(shards_dir), gen_decoder=False)
+        with pytest.raises(LocGenError):
+            loc_main.loc_generate(config, write=False)
+
+    config = LocGenConfig([str(src_dir)], inc_dirname=str(gen_dir),
+                          src_dirname=str(gen_dir / 'src'),
+                          shards_dirname=str(gen_dir / 'shards'), gen_decoder=False)
+    loc_main.loc_generate(config)
+    assert (gen_dir / 'shards' / 'prog' / 'a.c.h').exists()
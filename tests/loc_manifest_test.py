@@ -0,0 +1,88 @@
+# #############################################################################
+# loc_manifest_test.py
+#
+"""
+Unit-tests for the binary manifest of the file-names table, emitted by the
+LOC generator, and its zero-copy reader.
+"""
+
+# #############################################################################
+import os
+import pytest
+import loc.gen_loc_files as loc_main
+import loc.loc_manifest as locm
+from loc.loc_decoder import LocDecoder
+
+# #############################################################################
+# Setup some variables pointing to diff dir/sub-dir full-paths.
+LocTestsDir    = os.path.realpath(os.path.dirname(__file__))
+LocDirRoot     = os.path.realpath(LocTestsDir + '/..')
+LocTestCodeDir = LocDirRoot + '/' + 'test-code'
+
+# #############################################################################
+def test_manifest_roundtrip(tmp_path):
+    """File names and line-counts read back from a manifest are as written."""
+    file_table = [("Unknown_file", 0), ("prod/a.c", 10), ("prod/dir/é.c", 70000),
+                  ("", 0)]
+    manifest_file = tmp_path / locm.LOC_MANIFEST_FILE
+    manifest_file.write_bytes(locm.loc_manifest_bytes(file_table, 15, 16))
+
+    with locm.LocManifest(str(manifest_file)) as manifest:
+        assert len(manifest) == len(file_table)
+        assert (manifest.nbits_files, manifest.nbits_lines) == (15, 16)
+        assert [(manifest.file_name(idx), manifest.lines[idx])
+                for idx in range(len(manifest))] == file_table
+        assert isinstance(manifest.file_name_bytes(1), memoryview)
+        assert manifest.file_name(len(file_table)) == ""
+        assert manifest.decode((2 << 16) | 42) == ("prod/dir/é.c", 42)
+
+# #############################################################################
+def test_manifest_bad_magic(tmp_path):
+    """Reading a file that's not a manifest raises ValueError."""
+    bad_file = tmp_path / 'not-a-manifest.bin'
+    bad_file.write_bytes(b'\0' * 64)
+    with pytest.raises(ValueError):
+        locm.LocManifest(str(bad_file))
+
+# #############################################################################
+def test_manifest_truncated_or_corrupt(tmp_path):
+    """
+    A manifest whose header, tables or string blob do not fit in the file,
+    or whose offsets do not match its blob, raises ValueError.
+    """
+    manifest = locm.loc_manifest_bytes([("Unknown_file", 0), ("prod/a.c", 10)], 15, 16)
+    bad_file = tmp_path / 'bad-manifest.bin'
+    for size in (0, 4, locm.LOC_MANIFEST_HDR_SIZE, len(manifest) - 1):
+        bad_file.write_bytes(manifest[:size])
+        with pytest.raises(ValueError):
+            locm.LocManifest(str(bad_file))
+
+    # Claim one more file than the tables have
+    num_files_off = locm.LOC_MANIFEST_HDR_SIZE - 20
+    bad_file.write_bytes(manifest[:num_files_off] + (3).to_bytes(4, 'little')
+                         + manifest[num_files_off + 4:])
+    with pytest.raises(ValueError):
+        locm.LocManifest(str(bad_file))
+
+    # A shorter blob than the offsets table covers
+    blob_size_off = locm.LOC_MANIFEST_HDR_SIZE - 4
+    bad_file.write_bytes(manifest[:blob_size_off] + (4).to_bytes(4, 'little')
+                         + manifest[blob_size_off + 4:])
+    with pytest.raises(ValueError):
+        locm.LocManifest(str(bad_file))
+
+# #############################################################################
+def test_generated_manifest(tmp_path):
+    """The generator emits a manifest with the same table as loc_filenames.c"""
+    (retval, _, _, _) = \
+      loc_main.do_main(['--src-root-dir', LocTestCodeDir + '/two-files-program',
+                        '--gen-includes-dir', str(tmp_path),
+                        '--gen-source-dir', str(tmp_path)])
+    assert retval is True
+
+    decoder = LocDecoder(str(tmp_path / 'loc_filenames.c'))
+    with locm.LocManifest(str(tmp_path / locm.LOC_MANIFEST_FILE)) as manifest:
+        assert [manifest.file_name(idx) for idx in range(len(manifest))] \
+                == decoder.file_names
+        assert manifest.lines.tolist() == decoder.file_lines
+        assert manifest.decode(131089) == decoder.decode(131089)
@@ -0,0 +1,101 @@
+# #############################################################################
+# loc_profile_test.py
+#
+"""
+Unit-tests for the phase-level profile of a generator run (--profile,
+--profile-cprofile): each phase's time, files and bytes read are recorded.
+"""
+
+# #############################################################################
+import json
+import pstats
+import pytest
+import loc.gen_loc_files as loc_main
+from loc.loc_profile import LocProfile, loc_profile_phase
+from tests.loc_test_utils import gen_loc_files
+
+# #############################################################################
+def gen_files(tmp_path, extra_args=()) -> dict:
+    """
+    Run the generator on tmp_path/prog with --profile, and return the profile.
+    """
+    gen_dir = tmp_path / 'gen'
+    gen_dir.mkdir(exist_ok=True)
+    profile_file = tmp_path / 'profile.json'
+    gen_loc_files(tmp_path / 'prog', gen_dir, ['--profile', str(profile_file)] + list(extra_args))
+    with open(profile_file, encoding="utf8") as profile_fh:
+        return json.load(profile_fh)
+
+# #############################################################################
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_profile_phases(tmp_path, jobs):
+    """
+    Phases are recorded in the order they ran, with files and bytes read
+    by count_lines; line-counts reused from the scan-cache read no bytes.
+    """
+    src_dir = tmp_path / 'prog'
+    (src_dir / 'sub').mkdir(parents=True)
+    nbytes = 0
+    for num in range(10):
+        contents = 'int x%d;\n' % num * (num + 1)
+        (src_dir / ('f%d.c' % num)).write_text(contents, encoding="utf8")
+        nbytes += len(contents)
+    (src_dir / 'sub' / 'README').write_text('Not a source file\n', encoding="utf8")
+
+    cache_args = ['--jobs', str(jobs), '--cache-file', str(tmp_path / 'cache.json')]
+    profile = gen_files(tmp_path, cache_args + ['--gen-index-shards', str(tmp_path / 'shards')])
+    assert profile['version'] == 1
+    assert profile['args'][-5:-4] == [str(jobs)]
+    assert list(profile['phases']) == ['discover', 'count_lines', 'emit', 'manifest',
+                                       'shards', 'loc_doth', 'write', 'save_caches']
+
+    phases = profile['phases']
+    assert phases['discover']['files'] == 11
+    assert phases['count_lines']['files'] == 10
+    assert phases['count_lines']['bytes'] == nbytes
+    assert phases['count_lines']['bytes_per_sec'] > 0
+    assert phases['emit']['files'] == 10
+    assert profile['peak_rss_kb'] > 0
+    assert sum(phase['wall_secs'] for phase in phases.values()) <= profile['wall_secs']
+
+    profile = gen_files(tmp_path, cache_args)
+    assert profile['phases']['count_lines']['files'] == 10
+    assert profile['phases']['count_lines']['bytes'] == 0
+
+# #############################################################################
+def test_profile_cprofile(tmp_path):
+    """--profile-cprofile saves pstats output, also without --profile."""
+    src_dir = tmp_path / 'prog'
+    src_dir.mkdir()
+    (src_dir / 'a.c').write_text('int a;\n', encoding="utf8")
+    cprofile_file = str(tmp_path / 'gen.prof')
+    gen_files(tmp_path, ['--profile-cprofile', cprofile_file])
+
+    stats = pstats.Stats(cprofile_file)
+    func_names = {func_name for (_, _, func_name) in stats.stats}
+    assert {'loc_scan_src_roots', 'count_lines', 'gen_loc_generated_files'} <= func_names
+
+    (tmp_path / 'profile.json').unlink()
+    gen_dir = tmp_path / 'gen'
+    loc_main.do_main(['--src-root-dir', str(src_dir),
+                      '--gen-includes-dir', str(gen_dir),
+                      '--gen-source-dir', str(gen_dir),
+                      '--profile-cprofile', cprofile_file, '--no-decoder'])
+    assert not (tmp_path / 'profile.json').exists()
+
+# #############################################################################
+def test_profile_phase_accumulates():
+    """Phases entered several times add up; no profile is a no-op."""
+    profile = LocProfile(['arg'])
+    for _ in range(3):
+        with loc_profile_phase(profile, 'phase', files=2, nbytes=10):
+            pass
+    profile.add('phase', nbytes=5)
+    with loc_profile_phase(None, 'phase', files=2):
+        pass
+
+    record = profile.record()
+    assert record['args'] == ['arg']
+    assert record['phases']['phase']['files'] == 6
+    assert record['phases']['phase']['bytes'] == 35
+    assert record['phases']['phase']['wall_secs'] <= record['wall_secs']
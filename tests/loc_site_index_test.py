@@ -0,0 +1,77 @@
+# #############################################################################
+# loc_site_index_test.py
+#
+"""
+Unit-tests for the sorted LOC2 site index exported from a program binary.
+Decoding through the index must match decoding through LocElf directly.
+"""
+
+# #############################################################################
+import os
+import pytest
+from loc.loc_elf import LocElf
+import loc.loc_site_index as locsi
+from tests.loc_elf_test import build_and_run
+
+# #############################################################################
+def test_site_index_matches_loc_elf(tmp_path):
+    """Every code-site decodes the same through the index as via LocElf."""
+    (prog_bin, lines) = build_and_run(tmp_path, [])
+    index_file = str(tmp_path / 'prog.locs')
+    locsi.do_main([prog_bin, '--index-file', index_file])
+
+    with LocElf(prog_bin) as loc_elf, locsi.LocSiteIndex(index_file) as site_index:
+        assert len(site_index) == len(lines)
+        assert list(site_index.ids) == loc_elf.loc_ids()
+        for loc_id in loc_elf.loc_ids():
+            assert site_index.decode(loc_id) == loc_elf.decode(loc_id)
+
+        # func / file strings are de-duplicated: 2 functions, 1 file.
+        assert site_index.num_strings == 3
+
+        assert site_index.site_index(loc_elf.loc_ids()[0] - 1) == -1
+        with pytest.raises(ValueError):
+            site_index.decode(12345)
+
+# #############################################################################
+def test_site_index_cache(tmp_path):
+    """Indexes are cached by build-id, and re-used for the same build."""
+    (prog_bin, _) = build_and_run(tmp_path, [])
+    cache_dir = str(tmp_path / 'cache')
+
+    index_file = locsi.loc_cached_site_index(prog_bin, cache_dir)
+    with LocElf(prog_bin) as loc_elf:
+        assert os.path.basename(index_file) == loc_elf.build_id() + '.locs'
+
+    mtime_ns = os.stat(index_file).st_mtime_ns
+    assert locsi.loc_cached_site_index(prog_bin, cache_dir) == index_file
+    assert os.stat(index_file).st_mtime_ns == mtime_ns
+
+# #############################################################################
+@pytest.mark.parametrize('damage', ['empty', 'truncated', 'bad-magic'])
+def test_site_index_cache_rebuilt(tmp_path, damage):
+    """A truncated, or corrupt, cached index is rebuilt."""
+    (prog_bin, lines) = build_and_run(tmp_path, [])
+    cache_dir = str(tmp_path / 'cache')
+    index_file = locsi.loc_cached_site_index(prog_bin, cache_dir)
+    with open(index_file, 'rb') as index_fh:
+        index_bytes = index_fh.read()
+
+    with open(index_file, 'wb') as index_fh:
+        index_fh.write({'empty': b'',
+                        'truncated': index_bytes[:len(index_bytes) // 2],
+                        'bad-magic': b'XXXX' + index_bytes[4:]}[damage])
+
+    assert locsi.loc_cached_site_index(prog_bin, cache_dir) == index_file
+    with locsi.LocSiteIndex(index_file) as site_index:
+        assert len(site_index) == len(lines)
+
+# #############################################################################
+def test_site_index_cache_not_private(tmp_path):
+    """A cache dir others can write to is not used."""
+    (prog_bin, _) = build_and_run(tmp_path, [])
+    cache_dir = tmp_path / 'cache'
+    cache_dir.mkdir(mode=0o777)
+    os.chmod(str(cache_dir), 0o777)
+    with pytest.raises(PermissionError):
+        locsi.loc_cached_site_index(prog_bin, str(cache_dir))
@@ -0,0 +1,47 @@
+# #############################################################################
+# loc_test_utils.py
+#
+"""
+Helpers shared by the unit-tests, to set up source trees and to run the
+generator on them.
+"""
+
+# #############################################################################
+import os
+import loc.gen_loc_files as loc_main
+
+# #############################################################################
+# Setup some variables pointing to diff dir/sub-dir full-paths.
+LocTestsDir    = os.path.realpath(os.path.dirname(__file__))
+LocDirRoot     = os.path.realpath(LocTestsDir + '/..')
+LocTestCodeDir = LocDirRoot + '/' + 'test-code'
+
+# #############################################################################
+def gen_args(src_dir, gen_dir, decoder=False) -> list:
+    """
+    Return the generator's arguments to generate into gen_dir, from the
+    source root src_dir; and to build the decoder binary, if 'decoder'.
+    """
+    return (['--src-root-dir', str(src_dir),
+             '--gen-includes-dir', str(gen_dir),
+             '--gen-source-dir', str(gen_dir),
+             '--loc-decoder-dir', str(gen_dir)]
+            + ([] if decoder else ['--no-decoder']))
+
+# #############################################################################
+def gen_loc_files(src_dir, gen_dir, extra_args=(), decoder=False) -> tuple:
+    """
+    Run the generator with gen_args() and 'extra_args', check it succeeded,
+    and return the (retval, max_file_num, max_num_lines, file_w_max) of its
+    do_main().
+    """
+    result = loc_main.do_main(gen_args(src_dir, gen_dir, decoder) + list(extra_args))
+    assert result[0] is True
+    return result
+
+# #############################################################################
+def make_tree(src_dir, files):
+    """Create the source files 'files', of 1, 2, ... lines, under src_dir."""
+    for (num, file) in enumerate(files):
+        (src_dir / file).parent.mkdir(parents=True, exist_ok=True)
+        (src_dir / file).write_text('int x;\n' * (num + 1), encoding="utf8")
@@ -0,0 +1,98 @@
+# #############################################################################
+# loc_watch_test.py
+#
+"""
+Unit-tests for the watch mode of the generator (--watch): the in-memory
+tree follows the source tree as files come and go, and the generated files
+are re-written, soon after, only when the set of source files changes.
+"""
+
+# #############################################################################
+import os
+import time
+import threading
+import loc.gen_loc_files as loc_main
+import loc.loc_discover as locd
+from loc.loc_watch import LocWatchTree
+from tests.loc_test_utils import gen_args
+
+# #############################################################################
+def wait_for(predicate, timeout=5.0) -> float:
+    """Wait till predicate() is True, and return the seconds waited."""
+    start = time.monotonic()
+    while not predicate():
+        assert time.monotonic() - start < timeout
+        time.sleep(0.01)
+    return time.monotonic() - start
+
+# #############################################################################
+def test_watch_tree_follows_walk(tmp_path):
+    """After each change, the tree's files are those of a fresh walk."""
+    src_dir = tmp_path / 'prog'
+    (src_dir / 'a' / 'b').mkdir(parents=True)
+    (src_dir / 'build').mkdir()
+    for file in ('x.c', 'a/y.c', 'a/b/z.c', 'build/gen.c', 'a/skip.c'):
+        (src_dir / file).write_text('int x;\n', encoding="utf8")
+
+    excludes = (['build'], ['skip.c'])
+    tree = LocWatchTree(str(src_dir), *excludes)
+
+    def check(exp_changed):
+        assert tree.refresh() is exp_changed
+        assert tree.found_files() == locd.loc_walk_sources(str(src_dir), *excludes)
+
+    check(False)
+    (src_dir / 'a' / 'b' / 'new.c').write_text('int n;\n', encoding="utf8")
+    check(True)
+    (src_dir / 'a' / 'c' / 'd').mkdir(parents=True)
+    (src_dir / 'a' / 'c' / 'd' / 'deep.c').write_text('int d;\n', encoding="utf8")
+    check(True)
+    os.rename(src_dir / 'x.c', src_dir / 'xx.c')
+    check(True)
+    (src_dir / 'build' / 'more.c').write_text('int m;\n', encoding="utf8")
+    (src_dir / 'a' / 'skip.c').write_text('int s;\n', encoding="utf8")
+    check(False)
+    os.rename(src_dir / 'a', src_dir / 'e')
+    check(True)
+    check(False)
+
+# #############################################################################
+def test_watch_regenerates(tmp_path):
+    """
+    Adding a source file re-generates the outputs well within a second,
+    identical to those of a fresh run; adding other files does not.
+    """
+    src_dir = tmp_path / 'prog'
+    src_dir.mkdir()
+    (src_dir / 'b.c').write_text('int b;\n', encoding="utf8")
+    gen_dir = tmp_path / 'gen'
+    gen_dir.mkdir()
+    loc_tokens = gen_dir / 'loc_tokens.h'
+
+    watcher = threading.Thread(target=loc_main.do_main,
+                               args=(gen_args(src_dir, gen_dir)
+                                     + ['--watch', '--watch-interval', '0.05',
+                                        '--watch-timeout', '3'],))
+    watcher.start()
+    try:
+        wait_for(loc_tokens.exists)
+        wait_for(lambda: 'prog/b.c' in loc_tokens.read_text(encoding="utf8"))
+
+        (src_dir / 'sub').mkdir()
+        (src_dir / 'sub' / 'a.c').write_text('int a;\n\n', encoding="utf8")
+        latency = wait_for(lambda: 'prog/sub/a.c' in loc_tokens.read_text(encoding="utf8"))
+        assert latency < 1.0
+
+        mtime = os.stat(loc_tokens).st_mtime_ns
+        (src_dir / 'README').write_text('Not a source file\n', encoding="utf8")
+        time.sleep(0.3)
+        assert os.stat(loc_tokens).st_mtime_ns == mtime
+    finally:
+        watcher.join()
+
+    fresh_dir = tmp_path / 'fresh'
+    fresh_dir.mkdir()
+    loc_main.do_main(gen_args(src_dir, fresh_dir))
+    for gen_file in ('loc_tokens.h', 'loc_filenames.c', 'loc.h'):
+        assert (gen_dir / gen_file).read_text(encoding="utf8") \
+                == (fresh_dir / gen_file).read_text(encoding="utf8")
@@ -6,6 +6,7 @@ Basic unit-test for LOC encode / decode Python methods.
 """
 
 # #############################################################################
+import pytest
 import loc.loc_xform as xform
 
 # #############################################################################
@@ -34,3 +35,71 @@ def test_loc_encode_decode_roundtrip():
     """
     (file_index, line_num) = xform.loc_decode(65541)
     assert xform.loc_encode(file_index, line_num) == 65541
+
+# #############################################################################
+def test_loc_encode_decode_array():
+    """
+    Array-level encode / decode give the same results as the scalar methods.
+    """
+    np = pytest.importorskip("numpy")
+
+    file_idx = np.array([0, 1, 2, 2, 7, 32767], dtype=np.uint32)
+    lines = np.array([0, 5, 17, 18, 65535, 1], dtype=np.uint32)
+
+    ids = xform.loc_encode_array(file_idx, lines)
+    assert ids.dtype == np.uint32
+    assert ids.tolist() == [xform.loc_encode(int(f), int(l))
+                            for (f, l) in zip(file_idx, lines)]
+
+    (dec_file_idx, dec_lines) = xform.loc_decode_array(ids)
+    assert dec_file_idx.tolist() == file_idx.tolist()
+    assert dec_lines.tolist() == lines.tolist()
+    assert list(zip(dec_file_idx.tolist(), dec_lines.tolist())) \
+            == [xform.loc_decode(int(loc_id)) for loc_id in ids]
+
+# #############################################################################
+def test_loc_decode_columns():
+    """
+    Columnar decode returns a categorical file-index column and line column.
+    """
+    np = pytest.importorskip("numpy")
+
+    ids = [65541, 131089, 65541, 131090, 7 << 16]
+    (file_indexes, file_codes, lines) = xform.loc_decode_columns(ids)
+
+    assert file_indexes.tolist() == [1, 2, 7]
+    assert file_indexes[file_codes].tolist() == [1, 2, 1, 2, 7]
+    assert lines.tolist() == [5, 17, 5, 18, 0]
+    assert isinstance(file_codes, np.ndarray)
+
+# #############################################################################
+def test_loc_compute_nbits():
+    """
+    The default split is kept when it fits, and widened only as needed.
+    """
+    assert xform.loc_compute_nbits(2, 35) == (15, 16)
+    assert xform.loc_compute_nbits(32767, 65535) == (15, 16)
+    assert xform.loc_compute_nbits(32768, 100) == (16, 16)
+    assert xform.loc_compute_nbits(2, 70000) == (15, 17)
+    assert xform.loc_compute_nbits(2, 300000) == (13, 19)
+    assert xform.loc_compute_nbits(200000, 35) == (18, 14)
+
+    with pytest.raises(ValueError):
+        xform.loc_compute_nbits(200000, 100000)
+
+# #############################################################################
+def test_loc_set_nbits(tmp_path):
+    """
+    Encode / decode follow the split loaded from a generated loc.h.
+    """
+    loc_doth = tmp_path / 'loc.h'
+    loc_doth.write_text("#define LOC_NBITS_FILES 14       // # of bits ...\n"
+                        "#define LOC_NBITS_LINES 18       // # of bits ...\n",
+                        encoding="utf8")
+    try:
+        assert xform.loc_load_nbits(str(loc_doth)) == (14, 18)
+        assert xform.loc_encode(1, 5) == (1 << 18) | 5
+        assert xform.loc_decode((2 << 18) | 200000) == (2, 200000)
+    finally:
+        xform.loc_set_nbits(xform.LOC_NBITS_FILES_DEFAULT, xform.LOC_NBITS_LINES_DEFAULT)
+    assert xform.loc_encode(1, 5) == 65541